@@ -0,0 +1,5 @@
+"""
+Dedup window of the message consumers in the orchestration, order and payment
+services: the ids of processed messages, in process and in Redis, so a
+redelivered message is acked without running its handler again.
+"""
@@ -0,0 +1,5 @@
+import os
+
+# How long processed message ids are remembered, and how many are cached in process
+DEDUP_WINDOW_TTL = int(os.getenv("DEDUP_WINDOW_TTL", default=3600))
+DEDUP_LOCAL_SIZE = int(os.getenv("DEDUP_LOCAL_SIZE", default=10000))
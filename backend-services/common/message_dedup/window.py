@@ -0,0 +1,116 @@
+"""
+Dedup window for consumed messages.
+
+Every command and event carries a ``message_id``. Consumers record the ids they
+have processed in a bounded in-process LRU backed by a Redis key per id with a
+TTL, so a redelivered message (e.g. after a crash before the ack) is
+recognised and acked without running its handler again. The LRU answers the
+common case without a round trip; Redis covers restarts and other replicas.
+
+An id is marked once its handler has succeeded, so a crash between the
+handler's writes and the mark still redelivers the message. Consumers whose
+handlers write a database close that gap by also recording the id in the
+handler's own transaction (see processed_messages in order and payment).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+import redis
+import redis.asyncio as aioredis
+from . import config
+
+
+def message_key(message: dict, body: bytes) -> str:
+    """The message's id, or a digest of the body for producers that do not send one."""
+    message_id = message.get("message_id") if isinstance(message, dict) else None
+    if message_id:
+        return str(message_id)
+    return "sha1:" + hashlib.sha1(body).hexdigest()
+
+
+class _RecentIds:
+    """Thread-safe LRU set of the most recently processed message ids."""
+    def __init__(self, size: int):
+        self.size = size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, message_id: str) -> bool:
+        with self._lock:
+            if message_id in self._ids:
+                self._ids.move_to_end(message_id)
+                return True
+            return False
+
+    def add(self, message_id: str):
+        with self._lock:
+            self._ids[message_id] = None
+            self._ids.move_to_end(message_id)
+            while len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+
+
+class DedupWindow:
+    """
+    Processed ids of the consumers of one queue (namespace). Redis failures go to
+    log(message, level), i.e. the service's own logger, and fail open.
+    """
+    def __init__(self, namespace: str, client: redis.Redis, log: Callable[[str, str], None],
+                 ttl: int = config.DEDUP_WINDOW_TTL, local_size: int = config.DEDUP_LOCAL_SIZE):
+        self.namespace = namespace
+        self.client = client
+        self.log = log
+        self.ttl = ttl
+        self.recent = _RecentIds(local_size)
+
+    def _key(self, message_id: str) -> str:
+        return f"processed:{self.namespace}:{message_id}"
+
+    def seen(self, message_id: str) -> bool:
+        """True when the message has already been processed within the window."""
+        if message_id in self.recent:
+            return True
+        try:
+            found = self.client.exists(self._key(message_id))
+        except redis.RedisError as e:
+            # fail open: processing twice is what happened before this window existed
+            self.log(f"Dedup lookup failed for message {message_id}: {str(e)}", "ERROR")
+            return False
+        if found:
+            self.recent.add(message_id)
+        return bool(found)
+
+    def mark(self, message_id: str):
+        """Record a processed message; call after its handler has succeeded."""
+        self.recent.add(message_id)
+        try:
+            self.client.set(self._key(message_id), 1, ex=self.ttl)
+        except redis.RedisError as e:
+            self.log(f"Dedup record failed for message {message_id}: {str(e)}", "ERROR")
+
+
+class AsyncDedupWindow(DedupWindow):
+    """DedupWindow over the asyncio Redis client."""
+    def __init__(self, namespace: str, client: aioredis.Redis, log: Callable[[str, str], None],
+                 ttl: int = config.DEDUP_WINDOW_TTL, local_size: int = config.DEDUP_LOCAL_SIZE):
+        super().__init__(namespace, client, log, ttl, local_size)
+
+    async def seen(self, message_id: str) -> bool:
+        if message_id in self.recent:
+            return True
+        try:
+            found = await self.client.exists(self._key(message_id))
+        except redis.RedisError as e:
+            self.log(f"Dedup lookup failed for message {message_id}: {str(e)}", "ERROR")
+            return False
+        if found:
+            self.recent.add(message_id)
+        return bool(found)
+
+    async def mark(self, message_id: str):
+        self.recent.add(message_id)
+        try:
+            await self.client.set(self._key(message_id), 1, ex=self.ttl)
+        except redis.RedisError as e:
+            self.log(f"Dedup record failed for message {message_id}: {str(e)}", "ERROR")
@@ -0,0 +1,6 @@
+"""
+Log storage shared by the orchestration, order and payment services: the daily
+SQLite partitions, their read pool and query helpers, and the live tail. Each
+service writes its own LOG_DIR with its own logger; the time column of its
+rows is "timestamp" in orchestration and "created" in order and payment.
+"""
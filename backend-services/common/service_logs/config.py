@@ -0,0 +1,21 @@
+import os
+
+# Approximate /logs counts stop counting filtered rows at this many
+LOG_COUNT_SCAN_LIMIT = int(os.getenv("LOG_COUNT_SCAN_LIMIT", default=10000))
+# Daily log files older than this many days are deleted; 0 keeps them all
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", default=30))
+# Seconds between retention and compaction runs
+LOG_MAINTENANCE_INTERVAL = float(os.getenv("LOG_MAINTENANCE_INTERVAL", default=3600))
+# Rows GET /logs/export reads from SQLite and writes out at a time
+LOG_EXPORT_BATCH_SIZE = int(os.getenv("LOG_EXPORT_BATCH_SIZE", default=1000))
+# Rows buffered for each GET /logs/tail client; the oldest are dropped when it falls behind
+LOG_TAIL_BUFFER_SIZE = int(os.getenv("LOG_TAIL_BUFFER_SIZE", default=1000))
+# Seconds without new rows after which /logs/tail sends a keep-alive comment
+LOG_TAIL_KEEPALIVE = float(os.getenv("LOG_TAIL_KEEPALIVE", default=15))
+# Threads running log queries, apart from the ones serving the other endpoints
+LOG_QUERY_THREADS = int(os.getenv("LOG_QUERY_THREADS", default=4))
+# Seconds a log request may spend in SQLite before it is interrupted and answered with 503
+LOG_QUERY_TIMEOUT = float(os.getenv("LOG_QUERY_TIMEOUT", default=5))
+# Idle read-only log connections kept open, and the memory map size of each
+LOG_READ_POOL_SIZE = int(os.getenv("LOG_READ_POOL_SIZE", default=32))
+LOG_READ_MMAP_SIZE = int(os.getenv("LOG_READ_MMAP_SIZE", default=256 * 1024 * 1024))
@@ -0,0 +1,252 @@
+"""
+Daily log partitions.
+
+Logs are written to one SQLite file per UTC day, ``logs-YYYY-MM-DD.db`` in the
+service's LOG_DIR, chosen by the date part of the row's time column. Readers
+open only the partitions that intersect the requested date range, retention
+deletes whole files instead of running DELETE, and partitions that no longer
+receive writes are VACUUMed once by PartitionMaintenance.
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Callable
+from . import config
+from .reader import read_pool
+
+PARTITION_NAME = re.compile(r"^logs-(\d{4}-\d{2}-\d{2})\.db$")
+
+# PRAGMA user_version of a partition that has been compacted
+COMPACTED = 1
+
+# structured context of a log row, set with each service's log_context()
+CONTEXT_COLUMNS = ("transaction_id", "order_id", "payment_id", "event")
+
+ROLLUP_UPSERT = (
+    "INSERT INTO logs_rollup (hour, level, module, count) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (hour, level, module) DO UPDATE SET count = count + excluded.count"
+)
+
+
+def hourly_counts(rows) -> list:
+    """(hour, level, module, count) for logs rows; the hour is the ISO timestamp cut to 'YYYY-MM-DDTHH'."""
+    counts = Counter((row[0][:13], row[1], row[3]) for row in rows)
+    return [key + (count,) for key, count in counts.items()]
+
+
+def partition_path(log_dir: str, day: str) -> str:
+    return os.path.join(log_dir, f"logs-{day}.db")
+
+
+def list_partitions(log_dir: str, start_date: str | None = None,
+                    end_date: str | None = None) -> list[tuple[str, str]]:
+    """(day, path) of the partitions intersecting [start_date, end_date], newest first."""
+    if not os.path.isdir(log_dir):
+        return []
+    partitions = []
+    for name in os.listdir(log_dir):
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue
+        day = match.group(1)
+        # the filters are ISO timestamps or dates; their first ten characters are the day
+        if start_date and day < start_date[:10]:
+            continue
+        if end_date and day > end_date[:10]:
+            continue
+        partitions.append((day, os.path.join(log_dir, name)))
+    partitions.sort(reverse=True)
+    return partitions
+
+
+def init_partition(conn: sqlite3.Connection, time_column: str):
+    """Create the logs table, its indexes, full-text index and rollup in a partition."""
+    # readers of the log endpoints do not block the writer
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {time_column} TEXT NOT NULL,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            module TEXT NOT NULL,
+            funcName TEXT,
+            lineno INTEGER
+        )
+    """)
+    # saga context of the row; added to partitions written before it existed
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(logs)")}
+    for column in CONTEXT_COLUMNS:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE logs ADD COLUMN {column} TEXT")
+    # newest-first listing, optionally filtered by level or module
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_logs_{time_column} ON logs ({time_column})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_logs_level_{time_column} ON logs (level, {time_column})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_logs_module_{time_column} ON logs (module, {time_column})")
+    # all logs of one saga; most rows outside a saga have no transaction_id and stay out of it
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_logs_transaction_id ON logs (transaction_id, {time_column}) "
+        "WHERE transaction_id IS NOT NULL"
+    )
+    # full-text index over message, kept in sync with the table by triggers
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+            message, content='logs', content_rowid='id'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN
+            INSERT INTO logs_fts (rowid, message) VALUES (new.id, new.message);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN
+            INSERT INTO logs_fts (logs_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        END
+    """)
+    # per-(hour, level, module) counters for /logs/stats, maintained by the writer
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs_rollup (
+            hour TEXT NOT NULL,
+            level TEXT NOT NULL,
+            module TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (hour, level, module)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+
+def open_partition(log_dir: str, day: str, time_column: str) -> sqlite3.Connection:
+    """
+    Connection for writing to the day's partition, created if needed. It may be
+    used from another thread than the one opening it, e.g. closed at shutdown.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    conn = sqlite3.connect(partition_path(log_dir, day), check_same_thread=False)
+    init_partition(conn, time_column)
+    return conn
+
+
+def upgrade_partitions(log_dir: str, time_column: str) -> list[str]:
+    """Bring partitions written by an earlier version to the current schema; returns their days."""
+    upgraded = []
+    for day, path in list_partitions(log_dir):
+        conn = sqlite3.connect(path)
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(logs)")}
+            if not set(CONTEXT_COLUMNS) <= columns:
+                init_partition(conn, time_column)
+                upgraded.append(day)
+        finally:
+            conn.close()
+    return upgraded
+
+
+def connect_partition(path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Read-only connection to an existing partition. check_same_thread=False for
+    a connection read from several threads in turn, like a streamed response.
+    """
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=check_same_thread)
+
+
+def utc_today() -> date:
+    """The day of the partition written now; rows are stored with UTC timestamps."""
+    return datetime.utcnow().date()
+
+
+def drop_expired_partitions(log_dir: str, retention_days: int = config.LOG_RETENTION_DAYS,
+                            today: date | None = None) -> list[str]:
+    """Delete the partitions older than retention_days; returns their days."""
+    if retention_days <= 0:
+        return []
+    cutoff = ((today or utc_today()) - timedelta(days=retention_days)).isoformat()
+    dropped = []
+    for day, path in list_partitions(log_dir, end_date=cutoff):
+        if day >= cutoff:
+            continue
+        read_pool.discard(path)
+        for suffix in ("-wal", "-shm", ""):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+        dropped.append(day)
+    return dropped
+
+
+def compact_partitions(log_dir: str, today: date | None = None) -> list[str]:
+    """
+    VACUUM the partitions that are closed, i.e. older than yesterday (late
+    records may still reach yesterday's), and that were not compacted before.
+    Returns their days.
+    """
+    last_open = ((today or utc_today()) - timedelta(days=1)).isoformat()
+    compacted = []
+    for day, path in list_partitions(log_dir):
+        if day >= last_open:
+            continue
+        conn = sqlite3.connect(path)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= COMPACTED:
+                continue
+            conn.execute("VACUUM")
+            conn.execute(f"PRAGMA user_version = {COMPACTED}")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            compacted.append(day)
+        finally:
+            conn.close()
+    return compacted
+
+
+class PartitionMaintenance:
+    """
+    Background thread applying retention and compaction every interval seconds,
+    so neither a DELETE over the logs nor a VACUUM runs on a request. What it
+    did, and its failures, go to log(message, level) with level "INFO" or
+    "ERROR", i.e. to the service's own logger.
+    """
+    def __init__(self, log_dir: str, log: Callable[[str, str], None],
+                 retention_days: int = config.LOG_RETENTION_DAYS,
+                 interval: float = config.LOG_MAINTENANCE_INTERVAL):
+        self.log_dir = log_dir
+        self.log = log
+        self.retention_days = retention_days
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> tuple[list[str], list[str]]:
+        """Apply retention, then compact; returns the days dropped and compacted."""
+        dropped = drop_expired_partitions(self.log_dir, self.retention_days)
+        if dropped:
+            self.log(f"Dropped {len(dropped)} expired log partitions: {', '.join(dropped)}", "INFO")
+        compacted = compact_partitions(self.log_dir)
+        if compacted:
+            self.log(f"Compacted {len(compacted)} log partitions: {', '.join(compacted)}", "INFO")
+        return dropped, compacted
+
+    def run(self):
+        """Run once at start-up, then every interval until stopped."""
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.log(f"Log maintenance failed: {str(e)}", "ERROR")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="log-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
@@ -0,0 +1,188 @@
+"""
+Building blocks of the log endpoints: the filters, keyset cursors and
+full-text queries of GET /logs/, its counts, the streamed export, and
+read_log_page for reading a service's log directory from another one.
+"""
+import base64
+import csv
+import io
+import json
+import re
+import sqlite3
+import zlib
+from typing import Callable, Optional
+from . import config
+from .partitions import connect_partition, list_partitions
+from .reader import read_pool
+
+
+def encode_cursor(time_value: str, log_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{time_value}|{log_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """(time, id) of the last row of the previous page; ValueError when cursor is not a valid cursor."""
+    time_value, separator, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().rpartition("|")
+    if not separator:
+        raise ValueError("Invalid cursor")
+    return time_value, int(log_id)
+
+
+def fts_query(search: str) -> str:
+    """
+    Turn the search parameter into an FTS5 query: "quoted text" matches the
+    phrase, a trailing * matches words starting with it, and all terms must
+    appear. Every term is quoted, so FTS5 operators in the input are literal.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', search):
+        prefix = not phrase and word.endswith("*")
+        text = phrase or word.rstrip("*")
+        if text.strip():
+            terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def log_filters(time_column: str, level: str | None = None, start_date: str | None = None,
+                end_date: str | None = None, module: str | None = None) -> tuple[list[str], list]:
+    """WHERE conditions and their parameters for the level, date range and module filters."""
+    conditions = []
+    params = []
+    if level:
+        conditions.append("level = ?")
+        params.append(level.upper())
+    if start_date:
+        conditions.append(f"{time_column} >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append(f"{time_column} <= ?")
+        params.append(end_date)
+    if module:
+        conditions.append("module = ?")
+        params.append(module)
+    return conditions, params
+
+
+def count_logs(cursor: sqlite3.Cursor, from_clause: str, where_clause: str, params: list,
+               mode: str) -> tuple[Optional[int], bool]:
+    """
+    Count the logs matching the filters; returns (total, is_estimate).
+    "approximate" takes the id range when unfiltered and stops counting
+    filtered rows at LOG_COUNT_SCAN_LIMIT, so it stays cheap on large tables.
+    """
+    if mode == "none":
+        return None, False
+    if mode == "exact":
+        cursor.execute("SELECT COUNT(*)" + from_clause + where_clause, params)
+        return cursor.fetchone()[0], False
+    if not where_clause:
+        # separate subqueries, so each is a single rowid lookup
+        cursor.execute("SELECT (SELECT MIN(id) FROM logs), (SELECT MAX(id) FROM logs)")
+        first_id, last_id = cursor.fetchone()
+        return (last_id - first_id + 1 if last_id is not None else 0), True
+    cursor.execute(
+        "SELECT COUNT(*) FROM (SELECT 1" + from_clause + where_clause + " LIMIT ?)",
+        params + [config.LOG_COUNT_SCAN_LIMIT + 1]
+    )
+    total = cursor.fetchone()[0]
+    if total > config.LOG_COUNT_SCAN_LIMIT:
+        return config.LOG_COUNT_SCAN_LIMIT, True
+    return total, False
+
+
+def export_chunks(partitions: list, columns: str, fields: tuple, time_column: str, where_clause: str,
+                  params: list, fmt: str, compress: bool,
+                  on_error: Callable[[Exception], None] | None = None):
+    """
+    The encoded export of the columns (named fields in the output), oldest
+    first. Rows are read off each partition's cursor LOG_EXPORT_BATCH_SIZE at a
+    time and written out as they come, so memory stays flat however many rows
+    match. A failure is passed to on_error before it is raised.
+    """
+    # wbits=31 writes a gzip container
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+
+    try:
+        if fmt == "csv":
+            writer.writerow(fields)
+            yield encode(buffer.getvalue())
+        for _, path in reversed(partitions):
+            conn = connect_partition(path, check_same_thread=False)
+            try:
+                db_cursor = conn.execute(
+                    "SELECT " + columns + " FROM logs" + where_clause + f" ORDER BY {time_column}, id",
+                    params
+                )
+                while True:
+                    rows = db_cursor.fetchmany(config.LOG_EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    if fmt == "csv":
+                        buffer.seek(0)
+                        buffer.truncate()
+                        writer.writerows(rows)
+                        chunk = encode(buffer.getvalue())
+                    else:
+                        chunk = encode("".join(
+                            json.dumps(dict(zip(fields, row)), separators=(",", ":")) + "\n" for row in rows
+                        ))
+                    # the compressor holds back data until it has a full block
+                    if chunk:
+                        yield chunk
+            finally:
+                conn.close()
+        if compressor:
+            yield compressor.flush()
+    except Exception as e:
+        # the status line is already sent, so the client sees a truncated download
+        if on_error:
+            on_error(e)
+        raise
+
+
+def read_log_page(log_dir: str, time_column: str, level: str | None = None,
+                  start_date: str | None = None, end_date: str | None = None, module: str | None = None,
+                  fts_query: str = "", after: tuple[str, int] | None = None, limit: int = 50) -> list[tuple]:
+    """
+    Up to limit (id, time, level, message, module, funcName, lineno) rows of the
+    partitions in log_dir, newest first and continuing below after=(time, id)
+    when given; search matches come in id order, like on /logs. Only keyset
+    paging and no counts, for reading any service's log directory by its time
+    column.
+    """
+    conditions, params = log_filters(time_column, level, start_date, end_date, module)
+    from_clause = " FROM logs"
+    if fts_query:
+        from_clause = " FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid"
+        conditions.append("logs_fts MATCH ?")
+        params.append(fts_query)
+        order_by = "logs_fts.rowid DESC"
+        keyset = ("logs_fts.rowid < ?", after[1:] if after else None)
+    else:
+        order_by = f"{time_column} DESC, id DESC"
+        keyset = (f"({time_column}, id) < (?, ?)", after)
+
+    rows = []
+    for day, path in list_partitions(log_dir, start_date, end_date):
+        if after and day > after[0][:10]:
+            continue
+        day_conditions, day_params = list(conditions), list(params)
+        if after and day == after[0][:10]:
+            day_conditions.append(keyset[0])
+            day_params.extend(keyset[1])
+        where_clause = " WHERE " + " AND ".join(day_conditions) if day_conditions else ""
+        with read_pool.connection(path) as conn:
+            rows.extend(conn.execute(
+                f"SELECT logs.id, logs.{time_column}, logs.level, logs.message, logs.module, logs.funcName, logs.lineno"
+                + from_clause + where_clause + f" ORDER BY {order_by} LIMIT ?",
+                day_params + [limit - len(rows)]
+            ).fetchall())
+        if len(rows) == limit:
+            break
+    return rows
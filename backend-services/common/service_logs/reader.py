@@ -0,0 +1,130 @@
+"""
+Log queries.
+
+The log endpoints run on LOG_QUERY_THREADS threads of their own (see
+log_query), not on the thread pool that serves the other endpoints, so a heavy
+log query waits for a log thread instead of holding up the service's own
+requests. Their SQLite reads go through read_pool: read-only connections to
+the daily partitions, kept open between requests, with query_only and
+memory-mapped I/O, and interrupted once the request has run for
+LOG_QUERY_TIMEOUT seconds.
+"""
+import asyncio
+import functools
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from . import config
+
+# SQLite virtual machine steps between two checks of the deadline
+PROGRESS_STEPS = 10000
+
+
+class LogQueryTimeout(Exception):
+    pass
+
+
+# deadline of the log query running on this thread, set by run_log_query()
+_query = threading.local()
+
+
+class ReadPool:
+    """Idle read-only partition connections, at most size of them, the least recently used closed first."""
+    def __init__(self, size: int = config.LOG_READ_POOL_SIZE, mmap_size: int = config.LOG_READ_MMAP_SIZE):
+        self.size = size
+        self.mmap_size = mmap_size
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        return conn
+
+    def _take(self, path: str) -> sqlite3.Connection:
+        with self._lock:
+            for entry in reversed(self._idle):
+                if entry[0] == path:
+                    self._idle.remove(entry)
+                    return entry[1]
+        return self._open(path)
+
+    def _release(self, path: str, conn: sqlite3.Connection):
+        with self._lock:
+            self._idle.append((path, conn))
+            evicted = self._idle.popleft()[1] if len(self._idle) > self.size else None
+        if evicted:
+            evicted.close()
+
+    @contextmanager
+    def connection(self, path: str):
+        """
+        A connection to the partition at path for the duration of the block.
+        Inside run_log_query(), a query still running at the deadline raises
+        LogQueryTimeout.
+        """
+        conn = self._take(path)
+        deadline = getattr(_query, "deadline", None)
+        if deadline is not None:
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+        failed = False
+        try:
+            yield conn
+        except sqlite3.Error as e:
+            failed = True
+            if isinstance(e, sqlite3.OperationalError) and deadline is not None and time.monotonic() > deadline:
+                raise LogQueryTimeout(f"Log query exceeded {config.LOG_QUERY_TIMEOUT}s") from e
+            raise
+        finally:
+            if failed:
+                conn.close()
+            else:
+                conn.set_progress_handler(None, 0)
+                self._release(path, conn)
+
+    def discard(self, path: str):
+        """Close the idle connections to a partition, e.g. before its file is deleted."""
+        with self._lock:
+            entries = [entry for entry in self._idle if entry[0] == path]
+            for entry in entries:
+                self._idle.remove(entry)
+        for _, conn in entries:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            entries, self._idle = list(self._idle), deque()
+        for _, conn in entries:
+            conn.close()
+
+
+read_pool = ReadPool()
+
+_executor = ThreadPoolExecutor(max_workers=config.LOG_QUERY_THREADS, thread_name_prefix="log-query")
+
+
+def _run_with_deadline(func, *args, **kwargs):
+    _query.deadline = time.monotonic() + config.LOG_QUERY_TIMEOUT
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _query.deadline = None
+
+
+async def run_log_query(func, *args, **kwargs):
+    """Run func on a log query thread, with read_pool queries limited to LOG_QUERY_TIMEOUT seconds."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor, functools.partial(_run_with_deadline, func, *args, **kwargs)
+    )
+
+
+def log_query(func):
+    """Turn a sync log endpoint into an async one that runs it through run_log_query()."""
+    @functools.wraps(func)
+    async def endpoint(*args, **kwargs):
+        return await run_log_query(func, *args, **kwargs)
+    return endpoint
@@ -0,0 +1,417 @@
+"""
+The /logs endpoints of the order and payment services, built once for both by
+logs_router(). Their rows keep their time in the "created" column.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Sequence
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from . import config
+from .partitions import list_partitions
+from .query import encode_cursor, decode_cursor, fts_query, log_filters, count_logs, export_chunks
+from .reader import read_pool, log_query, LogQueryTimeout
+from .tail import LogTail
+
+
+class LogEntry(BaseModel):
+    id: int
+    created: str
+    level: str
+    message: str
+    module: str
+    funcName: str
+    lineno: int
+    # saga context the record was logged in
+    transaction_id: Optional[str] = None
+    order_id: Optional[str] = None
+    payment_id: Optional[str] = None
+    event: Optional[str] = None
+    # message with the search matches wrapped in <mark></mark>, when highlight is set
+    highlighted_message: Optional[str] = None
+
+class LogStats(BaseModel):
+    total_logs: int
+    level_counts: dict
+    recent_errors_24h: int
+    module_counts: dict
+    dropped_logs: int = 0
+
+LOG_ENTRY_COLUMNS = (
+    "logs.id, logs.created, logs.level, logs.message, logs.module, logs.funcName, logs.lineno, "
+    "logs.transaction_id, logs.order_id, logs.payment_id, logs.event"
+)
+
+EXPORT_FIELDS = (
+    "id", "created", "level", "message", "module", "funcName", "lineno",
+    "transaction_id", "order_id", "payment_id", "event"
+)
+
+# rows published to the tail have no id yet
+TAIL_FIELDS = EXPORT_FIELDS[1:]
+
+
+def log_entry(row: tuple) -> LogEntry:
+    """LogEntry of a row selected with LOG_ENTRY_COLUMNS."""
+    return LogEntry(**dict(zip(EXPORT_FIELDS, row)))
+
+
+def logs_router(service: str, log_dir: str, log: Callable[[str, str], None], dropped_records: Callable[[], int],
+                log_tail: Callable[[], LogTail], dependencies: Sequence = ()) -> APIRouter:
+    """
+    Router with the /logs endpoints over the daily partitions in log_dir of
+    the service, whose name goes in the file name of the exports. Errors are
+    reported through log(message, level); dropped_records() is the number of
+    records the service's writer lost, for /logs/stats, and log_tail() the
+    feed of the rows it writes, for /logs/tail. dependencies (the admin
+    authentication) apply to every endpoint.
+    """
+    router = APIRouter(
+        prefix="/logs",
+        tags=["logs"],
+        dependencies=list(dependencies)
+    )
+
+    @router.get("/", response_model=List[LogEntry])
+    @log_query
+    def get_logs(
+        response: Response,
+        level: Optional[str] = Query(None, description="Filter logs by level (INFO, WARNING, ERROR)"),
+        start_date: Optional[str] = Query(None, description="Filter logs from this date (ISO format)"),
+        end_date: Optional[str] = Query(None, description="Filter logs until this date (ISO format)"),
+        module: Optional[str] = Query(None, description="Filter logs by module name"),
+        search: Optional[str] = Query(None, description='Full-text search in log messages: words, "exact phrases" and prefix* terms'),
+        highlight: bool = Query(False, description="Return the message with the search matches marked"),
+        page: int = Query(1, description="Page number", ge=1),
+        page_size: int = Query(50, description="Number of logs per page", ge=1, le=1000),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page; takes precedence over page"),
+        count: str = Query("exact", description="Total count: exact, approximate or none", pattern="^(exact|approximate|none)$")
+    ):
+        """
+        Retrieve logs with optional filtering by level, date range, module, and search term.
+        Supports offset pagination and, for deep pages, keyset pagination: the
+        X-Next-Cursor response header, passed back as ?cursor=, continues below the
+        last row. The total goes in X-Total-Count (with X-Total-Is-Estimate) unless
+        count is none.
+        Search results are ordered by id, i.e. the order the logs were written in.
+        """
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            # Base query
+            query = "SELECT " + LOG_ENTRY_COLUMNS
+            from_clause = " FROM logs"
+
+            # Add filters if provided
+            conditions, params = log_filters("created", level, start_date, end_date, module)
+
+            search_query = fts_query(search) if search else ""
+            if search_query:
+                # driven by the full-text index: matches come newest (highest id) first,
+                # so a page stops after page_size matches instead of sorting all of them
+                from_clause = " FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid"
+                if highlight:
+                    query += ", highlight(logs_fts, 0, '<mark>', '</mark>')"
+                conditions.append("logs_fts MATCH ?")
+                params.append(search_query)
+                order_by = "logs_fts.rowid DESC"
+                keyset = ("logs_fts.rowid < ?", after[1:] if after else None)
+            else:
+                # id breaks ties between equal timestamps
+                order_by = "created DESC, id DESC"
+                keyset = ("(created, id) < (?, ?)", after)
+
+            # Combine conditions
+            where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+            # Only the daily partitions inside the date range are opened, newest first;
+            # a cursor resumes in the partition of the last row of the previous page
+            partitions = list_partitions(log_dir, start_date, end_date)
+            if after:
+                partitions = [(day, path) for day, path in partitions if day <= after[0][:10]]
+
+            total_count = None if count == "none" else 0
+            total_is_estimate = False
+            logs = []
+            offset = 0 if after else (page - 1) * page_size
+            for day, path in partitions:
+                if count == "none" and len(logs) == page_size:
+                    break
+                with read_pool.connection(path) as conn:
+                    db_cursor = conn.cursor()
+
+                    # Get total count
+                    matched, estimate = count_logs(db_cursor, from_clause, where_clause, params, count)
+                    if matched is not None:
+                        total_count += matched
+                        total_is_estimate = total_is_estimate or estimate
+                    if len(logs) == page_size:
+                        continue
+
+                    day_where, day_params = where_clause, list(params)
+                    if after and day == after[0][:10]:
+                        # keyset: continue below the last row of the previous page using the indexes
+                        day_where = " WHERE " + " AND ".join(conditions + [keyset[0]])
+                        day_params.extend(keyset[1])
+                    elif offset:
+                        # skip whole partitions that lie above the requested page
+                        if count != "exact":
+                            matched, _ = count_logs(db_cursor, from_clause, where_clause, params, "exact")
+                        if matched <= offset:
+                            offset -= matched
+                            continue
+
+                    # Add ordering and pagination
+                    db_cursor.execute(
+                        query + from_clause + day_where + f" ORDER BY {order_by} LIMIT ? OFFSET ?",
+                        day_params + [page_size - len(logs), offset]
+                    )
+                    offset = 0
+                    logs.extend(db_cursor.fetchall())
+
+            log_entries = [log_entry(log[:11]) for log in logs]
+            if highlight and search_query:
+                for entry, log in zip(log_entries, logs):
+                    entry.highlighted_message = log[11]
+
+            # the body stays a list of entries; the paging details go in headers
+            if len(logs) == page_size:
+                response.headers["X-Next-Cursor"] = encode_cursor(logs[-1][1], logs[-1][0])
+            if total_count is not None:
+                response.headers["X-Total-Count"] = str(total_count)
+                response.headers["X-Total-Is-Estimate"] = "true" if total_is_estimate else "false"
+            return log_entries
+
+        except LogQueryTimeout as e:
+            log(f"Error retrieving logs: {str(e)}", "WARNING")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            log(f"Error retrieving logs: {str(e)}", "ERROR")
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while retrieving logs: {str(e)}"
+            )
+
+    @router.get("/export")
+    def export_logs(
+        level: Optional[str] = Query(None, description="Filter logs by level (INFO, WARNING, ERROR)"),
+        start_date: Optional[str] = Query(None, description="Filter logs from this date (ISO format)"),
+        end_date: Optional[str] = Query(None, description="Filter logs until this date (ISO format)"),
+        module: Optional[str] = Query(None, description="Filter logs by module name"),
+        fmt: str = Query("ndjson", alias="format", description="ndjson or csv", pattern="^(ndjson|csv)$"),
+        gzip: bool = Query(False, description="Compress the download with gzip")
+    ):
+        """
+        Download all the logs matching the filters, oldest first, as NDJSON (one
+        JSON object per line) or CSV. The rows are streamed from the log files as
+        they are read instead of being collected first. Admin access only.
+        """
+        conditions, params = log_filters("created", level, start_date, end_date, module)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        filename = f"{service}-logs.{fmt}" + (".gz" if gzip else "")
+        return StreamingResponse(
+            export_chunks(
+                list_partitions(log_dir, start_date, end_date), LOG_ENTRY_COLUMNS, EXPORT_FIELDS, "created",
+                where_clause, params, fmt, gzip,
+                on_error=lambda e: log(f"Error exporting logs: {str(e)}", "ERROR")
+            ),
+            media_type="application/gzip" if gzip else ("text/csv" if fmt == "csv" else "application/x-ndjson"),
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    @router.get("/tail")
+    async def tail_logs(
+        request: Request,
+        level: Optional[str] = Query(None, description="Only logs of this level (INFO, WARNING, ERROR)"),
+        module: Optional[str] = Query(None, description="Only logs of this module"),
+        search: Optional[str] = Query(None, description="Only logs whose message contains this text (case-insensitive)")
+    ):
+        """
+        Follow the logs as they are written, as Server-Sent Events: one "data" event
+        with a JSON log per new row matching the filters. Rows come from the log
+        writer, not from SQLite. A client that reads too slowly loses the oldest
+        rows beyond LOG_TAIL_BUFFER_SIZE, reported in a "dropped" event. Admin access only.
+        """
+        tail = log_tail()
+        subscriber = tail.subscribe(asyncio.get_running_loop(), level, module, search)
+
+        async def events():
+            try:
+                while not await request.is_disconnected():
+                    rows, dropped = await subscriber.next_rows(config.LOG_TAIL_KEEPALIVE)
+                    chunk = ""
+                    if dropped:
+                        chunk += f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                    chunk += "".join(
+                        "data: " + json.dumps(dict(zip(TAIL_FIELDS, row)), separators=(",", ":")) + "\n\n" for row in rows
+                    )
+                    # a comment keeps proxies from closing an idle stream
+                    yield chunk or ": keep-alive\n\n"
+            except Exception as e:
+                log(f"Error tailing logs: {str(e)}", "ERROR")
+                raise
+            finally:
+                tail.unsubscribe(subscriber)
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @router.get("/transaction/{transaction_id}", response_model=List[LogEntry])
+    @log_query
+    def get_transaction_logs(
+        transaction_id: str,
+        limit: int = Query(1000, description="Maximum number of logs to return", ge=1, le=10000)
+    ):
+        """
+        Retrieve the logs written for one saga transaction, oldest first. Each daily
+        partition answers from its transaction_id index.
+        """
+        try:
+            logs = []
+            # oldest partition first, so the saga reads in order
+            for _, path in reversed(list_partitions(log_dir)):
+                with read_pool.connection(path) as conn:
+                    logs.extend(conn.execute(
+                        "SELECT " + LOG_ENTRY_COLUMNS + " FROM logs WHERE transaction_id = ? "
+                        "ORDER BY created, id LIMIT ?",
+                        (transaction_id, limit - len(logs))
+                    ).fetchall())
+                if len(logs) == limit:
+                    break
+
+            return [log_entry(log) for log in logs]
+
+        except LogQueryTimeout as e:
+            log(f"Error retrieving logs of transaction {transaction_id}: {str(e)}", "WARNING")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            log(f"Error retrieving logs of transaction {transaction_id}: {str(e)}", "ERROR")
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while retrieving logs of transaction {transaction_id}: {str(e)}"
+            )
+
+    @router.get("/levels", response_model=List[str])
+    @log_query
+    def get_log_levels():
+        """
+        Retrieve all log levels that have been used in the logs.
+        """
+        try:
+            levels = set()
+            for _, path in list_partitions(log_dir):
+                with read_pool.connection(path) as conn:
+                    # the rollup has one row per hour, level and module, far fewer than logs
+                    levels.update(row[0] for row in conn.execute("SELECT DISTINCT level FROM logs_rollup"))
+            return sorted(levels)
+        except LogQueryTimeout as e:
+            log(f"Error retrieving log levels: {str(e)}", "WARNING")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            log(f"Error retrieving log levels: {str(e)}", "ERROR")
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while retrieving log levels: {str(e)}"
+            )
+
+    @router.get("/modules", response_model=List[str])
+    @log_query
+    def get_modules():
+        """
+        Retrieve all modules that have generated logs.
+        """
+        try:
+            modules = set()
+            for _, path in list_partitions(log_dir):
+                with read_pool.connection(path) as conn:
+                    # the rollup has one row per hour, level and module, far fewer than logs
+                    modules.update(row[0] for row in conn.execute("SELECT DISTINCT module FROM logs_rollup"))
+            return sorted(modules)
+        except LogQueryTimeout as e:
+            log(f"Error retrieving modules: {str(e)}", "WARNING")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            log(f"Error retrieving modules: {str(e)}", "ERROR")
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while retrieving modules: {str(e)}"
+            )
+
+    @router.get("/stats", response_model=LogStats)
+    @log_query
+    def get_log_stats():
+        """
+        Get statistics about the logs (count by level, recent errors, module counts, etc.).
+        """
+        try:
+            level_counts = {}
+            module_counts = {}
+            recent_errors = 0
+            # exactly 24 hours back, in UTC like the log timestamps
+            since = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None).isoformat()
+
+            # Level and module counts come from the hourly rollup each daily partition keeps,
+            # not from the logs tables
+            for day, path in list_partitions(log_dir):
+                with read_pool.connection(path) as conn:
+                    cursor = conn.cursor()
+
+                    # Get count by level
+                    cursor.execute("""
+                        SELECT level, SUM(count)
+                        FROM logs_rollup
+                        GROUP BY level
+                    """)
+                    for level, level_count in cursor.fetchall():
+                        level_counts[level] = level_counts.get(level, 0) + level_count
+
+                    # Get count by module
+                    cursor.execute("""
+                        SELECT module, SUM(count)
+                        FROM logs_rollup
+                        GROUP BY module
+                    """)
+                    for module, module_count in cursor.fetchall():
+                        module_counts[module] = module_counts.get(module, 0) + module_count
+
+                    # Get recent errors (last 24 hours); from the (level, created) index of logs,
+                    # as whole rollup hours would reach up to 25 hours back
+                    if day >= since[:10]:
+                        cursor.execute("""
+                            SELECT COUNT(*)
+                            FROM logs
+                            WHERE level = 'ERROR' AND created >= ?
+                        """, (since,))
+                        recent_errors += cursor.fetchone()[0]
+
+
+            # Get total log count
+            total_logs = sum(level_counts.values())
+
+            return LogStats(
+                total_logs=total_logs,
+                level_counts=level_counts,
+                recent_errors_24h=recent_errors,
+                module_counts=module_counts,
+                dropped_logs=dropped_records()
+            )
+
+        except LogQueryTimeout as e:
+            log(f"Error retrieving log statistics: {str(e)}", "WARNING")
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            log(f"Error retrieving log statistics: {str(e)}", "ERROR")
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while retrieving log statistics: {str(e)}"
+            )
+
+    return router
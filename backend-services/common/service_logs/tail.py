@@ -0,0 +1,94 @@
+"""
+Live log tail.
+
+The log writer hands every batch it has committed to LogTail.publish(), which
+copies the rows matching each subscriber's filters into that subscriber's
+buffer and wakes its event loop. GET /logs/tail streams them from there, so
+following the logs never queries SQLite. A buffer holds at most buffer_size
+rows: when its client falls behind, the oldest rows are dropped and counted
+instead of memory growing.
+"""
+import asyncio
+import threading
+from collections import deque
+from . import config
+
+
+class TailSubscriber:
+    """One tail client: its filters and the rows matched since it last read."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, level: str | None = None, module: str | None = None,
+                 search: str | None = None, buffer_size: int = config.LOG_TAIL_BUFFER_SIZE):
+        self.level = level.upper() if level else None
+        self.module = module
+        self.search = search.lower() if search else None
+        self.rows = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._notified = False
+        self._lock = threading.Lock()
+
+    def matches(self, row: tuple) -> bool:
+        """row is (time, level, message, module, ...) as written to the logs table."""
+        return (
+            (not self.level or row[1] == self.level)
+            and (not self.module or row[3] == self.module)
+            and (not self.search or self.search in row[2].lower())
+        )
+
+    def push(self, rows: list):
+        """Called on the writer thread."""
+        matched = [row for row in rows if self.matches(row)]
+        if not matched:
+            return
+        with self._lock:
+            self.dropped += max(0, len(self.rows) + len(matched) - self.rows.maxlen)
+            self.rows.extend(matched)
+            if self._notified:
+                return
+            self._notified = True
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # the subscriber's event loop is closed
+            pass
+
+    async def next_rows(self, timeout: float) -> tuple[list, int]:
+        """Wait up to timeout seconds for rows; returns them and how many were dropped since the last call."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._lock:
+            self._ready.clear()
+            self._notified = False
+            rows = list(self.rows)
+            self.rows.clear()
+            dropped, self.dropped = self.dropped, 0
+        return rows, dropped
+
+
+class LogTail:
+    def __init__(self):
+        # replaced, never mutated, so publish() reads it without a lock
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, level: str | None = None, module: str | None = None,
+                  search: str | None = None) -> TailSubscriber:
+        subscriber = TailSubscriber(loop, level, module, search)
+        with self._lock:
+            self._subscribers += (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber: TailSubscriber):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+
+    def publish(self, rows: list):
+        """Offer committed rows to every subscriber; a no-op when nobody is tailing."""
+        for subscriber in self._subscribers:
+            subscriber.push(rows)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
@@ -0,0 +1,8 @@
+"""
+Unit tests import service_logs from this directory, whether or not it is
+installed.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
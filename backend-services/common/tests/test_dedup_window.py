@@ -0,0 +1,85 @@
+import asyncio
+import fakeredis
+import pytest
+import redis
+from message_dedup.window import DedupWindow, AsyncDedupWindow, message_key
+
+
+class DownRedis:
+    """A Redis client whose every command fails."""
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            raise redis.ConnectionError("Redis is down")
+        return command
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def discard(message: str, level: str):
+    pass
+
+
+def test_marked_message_is_seen(redis_server):
+    window = DedupWindow("orchestration_queue", fakeredis.FakeRedis(server=redis_server), discard, ttl=60)
+    assert not window.seen("m-1")
+    window.mark("m-1")
+
+    assert window.seen("m-1")
+    assert not window.seen("m-2")
+    assert 0 < window.client.ttl("processed:orchestration_queue:m-1") <= 60
+
+
+def test_mark_is_shared_through_redis(redis_server):
+    marking = DedupWindow("orchestration_queue", fakeredis.FakeRedis(server=redis_server), discard)
+    other_replica = DedupWindow("orchestration_queue", fakeredis.FakeRedis(server=redis_server), discard)
+    other_queue = DedupWindow("orders_queue", fakeredis.FakeRedis(server=redis_server), discard)
+    marking.mark("m-1")
+
+    assert other_replica.seen("m-1")
+    assert not other_queue.seen("m-1")
+
+
+def test_local_ids_are_bounded(redis_server):
+    window = DedupWindow("orchestration_queue", fakeredis.FakeRedis(server=redis_server), discard, local_size=2)
+    for message_id in ("m-1", "m-2", "m-3"):
+        window.mark(message_id)
+
+    assert "m-1" not in window.recent
+    assert "m-3" in window.recent
+    # still answered by Redis, which brings it back into the local window
+    assert window.seen("m-1") and "m-1" in window.recent
+
+
+def test_redis_errors_fail_open():
+    logged = []
+    window = DedupWindow("orchestration_queue", DownRedis(), lambda message, level: logged.append(level))
+    assert not window.seen("m-1")
+    window.mark("m-1")
+    # remembered locally even though Redis could not record it
+    assert window.seen("m-1")
+    assert logged == ["ERROR", "ERROR"]
+
+
+def test_async_window_shares_marks_with_the_sync_one(redis_server):
+    sync_window = DedupWindow("orchestration_queue", fakeredis.FakeRedis(server=redis_server), discard)
+    async_window = AsyncDedupWindow(
+        "orchestration_queue", fakeredis.aioredis.FakeRedis(server=redis_server), discard
+    )
+
+    async def check():
+        assert not await async_window.seen("m-1")
+        await async_window.mark("m-2")
+        sync_window.mark("m-1")
+        return await async_window.seen("m-1")
+
+    assert asyncio.run(check())
+    assert sync_window.seen("m-2")
+
+
+def test_message_key_falls_back_to_a_body_digest():
+    assert message_key({"message_id": "m-1"}, b"{}") == "m-1"
+    assert message_key({"event": "x"}, b'{"event": "x"}') == message_key({}, b'{"event": "x"}')
+    assert message_key({}, b"a").startswith("sha1:")
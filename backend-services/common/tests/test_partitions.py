@@ -0,0 +1,64 @@
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from service_logs.partitions import (
+    COMPACTED, compact_partitions, drop_expired_partitions, list_partitions, open_partition
+)
+
+
+@pytest.fixture
+def local_day_not_utc(monkeypatch):
+    """Runs the test with a local clock on another day than UTC, ahead or behind depending on the hour."""
+    utc_hour = datetime.utcnow().hour
+    # POSIX TZ names have the sign reversed: Etc/GMT-14 is 14 hours ahead of UTC
+    monkeypatch.setenv("TZ", "Etc/GMT-14" if utc_hour >= 12 else "Etc/GMT+12")
+    time.tzset()
+    assert datetime.now().date() != datetime.utcnow().date()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def days_ago(*days: int) -> list[str]:
+    return [(datetime.utcnow().date() - timedelta(days=n)).isoformat() for n in days]
+
+
+@pytest.fixture
+def write_days(tmp_path):
+    def write(*days: int) -> str:
+        for day in days_ago(*days):
+            open_partition(str(tmp_path), day, "created").close()
+        return str(tmp_path)
+    return write
+
+
+def test_compaction_leaves_the_utc_yesterday_open(local_day_not_utc, write_days):
+    log_dir = write_days(0, 1, 2)
+
+    assert compact_partitions(log_dir) == days_ago(2)
+
+
+def test_compaction_runs_once_per_partition(write_days):
+    log_dir = write_days(2, 3)
+    compact_partitions(log_dir)
+
+    assert compact_partitions(log_dir) == []
+    conn = open_partition(log_dir, days_ago(3)[0], "created")
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == COMPACTED
+    conn.close()
+
+
+def test_retention_counts_utc_days(local_day_not_utc, write_days):
+    log_dir = write_days(0, 2, 3)
+
+    assert drop_expired_partitions(log_dir, retention_days=2) == days_ago(3)
+    assert [day for day, _ in list_partitions(log_dir)] == days_ago(0, 2)
+    assert not [name for name in os.listdir(log_dir) if name.startswith(f"logs-{days_ago(3)[0]}")]
+
+
+def test_retention_of_zero_keeps_every_partition(write_days):
+    log_dir = write_days(0, 400)
+
+    assert drop_expired_partitions(log_dir, retention_days=0) == []
+    assert len(list_partitions(log_dir)) == 2
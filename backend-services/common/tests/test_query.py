@@ -0,0 +1,76 @@
+import pytest
+from service_logs import config
+from service_logs.partitions import open_partition
+from service_logs.query import count_logs, decode_cursor, encode_cursor, fts_query
+
+
+@pytest.mark.parametrize("search, query", [
+    ("payment failed", '"payment" "failed"'),
+    ('"payment failed" order', '"payment failed" "order"'),
+    ("transact*", '"transact"*'),
+    # FTS5 operators and syntax are searched for, not interpreted
+    ("stock AND NOT reserved", '"stock" "AND" "NOT" "reserved"'),
+    ("NEAR(a b) col:x ^start", '"NEAR(a" "b)" "col:x" "^start"'),
+    ('say "hi', '"say" """hi"'),
+    # nothing left to search for
+    ('"" * " "', ""),
+])
+def test_fts_query_quotes_every_term(search, query):
+    assert fts_query(search) == query
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_partition(str(tmp_path), "2020-01-01", "created")
+    conn.executemany(
+        "INSERT INTO logs (created, level, message, module) VALUES (?, ?, ?, ?)",
+        [
+            ("2020-01-01T00:00:01", "INFO", 'Reserved stock AND "payment" (col:x) for transaction abc', "saga"),
+            ("2020-01-01T00:00:02", "ERROR", "Payment failed", "saga"),
+            ("2020-01-01T00:00:03", "INFO", "Transaction abc completed", "saga"),
+        ]
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("search, matches", [
+    ('AND "payment" (col:x)', 1),
+    ("transact*", 2),
+    ('"payment failed"', 1),
+    ("NOT", 0),
+])
+def test_fts_query_runs_as_is_against_the_index(conn, search, matches):
+    rows = conn.execute("SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?", (fts_query(search),)).fetchall()
+
+    assert len(rows) == matches
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2020-01-01T00:00:01|odd", 42)
+
+    assert decode_cursor(cursor) == ("2020-01-01T00:00:01|odd", 42)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor("2020-01-01", 1)[:-4] + "!!!!", "MjAyMA=="])
+def test_invalid_cursor_is_a_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_count_modes(conn):
+    cursor = conn.cursor()
+    where, params = " WHERE level = ?", ["INFO"]
+
+    assert count_logs(cursor, " FROM logs", where, params, "none") == (None, False)
+    assert count_logs(cursor, " FROM logs", where, params, "exact") == (2, False)
+    assert count_logs(cursor, " FROM logs", where, params, "approximate") == (2, False)
+    # unfiltered, the id range stands in for a count
+    assert count_logs(cursor, " FROM logs", "", [], "approximate") == (3, True)
+
+
+def test_approximate_count_stops_at_the_scan_limit(conn, monkeypatch):
+    monkeypatch.setattr(config, "LOG_COUNT_SCAN_LIMIT", 1)
+
+    assert count_logs(conn.cursor(), " FROM logs", " WHERE level = ?", ["INFO"], "approximate") == (1, True)
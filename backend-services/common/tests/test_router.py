@@ -0,0 +1,176 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from service_logs import config
+from service_logs.partitions import ROLLUP_UPSERT, hourly_counts, open_partition
+from service_logs.router import logs_router
+from service_logs.tail import LogTail
+
+
+def write_logs(log_dir: str, *rows: tuple):
+    """Write (created, level, message, module) rows to their partitions, rollup included, as the handlers do."""
+    days = {}
+    for created, level, message, module in rows:
+        days.setdefault(created[:10], []).append((created, level, message, module, "func", 1, "tx-" + module))
+    for day, day_rows in days.items():
+        conn = open_partition(log_dir, day, "created")
+        with conn:
+            conn.executemany(
+                "INSERT INTO logs (created, level, message, module, funcName, lineno, transaction_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                day_rows
+            )
+            conn.executemany(ROLLUP_UPSERT, hourly_counts(day_rows))
+        conn.close()
+
+
+@pytest.fixture
+def logged(tmp_path):
+    log_dir = str(tmp_path)
+    write_logs(
+        log_dir,
+        ("2020-01-01T10:00:00", "INFO", "Order created", "orders"),
+        ("2020-01-01T11:00:00", "ERROR", "Payment failed", "payments"),
+        ("2020-01-02T09:00:00", "INFO", "Payment taken", "payments"),
+        ("2020-01-02T10:00:00", "WARNING", "Order delayed", "orders"),
+    )
+    return log_dir
+
+
+@pytest.fixture
+def client(logged):
+    app = FastAPI()
+    app.include_router(logs_router("order", logged, lambda message, level: None, lambda: 3, LogTail))
+    with TestClient(app) as client:
+        yield client
+
+
+def messages(response) -> list[str]:
+    assert response.status_code == 200, response.text
+    return [entry["message"] for entry in response.json()]
+
+
+def test_list_pages_newest_first_across_partitions(client):
+    first = client.get("/logs/", params={"page_size": 3})
+
+    assert messages(first) == ["Order delayed", "Payment taken", "Payment failed"]
+    assert first.headers["X-Total-Count"] == "4"
+    rest = client.get("/logs/", params={"page_size": 3, "cursor": first.headers["X-Next-Cursor"]})
+    assert messages(rest) == ["Order created"]
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_list_filters_and_searches(client):
+    assert messages(client.get("/logs/", params={"module": "orders"})) == ["Order delayed", "Order created"]
+    found = client.get("/logs/", params={"search": "payment", "highlight": True})
+    assert messages(found) == ["Payment taken", "Payment failed"]
+    assert found.json()[0]["highlighted_message"] == "<mark>Payment</mark> taken"
+
+
+def test_invalid_cursor_is_a_bad_request(client):
+    assert client.get("/logs/", params={"cursor": "not a cursor"}).status_code == 400
+
+
+def test_export_streams_the_matching_logs_oldest_first(client):
+    ndjson = client.get("/logs/export", params={"level": "INFO"})
+
+    assert ndjson.headers["content-disposition"] == 'attachment; filename="order-logs.ndjson"'
+    assert [json.loads(line)["message"] for line in ndjson.text.splitlines()] == ["Order created", "Payment taken"]
+    csv = client.get("/logs/export", params={"format": "csv", "module": "orders"})
+    assert [line.split(",")[3] for line in csv.text.splitlines()] == ["message", "Order created", "Order delayed"]
+
+
+def test_tail_streams_the_matching_rows_until_the_client_leaves(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOG_TAIL_KEEPALIVE", 0.05)
+    tail = LogTail()
+    app = FastAPI()
+    app.include_router(logs_router("order", str(tmp_path), lambda message, level: None, lambda: 0, lambda: tail))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/logs/tail", "raw_path": b"/logs/tail", "query_string": b"level=error", "root_path": "",
+        "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+
+    async def run():
+        left = asyncio.Event()
+        chunks = asyncio.Queue()
+
+        async def receive():
+            await left.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                await chunks.put(message.get("body", b"").decode())
+
+        request = asyncio.create_task(app(scope, receive, send))
+        while not len(tail):
+            await asyncio.sleep(0.01)
+        tail.publish([
+            ("2020-01-01T10:00:00", "INFO", "Order created", "orders", "func", 1, None, None, None, None),
+            ("2020-01-01T10:00:01", "ERROR", "Payment failed", "payments", "func", 2, "tx", None, None, None),
+        ])
+        chunk = ""
+        while not chunk.startswith("data:"):
+            chunk = await asyncio.wait_for(chunks.get(), 1)
+        left.set()
+        await asyncio.wait_for(request, 1)
+        return chunk
+
+    chunk = asyncio.run(run())
+    assert [json.loads(line[len("data: "):])["message"] for line in chunk.split("\n\n") if line] == ["Payment failed"]
+    assert not len(tail)
+
+
+def test_transaction_logs_read_oldest_first(client):
+    assert messages(client.get("/logs/transaction/tx-orders")) == ["Order created", "Order delayed"]
+    assert messages(client.get("/logs/transaction/tx-orders", params={"limit": 1})) == ["Order created"]
+    assert messages(client.get("/logs/transaction/unknown")) == []
+
+
+def test_levels_and_modules(client):
+    assert client.get("/logs/levels").json() == ["ERROR", "INFO", "WARNING"]
+    assert client.get("/logs/modules").json() == ["orders", "payments"]
+
+
+def test_stats_add_up_the_partitions(client):
+    stats = client.get("/logs/stats").json()
+
+    assert stats["total_logs"] == 4
+    assert stats["level_counts"] == {"INFO": 2, "ERROR": 1, "WARNING": 1}
+    assert stats["module_counts"] == {"orders": 2, "payments": 2}
+    assert stats["dropped_logs"] == 3
+
+
+def test_recent_errors_stop_exactly_24_hours_back(tmp_path):
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    write_logs(
+        str(tmp_path),
+        # in the rollup hour of the cutoff, but before it
+        (cutoff.replace(minute=0, second=0, microsecond=0).isoformat(), "ERROR", "Too old", "orders"),
+        ((cutoff + timedelta(minutes=1)).isoformat(), "ERROR", "Recent", "orders"),
+        ((cutoff + timedelta(minutes=1)).isoformat(), "INFO", "Recent, no error", "orders"),
+    )
+    app = FastAPI()
+    app.include_router(logs_router("order", str(tmp_path), lambda message, level: None, lambda: 0, LogTail))
+    with TestClient(app) as client:
+        stats = client.get("/logs/stats").json()
+
+    assert stats["level_counts"] == {"ERROR": 2, "INFO": 1}
+    assert stats["recent_errors_24h"] == 1
+
+
+def test_dependencies_guard_every_endpoint(logged):
+    def deny(request: Request):
+        raise HTTPException(status_code=401, detail="Authentication failed")
+
+    app = FastAPI()
+    app.include_router(logs_router("order", logged, lambda message, level: None, lambda: 0, LogTail, dependencies=[Depends(deny)]))
+    with TestClient(app) as client:
+        for route in app.routes:
+            if route.path.startswith("/logs"):
+                path = route.path.replace("{transaction_id}", "tx")
+                assert client.get(path).status_code == 401, path
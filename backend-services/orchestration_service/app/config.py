@@ -11,10 +11,36 @@ RABBITMQ_PRODUCTS_QUEUE = "products_queue"
 RABBITMQ_ORDERS_QUEUE = "orders_queue"
 RABBITMQ_PAYMENT_QUEUE = "payment_queue"
 RABBITMQ_ORCHESTRATION_QUEUE = "orchestration_queue"
+RABBITMQ_PUBLISHER_POOL_SIZE = int(os.getenv("RABBITMQ_PUBLISHER_POOL_SIZE", default=4))
+RABBITMQ_PUBLISHER_POOL_TIMEOUT = float(os.getenv("RABBITMQ_PUBLISHER_POOL_TIMEOUT", default=5))
+# "asyncio" consumes saga events on the event loop, "thread" uses the blocking pika consumer thread,
+# "sharded" spreads them over per-transaction shard queues and a pool of workers
+ORCHESTRATION_CONSUMER_MODE = os.getenv("ORCHESTRATION_CONSUMER_MODE", default="asyncio")
+# Number of shard queues across all orchestrator replicas; keep it fixed once deployed
+ORCHESTRATION_QUEUE_SHARDS = int(os.getenv("ORCHESTRATION_QUEUE_SHARDS", default=16))
+# Shards this replica consumes, e.g. "0-7" or "0,2,4"; empty means every shard
+ORCHESTRATION_OWNED_SHARDS = os.getenv("ORCHESTRATION_OWNED_SHARDS", default="")
+ORCHESTRATION_WORKERS = int(os.getenv("ORCHESTRATION_WORKERS", default=16))
+ORCHESTRATION_PREFETCH = int(os.getenv("ORCHESTRATION_PREFETCH", default=64))
 
 REDIS_HOST = os.getenv("REDIS_HOST", default="localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", default=6379))
 REDIS_DB = int(os.getenv("REDIS_DB", default=0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", default=50))
+
+# How long processed message ids are remembered (DEDUP_WINDOW_TTL, DEDUP_LOCAL_SIZE)
+# is read from the environment by message_dedup.config, the same in every service
+
+# order_id -> transaction_id mappings live in Redis as long as the saga itself;
+# cancellations of older orders look the order up in the order service
+ORDER_ID_MAPPING_TTL = int(os.getenv("ORDER_ID_MAPPING_TTL", default=600))
+
+# Seconds a saga may wait for the reply to its current step before it is rolled back
+SAGA_STEP_TIMEOUT = float(os.getenv("SAGA_STEP_TIMEOUT", default=120))
+SAGA_SWEEP_INTERVAL = float(os.getenv("SAGA_SWEEP_INTERVAL", default=1))
+SAGA_SWEEP_BATCH_SIZE = int(os.getenv("SAGA_SWEEP_BATCH_SIZE", default=500))
+# How long a claimed saga is held before another sweep may claim it again
+SAGA_SWEEP_LEASE = float(os.getenv("SAGA_SWEEP_LEASE", default=30))
 
 
 AUTHERIZATION_SERVER_HOST = os.getenv("AUTHERIZATION_SERVER_HOST",default="http://localhost")
@@ -22,3 +48,27 @@ AUTHORIZATION_SERVER_PORT = os.getenv("AUTHORIZATION_SERVER_PORT",default=5206)
 AUTHORIZATION_SERVER_CUSTOMER_ENDPOINT = "/Authentication/customer-policy"
 AUTHORIZATION_SERVER_VENDOR_ENDPOINT = "/Authentication/vendor-policy"
 AUTHORIZATION_SERVER_ADMIN_ENDPOINT = "/Authentication/admin-policy"
+
+ORDER_SERVICE_URL = os.getenv("ORDER_SERVICE_URL", default="http://localhost:8080")
+PAYMENT_SERVICE_URL = os.getenv("PAYMENT_SERVICE_URL", default="http://localhost:9001")
+
+# Log records are buffered in memory and written by a background thread in batches
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", default=10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", default=500))
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", default=200))
+# "drop" discards the oldest buffered record when the buffer is full, "block" waits for the writer
+# (blocking the event loop of async callers, so not allowed with ORCHESTRATION_CONSUMER_MODE "asyncio")
+LOG_OVERFLOW_POLICY = os.getenv("LOG_OVERFLOW_POLICY", default="drop")
+# Probability that a log call records module/function/line of the caller; 0 disables it
+LOG_CALLER_SAMPLE_RATE = float(os.getenv("LOG_CALLER_SAMPLE_RATE", default=1.0))
+# Logs are written to one SQLite file per day in this directory
+LOG_DIR = os.getenv("LOG_DIR", default="logs")
+# Retention, query, export and tail settings of the logs (LOG_RETENTION_DAYS, LOG_QUERY_TIMEOUT,
+# LOG_TAIL_KEEPALIVE, ...) are read from the environment by service_logs.config, the same in every service
+# GET /logs/all reads the order and payment logs over "http" (their /logs endpoints)
+# or as "files", when their LOG_DIRs are mounted into this container
+LOG_FANOUT_MODE = os.getenv("LOG_FANOUT_MODE", default="http")
+ORDER_LOG_DIR = os.getenv("ORDER_LOG_DIR", default="/shared-logs/order")
+PAYMENT_LOG_DIR = os.getenv("PAYMENT_LOG_DIR", default="/shared-logs/payment")
+# Seconds GET /logs/all waits for each source before returning without it
+LOG_FANOUT_SOURCE_TIMEOUT = float(os.getenv("LOG_FANOUT_SOURCE_TIMEOUT", default=2))
@@ -1,45 +1,274 @@
+import atexit
+import random
 import sqlite3
+import sys
 import threading
-from datetime import datetime
-import inspect
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import config
+from service_logs.partitions import CONTEXT_COLUMNS, ROLLUP_UPSERT, hourly_counts, open_partition, upgrade_partitions
+from service_logs.tail import LogTail
+
+# saga context attached to the log records of the current thread or asyncio task
+_log_context: ContextVar[dict | None] = ContextVar("log_context", default=None)
+
+def current_log_context() -> dict:
+    return _log_context.get() or {}
+
+@contextmanager
+def log_context(**fields):
+    """
+    Store fields (transaction_id, order_id, payment_id, event) with every record
+    logged inside the block, on top of the enclosing context. Fields set to
+    None are left out.
+    """
+    token = _log_context.set({
+        **current_log_context(), **{name: str(value) for name, value in fields.items() if value is not None}
+    })
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def bind_log_context(**fields):
+    """Add fields to the current context, until the enclosing log_context() block ends."""
+    _log_context.set({
+        **current_log_context(), **{name: str(value) for name, value in fields.items() if value is not None}
+    })
+
+def message_log_context(message: dict) -> dict:
+    """
+    Context of a RabbitMQ message: the sender's context from its log_context
+    envelope field, overridden by the ids and event the message itself carries.
+    """
+    context = dict(message.get("log_context") or {})
+    data = message.get("data") if isinstance(message.get("data"), dict) else {}
+    for field in ("transaction_id", "order_id", "payment_id"):
+        value = message.get(field) or data.get(field)
+        if value:
+            context[field] = str(value)
+    if message.get("event"):
+        context["event"] = message["event"]
+    return {name: value for name, value in context.items() if name in CONTEXT_COLUMNS}
+
 
 class SQLiteLogger:
-    def __init__(self, db_path="logs.db"):
-        self.db_path = db_path
+    """
+    Logs into daily SQLite partitions (see service_logs.partitions) without doing any
+    I/O on the caller's thread.
+
+    log() appends the record to a bounded in-memory buffer; a single writer
+    thread drains it and inserts up to batch_size records per transaction with
+    executemany, at least every flush_interval seconds. When the buffer is full
+    the "drop" policy discards the oldest buffered record (counted in
+    ``dropped``) and the "block" policy makes the caller wait for the writer.
+    That wait blocks the calling thread, so with "block" a full buffer also
+    stalls an event loop logging from async handlers; it is refused in the
+    asyncio consumer mode.
+
+    The context set with log_context() is stored with the record, in the
+    transaction_id, order_id, payment_id and event columns.
+
+    Committed rows are also published to ``tail``, for GET /logs/tail.
+
+    Caller attribution only keeps references to the calling frame's globals and
+    code object; module and function names, like the timestamp, are formatted
+    by the writer. Each call records it with probability caller_sample_rate
+    (1 for every call, 0 for none); the others are stored with module "unknown".
+    """
+    def __init__(self, log_dir=config.LOG_DIR, buffer_size=config.LOG_BUFFER_SIZE,
+                 batch_size=config.LOG_BATCH_SIZE, flush_interval=config.LOG_FLUSH_INTERVAL_MS / 1000,
+                 overflow_policy=config.LOG_OVERFLOW_POLICY,
+                 caller_sample_rate=config.LOG_CALLER_SAMPLE_RATE):
+        if overflow_policy not in ("drop", "block"):
+            raise ValueError(f"Unknown log overflow policy: {overflow_policy}")
+        if not 0 <= caller_sample_rate <= 1:
+            raise ValueError(f"Caller sample rate must be between 0 and 1: {caller_sample_rate}")
+        self.log_dir = log_dir
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.caller_sample_rate = caller_sample_rate
+        self.written = 0
+        self.dropped = 0
+        self._buffer = deque()
+        self._in_flight = 0
+        self._flush_waiters = 0
+        self._closed = False
         self._lock = threading.Lock()
-        self._init_db()
-
-    def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    level TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    module TEXT NOT NULL,
-                    funcName TEXT,
-                    lineno INTEGER
-                )
-            ''')
-            conn.commit()
+        self._has_records = threading.Condition(self._lock)
+        self._has_space = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self.tail = LogTail()
+        upgrade_partitions(log_dir, "timestamp")
+        self._writer = threading.Thread(target=self._run, name="sqlite-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self, day: str) -> sqlite3.Connection:
+        conn = open_partition(self.log_dir, day, "timestamp")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
 
     def log(self, message, level="INFO"):
-        timestamp = datetime.utcnow().isoformat()
-        
+        timestamp = time.time()
+
         # Get caller information
-        frame = inspect.currentframe().f_back
-        module = frame.f_globals.get('__name__', 'unknown')
-        func_name = frame.f_code.co_name
-        line_no = frame.f_lineno
-        
+        rate = self.caller_sample_rate
+        if rate and (rate == 1 or random.random() < rate):
+            frame = sys._getframe(1)
+            self._enqueue((timestamp, level, message, frame.f_globals, frame.f_code, frame.f_lineno,
+                           _log_context.get()))
+            return
+        self._enqueue((timestamp, level, message, None, None, 0, _log_context.get()))
+
+    @staticmethod
+    def _row(record: tuple) -> tuple:
+        """Turn a buffered record into the logs table's columns."""
+        timestamp, level, message, caller_globals, code, line_no, context = record
+        context = context or {}
+        return (
+            datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat(),
+            level,
+            message,
+            caller_globals.get('__name__', 'unknown') if caller_globals is not None else 'unknown',
+            code.co_name if code is not None else '',
+            line_no,
+            context.get("transaction_id"),
+            context.get("order_id"),
+            context.get("payment_id"),
+            context.get("event"),
+        )
+
+    def _enqueue(self, record: tuple):
+        with self._lock:
+            if self._closed:
+                # the writer is gone; late shutdown messages are written inline
+                self._count(self._write([record]), 1)
+                return
+            if len(self._buffer) >= self.buffer_size:
+                if self.overflow_policy == "block":
+                    while len(self._buffer) >= self.buffer_size and not self._closed:
+                        self._has_space.wait()
+                    if self._closed:
+                        self._count(self._write([record]), 1)
+                        return
+                else:
+                    self._buffer.popleft()
+                    self.dropped += 1
+            self._buffer.append(record)
+            if len(self._buffer) >= self.batch_size:
+                self._has_records.notify()
+
+    def _run(self):
+        conns = {}
+        try:
+            while True:
+                with self._lock:
+                    if len(self._buffer) < self.batch_size and not self._closed and not self._flush_waiters:
+                        self._has_records.wait(self.flush_interval)
+                    if not self._buffer:
+                        if self._closed:
+                            return
+                        continue
+                    count = min(len(self._buffer), self.batch_size)
+                    batch = [self._buffer.popleft() for _ in range(count)]
+                    self._in_flight = count
+                    self._has_space.notify_all()
+                written = self._write(batch, conns)
+                with self._lock:
+                    self._count(written, len(batch))
+                    self._in_flight = 0
+                    if not self._buffer:
+                        self._drained.notify_all()
+        finally:
+            for conn in conns.values():
+                conn.close()
+
+    def _count(self, written: bool, count: int):
+        """Add a batch to written or dropped; called with the lock held, like stats() reads them."""
+        if written:
+            self.written += count
+        else:
+            self.dropped += count
+
+    def _write(self, batch: list, conns: dict | None = None) -> bool:
+        """
+        Insert a batch, each row into the partition of its day; conns caches
+        connections by day. False when it could not be written.
+        """
+        own_conns = conns is None
+        if own_conns:
+            conns = {}
+        try:
+            days = {}
+            for record in batch:
+                row = self._row(record)
+                days.setdefault(row[0][:10], []).append(row)
+            for day, rows in days.items():
+                conn = conns.get(day)
+                if conn is None:
+                    conn = conns[day] = self._connect(day)
+                    # keep today's and yesterday's partitions open, not every day ever written
+                    for old_day in sorted(conns)[:-2]:
+                        if old_day != day:
+                            conns.pop(old_day).close()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO logs (timestamp, level, message, module, funcName, lineno, "
+                        "transaction_id, order_id, payment_id, event) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    conn.executemany(ROLLUP_UPSERT, hourly_counts(rows))
+                self.tail.publish(rows)
+            return True
+        except sqlite3.Error as e:
+            # nowhere else to log it; keep the writer alive and count the loss
+            print(f"Failed to write {len(batch)} log records: {e}", file=sys.stderr)
+            return False
+        finally:
+            if own_conns:
+                for conn in conns.values():
+                    conn.close()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything logged so far has been written."""
         with self._lock:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)",
-                    (timestamp, level, message, module, func_name, line_no)
+            self._flush_waiters += 1
+            self._has_records.notify()
+            try:
+                return self._drained.wait_for(
+                    lambda: not self._buffer and not self._in_flight, timeout
                 )
-                conn.commit()
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: float = 5):
+        """Write what is still buffered and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._has_records.notify()
+            self._has_space.notify_all()
+        self._writer.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered": len(self._buffer),
+                "written": self.written,
+                "dropped": self.dropped,
+                "overflow_policy": self.overflow_policy,
+            }
+
+if config.LOG_OVERFLOW_POLICY == "block" and config.ORCHESTRATION_CONSUMER_MODE == "asyncio":
+    # a full buffer would block the event loop the saga consumer runs on
+    raise ValueError('LOG_OVERFLOW_POLICY "block" cannot be used with ORCHESTRATION_CONSUMER_MODE "asyncio"')
 
 # Singleton logger instance
-logger = SQLiteLogger() 
\ No newline at end of file
+logger = SQLiteLogger()
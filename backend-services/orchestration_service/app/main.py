@@ -8,9 +8,16 @@ from fastapi.security.api_key import APIKeyHeader
 from contextlib import asynccontextmanager
 from fastapi.openapi.utils import get_openapi
 from routers import order_router, logs
-from services.event_consumer import get_consumer_service
+from services.event_consumer import (
+    get_consumer_service, get_async_consumer_service, get_sharded_consumer_service
+)
+from services.message_publisher import get_publisher_service, get_async_publisher_service
+from services.redis_saga_store import get_async_redis_saga_store
+from services.saga_deadline_sweeper import get_saga_deadline_sweeper
+from services.log_maintenance import get_log_maintenance
 import config
 from logger import logger
+from service_logs.reader import read_pool
 
 # Extract raw Authorization header
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
@@ -26,18 +33,43 @@ async def get_token(authorization: str = Security(api_key_header)) -> str:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: create and start the consumer thread
-    consumer = get_consumer_service(queue=config.RABBITMQ_ORCHESTRATION_QUEUE)
-    thread = threading.Thread(target=consumer.start_consuming, daemon=True)
-    thread.start()
-    print("Consumer thread started.")
+    # Rolls back sagas whose current step has not been answered in time
+    sweeper = get_saga_deadline_sweeper()
+    sweeper.start()
+    # Drops expired log partitions and compacts closed ones
+    log_maintenance = get_log_maintenance()
+    log_maintenance.start()
+    thread = None
+    if config.ORCHESTRATION_CONSUMER_MODE in ("asyncio", "sharded"):
+        # Startup: register the consumer on the running event loop
+        if config.ORCHESTRATION_CONSUMER_MODE == "sharded":
+            consumer = get_sharded_consumer_service(queue=config.RABBITMQ_ORCHESTRATION_QUEUE)
+        else:
+            consumer = get_async_consumer_service(queue=config.RABBITMQ_ORCHESTRATION_QUEUE)
+        await consumer.start_consuming()
+    else:
+        # Startup: create and start the consumer thread
+        consumer = get_consumer_service(queue=config.RABBITMQ_ORCHESTRATION_QUEUE)
+        thread = threading.Thread(target=consumer.start_consuming, daemon=True)
+        thread.start()
+    logger.log(f"{config.ORCHESTRATION_CONSUMER_MODE.capitalize()} consumer started.")
     try:
         yield
     finally:
-        # Shutdown: Signal the consumer to stop and wait for the thread to exit
-        consumer.stop_consuming()
-        thread.join(timeout=5)
-        print("Consumer stopped.")
+        # Shutdown: Signal the consumer to stop and wait for the consumer thread to exit
+        if thread is None:
+            await consumer.stop_consuming()
+        else:
+            consumer.stop_consuming()
+            thread.join(timeout=5)
+        logger.log("Consumer stopped.")
+        sweeper.stop()
+        log_maintenance.stop()
+        get_publisher_service().close()
+        await get_async_publisher_service().close()
+        await get_async_redis_saga_store().close()
+        read_pool.close()
+        logger.close()
 
 app = FastAPI(
     lifespan=lifespan,
@@ -53,6 +85,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    # paging headers of GET /logs/
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Is-Estimate"],
 )
 
 # Custom OpenAPI schema to support raw Authorization header
@@ -92,6 +126,16 @@ def read_root():
     logger.log("Root endpoint accessed.")
     return {"message": "Orchestration Service is running."}
 
+@app.get("/publisher/stats")
+def publisher_stats(token: str = Security(get_token)):
+    """
+    Utilisation counters of the shared RabbitMQ publisher pools.
+    """
+    return {
+        "blocking": get_publisher_service().stats(),
+        "asyncio": get_async_publisher_service().stats(),
+    }
+
 # Optional: Protected test endpoint
 @app.get("/protected")
 def protected(token: str = Security(get_token)):
@@ -1,17 +1,34 @@
 from pydantic import BaseModel
 
 class ProductSagaState:
-    def __init__(self, transaction_id: str, product_id: str, quantity: int):
+    def __init__(self, transaction_id: str, products: dict = None, reserved_products: dict = None):
         """
-        Represents the state of a Product in a Saga.
+        Represents the stock ledger of a Saga.
 
         :param transaction_id: The unique transaction ID for the Saga.
-        :param product_id: The ID of the product.
-        :param quantity: The quantity of the product.
+        :param products: Requested quantity per product ID, over every line of the order.
+        :param reserved_products: Quantity per product ID the inventory service has reserved.
         """
         self.transaction_id = transaction_id
-        self.product_id = product_id
-        self.quantity = quantity
+        self.products = products or {}
+        self.reserved_products = reserved_products or {}
+
+    @classmethod
+    def from_order_items(cls, transaction_id: str, items: list) -> "ProductSagaState":
+        """
+        Builds the ledger for an order, merging lines that repeat a product.
+        """
+        products = {}
+        for item in items:
+            products[item.product_id] = products.get(item.product_id, 0) + item.quantity
+        return cls(transaction_id=transaction_id, products=products)
+
+    def reserve(self, product_ids: list = None):
+        """
+        Marks the given products (all of them by default) as reserved.
+        """
+        for product_id in self.products if product_ids is None else product_ids:
+            self.reserved_products[product_id] = self.products[product_id]
 
     def dict(self):
         """
@@ -19,8 +36,8 @@ class ProductSagaState:
         """
         return {
             "transaction_id": self.transaction_id,
-            "product_id": self.product_id,
-            "quantity": self.quantity
+            "products": self.products,
+            "reserved_products": self.reserved_products
         }
 class OrderSagaState:
     def __init__(self, transaction_id: str, description: str, user_email: str, vendor_email: str,
@@ -107,4 +124,17 @@ class SagaEvent(BaseModel):
     """
     event: str
     data: dict
-    
\ No newline at end of file
+    
+
+class SagaStep:
+    """
+    Steps a saga moves through. Each orchestrator handler only applies its
+    update when the saga is still at the step it expects.
+    """
+    STOCK_PENDING = "stock_pending"
+    PAYMENT_PENDING = "payment_pending"
+    ORDER_PENDING = "order_pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMED_OUT = "timed_out"
@@ -1,11 +1,19 @@
 """Logs endpoints."""
-from fastapi import APIRouter, HTTPException, Query, Depends, Request
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 from logger import logger
-import sqlite3
+import asyncio
+import json
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import config
 from routers.auth_dependencies import authenticate_admin
+from service_logs import config as log_config
+from service_logs.partitions import list_partitions
+from service_logs.query import encode_cursor, decode_cursor, fts_query, log_filters, count_logs, export_chunks
+from service_logs.reader import read_pool, log_query, LogQueryTimeout
+from services.log_fanout import LogQuery, get_log_fanout, encode_positions, decode_positions
 
 router = APIRouter(
     prefix="/logs",
@@ -20,6 +28,29 @@ class LogEntry(BaseModel):
     module: str
     funcName: str
     lineno: int
+    # saga context the record was logged in
+    transaction_id: Optional[str] = None
+    order_id: Optional[str] = None
+    payment_id: Optional[str] = None
+    event: Optional[str] = None
+    # message with the search matches wrapped in <mark></mark>, when highlight is set
+    highlighted_message: Optional[str] = None
+
+class ServiceLogEntry(BaseModel):
+    service: str
+    id: int
+    timestamp: str
+    level: str
+    message: str
+    module: str
+    funcName: Optional[str] = None
+    lineno: Optional[int] = None
+
+class ServiceLogPage(BaseModel):
+    items: List[ServiceLogEntry]
+    next_cursor: Optional[str] = None
+    # per service queried for this page: "ok", "timeout" or "error: ..."
+    sources: dict
 
 class LogStats(BaseModel):
     total_logs: int
@@ -27,69 +58,114 @@ class LogStats(BaseModel):
     recent_errors_24h: int
     module_counts: dict
 
+LOG_ENTRY_COLUMNS = (
+    "logs.id, logs.timestamp, logs.level, logs.message, logs.module, logs.funcName, logs.lineno, "
+    "logs.transaction_id, logs.order_id, logs.payment_id, logs.event"
+)
+
+EXPORT_FIELDS = (
+    "id", "timestamp", "level", "message", "module", "funcName", "lineno",
+    "transaction_id", "order_id", "payment_id", "event"
+)
+
 @router.get("/", response_model=List[LogEntry], dependencies=[Depends(authenticate_admin)])
+@log_query
 def get_logs(
+    response: Response,
     level: Optional[str] = Query(None, description="Filter logs by level (INFO, WARNING, ERROR)"),
     start_date: Optional[str] = Query(None, description="Filter logs from this date (ISO format)"),
     end_date: Optional[str] = Query(None, description="Filter logs until this date (ISO format)"),
     module: Optional[str] = Query(None, description="Filter logs by module name"),
-    search: Optional[str] = Query(None, description="Search in log messages"),
+    search: Optional[str] = Query(None, description='Full-text search in log messages: words, "exact phrases" and prefix* terms'),
+    highlight: bool = Query(False, description="Return the message with the search matches marked"),
     page: int = Query(1, description="Page number", ge=1),
-    page_size: int = Query(50, description="Number of logs per page", ge=1, le=1000)
+    page_size: int = Query(50, description="Number of logs per page", ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page; takes precedence over page"),
+    count: str = Query("exact", description="Total count: exact, approximate or none", pattern="^(exact|approximate|none)$")
 ):
     """
     Retrieve logs with optional filtering by level, date range, module, and search term.
-    Supports pagination. Admin access only.
+    Supports offset pagination and, for deep pages, keyset pagination: the
+    X-Next-Cursor response header, passed back as ?cursor=, continues below the
+    last row. The total goes in X-Total-Count (with X-Total-Is-Estimate) unless
+    count is none.
+    Search results are ordered by id, i.e. the order the logs were written in. Admin access only.
     """
     try:
-        conn = sqlite3.connect("logs.db")
-        cursor = conn.cursor()
-
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
         # Base query
-        query = "SELECT id, timestamp, level, message, module, funcName, lineno FROM logs"
-        count_query = "SELECT COUNT(*) FROM logs"
-        params = []
-        conditions = []
+        query = "SELECT " + LOG_ENTRY_COLUMNS
+        from_clause = " FROM logs"
 
         # Add filters if provided
-        if level:
-            conditions.append("level = ?")
-            params.append(level.upper())
+        conditions, params = log_filters("timestamp", level, start_date, end_date, module)
 
-        if start_date:
-            conditions.append("timestamp >= ?")
-            params.append(start_date)
+        search_query = fts_query(search) if search else ""
+        if search_query:
+            # driven by the full-text index: matches come newest (highest id) first,
+            # so a page stops after page_size matches instead of sorting all of them
+            from_clause = " FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid"
+            if highlight:
+                query += ", highlight(logs_fts, 0, '<mark>', '</mark>')"
+            conditions.append("logs_fts MATCH ?")
+            params.append(search_query)
+            order_by = "logs_fts.rowid DESC"
+            keyset = ("logs_fts.rowid < ?", after[1:] if after else None)
+        else:
+            # id breaks ties between equal timestamps
+            order_by = "timestamp DESC, id DESC"
+            keyset = ("(timestamp, id) < (?, ?)", after)
 
-        if end_date:
-            conditions.append("timestamp <= ?")
-            params.append(end_date)
+        # Combine conditions
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
 
-        if module:
-            conditions.append("module = ?")
-            params.append(module)
+        # Only the daily partitions inside the date range are opened, newest first;
+        # a cursor resumes in the partition of the last row of the previous page
+        partitions = list_partitions(config.LOG_DIR, start_date, end_date)
+        if after:
+            partitions = [(day, path) for day, path in partitions if day <= after[0][:10]]
 
-        if search:
-            conditions.append("message LIKE ?")
-            params.append(f"%{search}%")
+        total_count = None if count == "none" else 0
+        total_is_estimate = False
+        logs = []
+        offset = 0 if after else (page - 1) * page_size
+        for day, path in partitions:
+            if count == "none" and len(logs) == page_size:
+                break
+            with read_pool.connection(path) as conn:
+                db_cursor = conn.cursor()
 
-        # Combine conditions
-        if conditions:
-            where_clause = " WHERE " + " AND ".join(conditions)
-            query += where_clause
-            count_query += where_clause
+                # Get total count
+                matched, estimate = count_logs(db_cursor, from_clause, where_clause, params, count)
+                if matched is not None:
+                    total_count += matched
+                    total_is_estimate = total_is_estimate or estimate
+                if len(logs) == page_size:
+                    continue
 
-        # Get total count
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()[0]
+                day_where, day_params = where_clause, list(params)
+                if after and day == after[0][:10]:
+                    # keyset: continue below the last row of the previous page using the indexes
+                    day_where = " WHERE " + " AND ".join(conditions + [keyset[0]])
+                    day_params.extend(keyset[1])
+                elif offset:
+                    # skip whole partitions that lie above the requested page
+                    if count != "exact":
+                        matched, _ = count_logs(db_cursor, from_clause, where_clause, params, "exact")
+                    if matched <= offset:
+                        offset -= matched
+                        continue
 
-        # Add ordering and pagination
-        offset = (page - 1) * page_size
-        query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-        params.extend([page_size, offset])
-
-        # Execute query
-        cursor.execute(query, params)
-        logs = cursor.fetchall()
+                # Add ordering and pagination
+                db_cursor.execute(
+                    query + from_clause + day_where + f" ORDER BY {order_by} LIMIT ? OFFSET ?",
+                    day_params + [page_size - len(logs), offset]
+                )
+                offset = 0
+                logs.extend(db_cursor.fetchall())
 
         # Convert to list of dictionaries
         log_entries = [
@@ -100,14 +176,29 @@ def get_logs(
                 message=log[3],
                 module=log[4],
                 funcName=log[5],
-                lineno=log[6]
+                lineno=log[6],
+                transaction_id=log[7],
+                order_id=log[8],
+                payment_id=log[9],
+                event=log[10]
             )
             for log in logs
         ]
+        if highlight and search_query:
+            for entry, log in zip(log_entries, logs):
+                entry.highlighted_message = log[11]
 
-        conn.close()
+        # the body stays a list of entries; the paging details go in headers
+        if len(logs) == page_size:
+            response.headers["X-Next-Cursor"] = encode_cursor(logs[-1][1], logs[-1][0])
+        if total_count is not None:
+            response.headers["X-Total-Count"] = str(total_count)
+            response.headers["X-Total-Is-Estimate"] = "true" if total_is_estimate else "false"
         return log_entries
 
+    except LogQueryTimeout as e:
+        logger.log(f"Error retrieving logs: {str(e)}", level="WARNING")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.log(f"Error retrieving logs: {str(e)}", level="ERROR")
         raise HTTPException(
@@ -115,20 +206,190 @@ def get_logs(
             detail=f"An error occurred while retrieving logs: {str(e)}"
         )
 
+@router.get("/all", response_model=ServiceLogPage, dependencies=[Depends(authenticate_admin)])
+async def get_all_service_logs(
+    request: Request,
+    level: Optional[str] = Query(None, description="Filter logs by level (INFO, WARNING, ERROR)"),
+    start_date: Optional[str] = Query(None, description="Filter logs from this date (ISO format)"),
+    end_date: Optional[str] = Query(None, description="Filter logs until this date (ISO format)"),
+    module: Optional[str] = Query(None, description="Filter logs by module name"),
+    search: Optional[str] = Query(None, description='Full-text search in log messages: words, "exact phrases" and prefix* terms'),
+    page_size: int = Query(50, description="Number of logs per page", ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    """
+    Retrieve the logs of the orchestration, order and payment services merged
+    into one newest-first list, with the same filters as GET /logs/. The services
+    are queried concurrently; one that does not answer within
+    LOG_FANOUT_SOURCE_TIMEOUT is marked in sources and retried on the next page.
+    Admin access only.
+    """
+    try:
+        positions = decode_positions(cursor) if cursor else {}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        fanout = get_log_fanout()
+        query = LogQuery(
+            level=level,
+            start_date=start_date,
+            end_date=end_date,
+            module=module,
+            search=search,
+            fts_query=fts_query(search) if search else "",
+            authorization=request.headers.get("Authorization")
+        )
+        entries, next_positions, statuses = await fanout.page(query, positions, page_size)
+        return ServiceLogPage(
+            items=[ServiceLogEntry(**entry) for entry in entries],
+            next_cursor=None if fanout.exhausted(next_positions) else encode_positions(next_positions),
+            sources=statuses
+        )
+
+    except Exception as e:
+        logger.log(f"Error retrieving logs of all services: {str(e)}", level="ERROR")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while retrieving logs of all services: {str(e)}"
+        )
+
+@router.get("/export", dependencies=[Depends(authenticate_admin)])
+def export_logs(
+    level: Optional[str] = Query(None, description="Filter logs by level (INFO, WARNING, ERROR)"),
+    start_date: Optional[str] = Query(None, description="Filter logs from this date (ISO format)"),
+    end_date: Optional[str] = Query(None, description="Filter logs until this date (ISO format)"),
+    module: Optional[str] = Query(None, description="Filter logs by module name"),
+    fmt: str = Query("ndjson", alias="format", description="ndjson or csv", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False, description="Compress the download with gzip")
+):
+    """
+    Download all the logs matching the filters, oldest first, as NDJSON (one
+    JSON object per line) or CSV. The rows are streamed from the log files as
+    they are read instead of being collected first. Admin access only.
+    """
+    conditions, params = log_filters("timestamp", level, start_date, end_date, module)
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    filename = f"orchestration-logs.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_chunks(
+            list_partitions(config.LOG_DIR, start_date, end_date), LOG_ENTRY_COLUMNS, EXPORT_FIELDS, "timestamp",
+            where_clause, params, fmt, gzip,
+            on_error=lambda e: logger.log(f"Error exporting logs: {str(e)}", level="ERROR")
+        ),
+        media_type="application/gzip" if gzip else ("text/csv" if fmt == "csv" else "application/x-ndjson"),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# rows published to the tail have no id yet
+TAIL_FIELDS = EXPORT_FIELDS[1:]
+
+@router.get("/tail", dependencies=[Depends(authenticate_admin)])
+async def tail_logs(
+    request: Request,
+    level: Optional[str] = Query(None, description="Only logs of this level (INFO, WARNING, ERROR)"),
+    module: Optional[str] = Query(None, description="Only logs of this module"),
+    search: Optional[str] = Query(None, description="Only logs whose message contains this text (case-insensitive)")
+):
+    """
+    Follow the logs as they are written, as Server-Sent Events: one "data" event
+    with a JSON log per new row matching the filters. Rows come from the log
+    writer, not from SQLite. A client that reads too slowly loses the oldest
+    rows beyond LOG_TAIL_BUFFER_SIZE, reported in a "dropped" event. Admin access only.
+    """
+    tail = logger.tail
+    subscriber = tail.subscribe(asyncio.get_running_loop(), level, module, search)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                rows, dropped = await subscriber.next_rows(log_config.LOG_TAIL_KEEPALIVE)
+                chunk = ""
+                if dropped:
+                    chunk += f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                chunk += "".join(
+                    "data: " + json.dumps(dict(zip(TAIL_FIELDS, row)), separators=(",", ":")) + "\n\n" for row in rows
+                )
+                # a comment keeps proxies from closing an idle stream
+                yield chunk or ": keep-alive\n\n"
+        except Exception as e:
+            logger.log(f"Error tailing logs: {str(e)}", level="ERROR")
+            raise
+        finally:
+            tail.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/transaction/{transaction_id}", response_model=List[LogEntry], dependencies=[Depends(authenticate_admin)])
+@log_query
+def get_transaction_logs(
+    transaction_id: str,
+    limit: int = Query(1000, description="Maximum number of logs to return", ge=1, le=10000)
+):
+    """
+    Retrieve the logs written for one saga transaction, oldest first. Each daily
+    partition answers from its transaction_id index. Admin access only.
+    """
+    try:
+        logs = []
+        # oldest partition first, so the saga reads in order
+        for _, path in reversed(list_partitions(config.LOG_DIR)):
+            with read_pool.connection(path) as conn:
+                logs.extend(conn.execute(
+                    "SELECT " + LOG_ENTRY_COLUMNS + " FROM logs WHERE transaction_id = ? "
+                    "ORDER BY timestamp, id LIMIT ?",
+                    (transaction_id, limit - len(logs))
+                ).fetchall())
+            if len(logs) == limit:
+                break
+
+        return [
+            LogEntry(
+                id=log[0],
+                timestamp=log[1],
+                level=log[2],
+                message=log[3],
+                module=log[4],
+                funcName=log[5],
+                lineno=log[6],
+                transaction_id=log[7],
+                order_id=log[8],
+                payment_id=log[9],
+                event=log[10]
+            )
+            for log in logs
+        ]
+
+    except LogQueryTimeout as e:
+        logger.log(f"Error retrieving logs of transaction {transaction_id}: {str(e)}", level="WARNING")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.log(f"Error retrieving logs of transaction {transaction_id}: {str(e)}", level="ERROR")
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while retrieving logs of transaction {transaction_id}: {str(e)}"
+        )
+
 @router.get("/levels", response_model=List[str], dependencies=[Depends(authenticate_admin)])
+@log_query
 def get_log_levels():
     """
     Retrieve all log levels that have been used in the logs. Admin access only.
     """
     try:
-        conn = sqlite3.connect("logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT DISTINCT level FROM logs ORDER BY level")
-        levels = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
-        return levels
+        levels = set()
+        for _, path in list_partitions(config.LOG_DIR):
+            with read_pool.connection(path) as conn:
+                # the rollup has one row per hour, level and module, far fewer than logs
+                levels.update(row[0] for row in conn.execute("SELECT DISTINCT level FROM logs_rollup"))
+        return sorted(levels)
+    except LogQueryTimeout as e:
+        logger.log(f"Error retrieving log levels: {str(e)}", level="WARNING")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.log(f"Error retrieving log levels: {str(e)}", level="ERROR")
         raise HTTPException(
@@ -137,19 +398,21 @@ def get_log_levels():
         )
 
 @router.get("/modules", response_model=List[str], dependencies=[Depends(authenticate_admin)])
+@log_query
 def get_modules():
     """
     Retrieve all modules that have generated logs. Admin access only.
     """
     try:
-        conn = sqlite3.connect("logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT DISTINCT module FROM logs ORDER BY module")
-        modules = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
-        return modules
+        modules = set()
+        for _, path in list_partitions(config.LOG_DIR):
+            with read_pool.connection(path) as conn:
+                # the rollup has one row per hour, level and module, far fewer than logs
+                modules.update(row[0] for row in conn.execute("SELECT DISTINCT module FROM logs_rollup"))
+        return sorted(modules)
+    except LogQueryTimeout as e:
+        logger.log(f"Error retrieving modules: {str(e)}", level="WARNING")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.log(f"Error retrieving modules: {str(e)}", level="ERROR")
         raise HTTPException(
@@ -158,44 +421,55 @@ def get_modules():
         )
 
 @router.get("/stats", response_model=LogStats, dependencies=[Depends(authenticate_admin)])
+@log_query
 def get_log_stats():
     """
     Get statistics about the logs (count by level, recent errors, module counts, etc.). Admin access only.
     """
     try:
-        conn = sqlite3.connect("logs.db")
-        cursor = conn.cursor()
-
-        # Get count by level
-        cursor.execute("""
-            SELECT level, COUNT(*) as count 
-            FROM logs 
-            GROUP BY level
-        """)
-        level_counts = {row[0]: row[1] for row in cursor.fetchall()}
-
-        # Get count by module
-        cursor.execute("""
-            SELECT module, COUNT(*) as count 
-            FROM logs 
-            GROUP BY module
-        """)
-        module_counts = {row[0]: row[1] for row in cursor.fetchall()}
-
-        # Get recent errors (last 24 hours)
-        yesterday = (datetime.now() - timedelta(days=1)).isoformat()
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM logs 
-            WHERE level = 'ERROR' AND timestamp >= ?
-        """, (yesterday,))
-        recent_errors = cursor.fetchone()[0]
+        level_counts = {}
+        module_counts = {}
+        recent_errors = 0
+        # exactly 24 hours back, in UTC like the log timestamps
+        since = (datetime.now(timezone.utc) - timedelta(days=1)).replace(tzinfo=None).isoformat()
 
-        # Get total log count
-        cursor.execute("SELECT COUNT(*) FROM logs")
-        total_logs = cursor.fetchone()[0]
+        # Level and module counts come from the hourly rollup each daily partition keeps,
+        # not from the logs tables
+        for day, path in list_partitions(config.LOG_DIR):
+            with read_pool.connection(path) as conn:
+                cursor = conn.cursor()
+
+                # Get count by level
+                cursor.execute("""
+                    SELECT level, SUM(count)
+                    FROM logs_rollup
+                    GROUP BY level
+                """)
+                for level, level_count in cursor.fetchall():
+                    level_counts[level] = level_counts.get(level, 0) + level_count
 
-        conn.close()
+                # Get count by module
+                cursor.execute("""
+                    SELECT module, SUM(count)
+                    FROM logs_rollup
+                    GROUP BY module
+                """)
+                for module, module_count in cursor.fetchall():
+                    module_counts[module] = module_counts.get(module, 0) + module_count
+
+                # Get recent errors (last 24 hours); from the (level, timestamp) index of logs,
+                # as whole rollup hours would reach up to 25 hours back
+                if day >= since[:10]:
+                    cursor.execute("""
+                        SELECT COUNT(*)
+                        FROM logs
+                        WHERE level = 'ERROR' AND timestamp >= ?
+                    """, (since,))
+                    recent_errors += cursor.fetchone()[0]
+
+
+        # Get total log count
+        total_logs = sum(level_counts.values())
 
         return LogStats(
             total_logs=total_logs,
@@ -204,6 +478,9 @@ def get_log_stats():
             module_counts=module_counts
         )
 
+    except LogQueryTimeout as e:
+        logger.log(f"Error retrieving log statistics: {str(e)}", level="WARNING")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.log(f"Error retrieving log statistics: {str(e)}", level="ERROR")
         raise HTTPException(
@@ -0,0 +1,16 @@
+"""
+Dedup windows of the orchestration consumers (see message_dedup.window), on
+the saga store's Redis connection pools.
+"""
+import redis
+from message_dedup.window import DedupWindow, AsyncDedupWindow
+from logger import logger
+from services.redis_saga_store import get_redis_connection_pool, get_async_redis_saga_store
+
+
+def get_dedup_window(namespace: str) -> DedupWindow:
+    return DedupWindow(namespace, redis.Redis(connection_pool=get_redis_connection_pool()), logger.log)
+
+def get_async_dedup_window(namespace: str) -> AsyncDedupWindow:
+    # share the saga store's pool rather than opening another one per consumer
+    return AsyncDedupWindow(namespace, get_async_redis_saga_store().client, logger.log)
@@ -1,9 +1,14 @@
 """Event Consumer for Saga Orchestrator"""
+import asyncio
+import zlib
+import aio_pika
 import pika
 import json
-from services.saga_orchestrator import get_saga_orchestrator
+from services.saga_orchestrator import get_saga_orchestrator, get_async_saga_orchestrator
+from message_dedup.window import message_key
+from services.dedup_window import get_dedup_window, get_async_dedup_window
 import config
-from logger import logger
+from logger import logger, log_context, message_log_context
 
 class RabbitMQConsumer:
     def __init__(self, queue: str):
@@ -27,6 +32,7 @@ class RabbitMQConsumer:
             "create_order": orchestrator.handle_create_order_event,
             # Add more event mappings as needed
         }
+        self.dedup = get_dedup_window(queue)
         logger.log(f"Initialized RabbitMQ consumer for queue: {queue}")
 
     def connect(self):
@@ -44,22 +50,34 @@ class RabbitMQConsumer:
         """Callback function to process incoming messages."""
         try:
             message = json.loads(body)
-            event_type = message.get("event")
-            logger.log(f"Received message with event type: {event_type}")
-
-            # Dispatch the message to the appropriate handler if it exists
-            if event_type in self.event_handlers:
-                logger.log(f"Processing event type: {event_type}")
-                self.event_handlers[event_type](message)
-                logger.log(f"Successfully processed event type: {event_type}")
-            else:
-                logger.log(f"Unhandled event type: {event_type}", level="ERROR")
-
-            # Acknowledge the message after processing
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            # everything logged while handling the message is tagged with its saga
+            with log_context(**message_log_context(message)):
+                event_type = message.get("event")
+                message_id = message_key(message, body)
+                if self.dedup.seen(message_id):
+                    # redelivery of a message that was already handled: just ack it
+                    logger.log(f"Skipping duplicate message {message_id} ({event_type})", level="WARNING")
+                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    return
+                logger.log(f"Received message with event type: {event_type}")
+
+                # Dispatch the message to the appropriate handler if it exists
+                if event_type in self.event_handlers:
+                    logger.log(f"Processing event type: {event_type}")
+                    self.event_handlers[event_type](message)
+                    logger.log(f"Successfully processed event type: {event_type}")
+                else:
+                    logger.log(f"Unhandled event type: {event_type}", level="ERROR")
+                # only reached when the handler returned: a failed message stays unmarked
+                # so that its redelivery runs the handler again
+                self.dedup.mark(message_id)
+
+                # Acknowledge the message after processing
+                ch.basic_ack(delivery_tag=method.delivery_tag)
         except Exception as e:
             logger.log(f"Error processing message: {str(e)}", level="ERROR")
-            # Optionally, you might choose to nack the message or log it for further inspection
+            # requeue the message for one more try, and drop it if that fails as well
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=not method.redelivered)
 
     def start_consuming(self):
         """Start consuming messages from the specified queue."""
@@ -90,5 +108,278 @@ class RabbitMQConsumer:
             logger.log("Stopped consuming messages")
 
 
+class AsyncRabbitMQConsumer:
+    """
+    asyncio consumer built on aio-pika. Messages are delivered on the application's
+    event loop and dispatched to the AsyncSagaOrchestrator handlers, so no
+    consumer thread is needed.
+    """
+    def __init__(self, queue: str):
+        self.queue = queue
+        self.connection = None
+        self.channel = None
+        self._consumer_tag = None
+        self._queue = None
+        orchestrator = get_async_saga_orchestrator()
+        # Mapping event types to handler methods
+        self.event_handlers = {
+            "reduce_stock": orchestrator.handle_stock_reduced_event,
+            "take_payment": orchestrator.hande_take_payment_event,
+            "create_order": orchestrator.handle_create_order_event,
+            # Add more event mappings as needed
+        }
+        self.dedup = get_async_dedup_window(queue)
+        logger.log(f"Initialized asyncio RabbitMQ consumer for queue: {queue}")
+
+    async def connect(self):
+        """Establish the connection and declare the queue."""
+        try:
+            self.connection = await aio_pika.connect_robust(
+                host=config.RABBITMQ_HOST,
+                port=config.RABBITMQ_PORT,
+                login=config.RABBITMQ_USER,
+                password=config.RABBITMQ_PASSWORD
+            )
+            self.channel = await self.connection.channel()
+            self._queue = await self.channel.declare_queue(self.queue, durable=True)
+            logger.log(f"Successfully connected to RabbitMQ and declared queue: {self.queue}")
+        except Exception as e:
+            logger.log(f"Failed to connect to RabbitMQ: {str(e)}", level="ERROR")
+            raise
+
+    async def callback(self, incoming: aio_pika.abc.AbstractIncomingMessage):
+        """Callback function to process incoming messages."""
+        try:
+            message = json.loads(incoming.body)
+            # everything logged while handling the message is tagged with its saga
+            with log_context(**message_log_context(message)):
+                event_type = message.get("event")
+                message_id = message_key(message, incoming.body)
+                if await self.dedup.seen(message_id):
+                    # redelivery of a message that was already handled: just ack it
+                    logger.log(f"Skipping duplicate message {message_id} ({event_type})", level="WARNING")
+                    await incoming.ack()
+                    return
+                logger.log(f"Received message with event type: {event_type}")
+                await self.handle(message, event_type)
+                # only reached when the handler returned: a failed message stays unmarked
+                # so that its redelivery runs the handler again
+                await self.dedup.mark(message_id)
+
+                # Acknowledge the message after processing
+                await incoming.ack()
+        except Exception as e:
+            logger.log(f"Error processing message: {str(e)}", level="ERROR")
+            await incoming.nack(requeue=self.requeue_failed(incoming))
+
+    async def handle(self, message: dict, event_type: str):
+        """Dispatch the message to the appropriate handler if it exists."""
+        if event_type in self.event_handlers:
+            logger.log(f"Processing event type: {event_type}")
+            await self.event_handlers[event_type](message)
+            logger.log(f"Successfully processed event type: {event_type}")
+        else:
+            logger.log(f"Unhandled event type: {event_type}", level="ERROR")
+
+    def requeue_failed(self, incoming: aio_pika.abc.AbstractIncomingMessage) -> bool:
+        """Requeue a failed message for one more try, and drop it if that fails as well."""
+        return not incoming.redelivered
+
+    async def start_consuming(self):
+        """Register the consumer; deliveries are then handled on the running loop."""
+        try:
+            if not self.connection or self.connection.is_closed:
+                await self.connect()
+
+            await self.channel.set_qos(prefetch_count=1)
+            self._consumer_tag = await self._queue.consume(self.callback)
+            logger.log(f"Started consuming on queue: {self.queue}")
+        except Exception as e:
+            logger.log(f"Error setting up consumer: {str(e)}", level="ERROR")
+
+    async def stop_consuming(self):
+        """Cancel the consumer and close the connection."""
+        if self._queue and self._consumer_tag:
+            await self._queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+            logger.log("Stopped consuming messages")
+        if self.connection and not self.connection.is_closed:
+            await self.connection.close()
+            logger.log("Closed RabbitMQ connection")
+
+
+def shard_for(transaction_id: str | None, shards: int) -> int:
+    """Stable shard of a transaction; the same id always lands on the same shard."""
+    return zlib.crc32((transaction_id or "").encode()) % shards
+
+
+def parse_shards(spec: str, shards: int) -> list[int]:
+    """Parse "0-3,6" into [0, 1, 2, 3, 6]; an empty spec selects every shard."""
+    if not spec.strip():
+        return list(range(shards))
+    owned = set()
+    for part in spec.split(","):
+        start, _, end = part.strip().partition("-")
+        owned.update(range(int(start), int(end or start) + 1))
+    invalid = [shard for shard in owned if not 0 <= shard < shards]
+    if invalid:
+        raise ValueError(f"Shards {invalid} outside of 0-{shards - 1}")
+    return sorted(owned)
+
+
+class ShardedRabbitMQConsumer(AsyncRabbitMQConsumer):
+    """
+    Concurrent asyncio consumer that keeps the events of one transaction in order.
+
+    Events published to the orchestration queue are routed by transaction_id onto
+    a fixed set of shard queues ("<queue>.shard.<n>"). Each replica consumes the
+    shards it owns (ORCHESTRATION_OWNED_SHARDS) with a higher prefetch, and hands
+    every delivery to one of ORCHESTRATION_WORKERS workers, again chosen by
+    transaction_id. A worker handles its events one at a time, so events of the
+    same saga are processed in order while different sagas run concurrently.
+
+    Shard queues are declared with single-active-consumer, so when several
+    replicas subscribe to the same shard only one receives its events and
+    another takes over if it goes away.
+
+    A failed handler is retried once in place, before the worker takes the next
+    event, and the message is dropped if that fails as well. Requeueing it
+    would put it behind the later events of its saga that are already
+    prefetched, and they would be handled first.
+    """
+    def __init__(self, queue: str, shards: int = config.ORCHESTRATION_QUEUE_SHARDS,
+                 owned_shards: str = config.ORCHESTRATION_OWNED_SHARDS,
+                 workers: int = config.ORCHESTRATION_WORKERS,
+                 prefetch: int = config.ORCHESTRATION_PREFETCH):
+        super().__init__(queue)
+        self.shards = shards
+        self.owned_shards = parse_shards(owned_shards, shards)
+        self.prefetch = prefetch
+        self._router_channel = None
+        self._router_tag = None
+        self._shard_queues = {}
+        self._shard_tags = {}
+        self._worker_queues = [asyncio.Queue() for _ in range(workers)]
+        self._workers = []
+
+    def shard_queue_name(self, shard: int) -> str:
+        return f"{self.queue}.shard.{shard}"
+
+    async def connect(self):
+        """Establish the connection and declare the inbound and shard queues."""
+        try:
+            self.connection = await aio_pika.connect_robust(
+                host=config.RABBITMQ_HOST,
+                port=config.RABBITMQ_PORT,
+                login=config.RABBITMQ_USER,
+                password=config.RABBITMQ_PASSWORD
+            )
+            self._router_channel = await self.connection.channel()
+            self._queue = await self._router_channel.declare_queue(self.queue, durable=True)
+            self.channel = await self.connection.channel()
+            for shard in range(self.shards):
+                self._shard_queues[shard] = await self.channel.declare_queue(
+                    self.shard_queue_name(shard),
+                    durable=True,
+                    arguments={"x-single-active-consumer": True}
+                )
+            logger.log(f"Successfully connected to RabbitMQ and declared {self.shards} shards of queue: {self.queue}")
+        except Exception as e:
+            logger.log(f"Failed to connect to RabbitMQ: {str(e)}", level="ERROR")
+            raise
+
+    async def route(self, incoming: aio_pika.abc.AbstractIncomingMessage):
+        """Move a message from the inbound queue to the shard of its transaction."""
+        try:
+            transaction_id = json.loads(incoming.body).get("transaction_id")
+        except (ValueError, AttributeError):
+            # let the shard consumer log it like any other malformed message
+            transaction_id = None
+        shard = shard_for(transaction_id, self.shards)
+        try:
+            await self._router_channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=incoming.body,
+                    content_type=incoming.content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    # saves the shard consumer from parsing the body again
+                    headers={"transaction_id": transaction_id or ""}
+                ),
+                routing_key=self.shard_queue_name(shard)
+            )
+            await incoming.ack()
+        except Exception as e:
+            logger.log(f"Error routing message to shard {shard}: {str(e)}", level="ERROR")
+            await incoming.nack(requeue=True)
+
+    async def dispatch(self, incoming: aio_pika.abc.AbstractIncomingMessage):
+        """Queue a shard delivery on the worker that owns its transaction."""
+        transaction_id = (incoming.headers or {}).get("transaction_id")
+        worker = shard_for(transaction_id, len(self._worker_queues))
+        await self._worker_queues[worker].put(incoming)
+
+    async def handle(self, message: dict, event_type: str):
+        try:
+            await super().handle(message, event_type)
+        except Exception as e:
+            logger.log(f"Retrying event type {event_type} after: {str(e)}", level="WARNING")
+            await super().handle(message, event_type)
+
+    def requeue_failed(self, incoming: aio_pika.abc.AbstractIncomingMessage) -> bool:
+        # already retried in place by handle()
+        return False
+
+    async def _work(self, worker_queue: asyncio.Queue):
+        while True:
+            incoming = await worker_queue.get()
+            if incoming is None:
+                return
+            await self.callback(incoming)
+
+    async def start_consuming(self):
+        """Start the workers, then the router and the consumers of the owned shards."""
+        try:
+            if not self.connection or self.connection.is_closed:
+                await self.connect()
+
+            self._workers = [
+                asyncio.create_task(self._work(worker_queue)) for worker_queue in self._worker_queues
+            ]
+            await self._router_channel.set_qos(prefetch_count=self.prefetch)
+            # the prefetch bounds how many events wait in the worker queues
+            await self.channel.set_qos(prefetch_count=self.prefetch)
+            for shard in self.owned_shards:
+                self._shard_tags[shard] = await self._shard_queues[shard].consume(self.dispatch)
+            self._router_tag = await self._queue.consume(self.route)
+            logger.log(f"Started consuming on queue: {self.queue} (shards {self.owned_shards}, "
+                       f"{len(self._worker_queues)} workers, prefetch {self.prefetch})")
+        except Exception as e:
+            logger.log(f"Error setting up consumer: {str(e)}", level="ERROR")
+
+    async def stop_consuming(self):
+        """Stop taking new deliveries, let the workers finish, then close the connection."""
+        if self._router_tag:
+            await self._queue.cancel(self._router_tag)
+            self._router_tag = None
+        for shard, tag in list(self._shard_tags.items()):
+            await self._shard_queues[shard].cancel(tag)
+        self._shard_tags = {}
+        for worker_queue in self._worker_queues:
+            worker_queue.put_nowait(None)
+        if self._workers:
+            await asyncio.wait(self._workers, timeout=5)
+            self._workers = []
+        logger.log("Stopped consuming messages")
+        if self.connection and not self.connection.is_closed:
+            await self.connection.close()
+            logger.log("Closed RabbitMQ connection")
+
+
 def get_consumer_service(queue: str) -> RabbitMQConsumer:
-    return RabbitMQConsumer(queue)
\ No newline at end of file
+    return RabbitMQConsumer(queue)
+
+def get_async_consumer_service(queue: str) -> AsyncRabbitMQConsumer:
+    return AsyncRabbitMQConsumer(queue)
+
+def get_sharded_consumer_service(queue: str) -> ShardedRabbitMQConsumer:
+    return ShardedRabbitMQConsumer(queue)
@@ -0,0 +1,179 @@
+"""
+Cross-service log fan-out.
+
+GET /logs/all reads the logs of this service and of the order and payment
+services concurrently, each source newest first from its own position, and
+merges them by timestamp with a k-way heap merge that stops after one page.
+Every source has its own timeout: one that is slow or down is reported on the
+page instead of holding it up, and is asked again from the same position for
+the next page.
+"""
+import asyncio
+import base64
+import binascii
+import heapq
+import itertools
+import json
+from dataclasses import dataclass
+from typing import Optional
+import httpx
+import config
+from service_logs.query import read_log_page
+from service_logs.reader import run_log_query
+from logger import logger
+
+
+@dataclass
+class LogQuery:
+    """Filters of a fan-out query, passed on to every source."""
+    level: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    module: Optional[str] = None
+    search: Optional[str] = None
+    # search as an FTS5 query, for the sources read from partition files
+    fts_query: str = ""
+    # Authorization header forwarded to the sources read over HTTP
+    authorization: Optional[str] = None
+
+
+def encode_positions(positions: dict) -> str:
+    """Cursor holding, per source, the (timestamp, id) of the last entry returned, or None once it is exhausted."""
+    return base64.urlsafe_b64encode(json.dumps(positions, separators=(",", ":")).encode()).decode()
+
+
+def decode_positions(cursor: str) -> dict:
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(positions, dict):
+        raise ValueError("Invalid cursor")
+    return {name: tuple(position) if position else None for name, position in positions.items()}
+
+
+class PartitionLogSource:
+    """Reads a log directory of daily partitions: this service's own, or another's on a shared volume."""
+    def __init__(self, name: str, log_dir: str, time_column: str):
+        self.name = name
+        self.log_dir = log_dir
+        self.time_column = time_column
+
+    async def fetch(self, query: LogQuery, after: tuple | None, limit: int) -> list[dict]:
+        rows = await run_log_query(
+            read_log_page, self.log_dir, self.time_column, query.level, query.start_date,
+            query.end_date, query.module, query.fts_query, after, limit
+        )
+        return [
+            {
+                "service": self.name,
+                "id": row[0],
+                "timestamp": row[1],
+                "level": row[2],
+                "message": row[3],
+                "module": row[4],
+                "funcName": row[5],
+                "lineno": row[6],
+            }
+            for row in rows
+        ]
+
+
+class HttpLogSource:
+    """Reads another service's GET /logs/ with count=none and its ?cursor=."""
+    def __init__(self, name: str, base_url: str, time_field: str = "created"):
+        self.name = name
+        self.base_url = base_url
+        self.time_field = time_field
+
+    async def fetch(self, query: LogQuery, after: tuple | None, limit: int) -> list[dict]:
+        params = {"page_size": limit, "count": "none"}
+        for field in ("level", "start_date", "end_date", "module", "search"):
+            value = getattr(query, field)
+            if value:
+                params[field] = value
+        if after:
+            params["cursor"] = base64.urlsafe_b64encode(f"{after[0]}|{after[1]}".encode()).decode()
+        headers = {"accept": "application/json"}
+        if query.authorization:
+            headers["Authorization"] = query.authorization
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{self.base_url}/logs/", params=params, headers=headers)
+            response.raise_for_status()
+        return [
+            {
+                "service": self.name,
+                "id": item["id"],
+                "timestamp": item[self.time_field],
+                "level": item["level"],
+                "message": item["message"],
+                "module": item["module"],
+                "funcName": item["funcName"],
+                "lineno": item["lineno"],
+            }
+            for item in response.json()
+        ]
+
+
+class LogFanOut:
+    def __init__(self, sources: list, timeout: float = config.LOG_FANOUT_SOURCE_TIMEOUT):
+        self.sources = sources
+        self.timeout = timeout
+
+    async def _fetch(self, source, query: LogQuery, after: tuple | None, limit: int) -> tuple[str, list | None]:
+        try:
+            entries = await asyncio.wait_for(source.fetch(query, after, limit), self.timeout)
+            return "ok", entries
+        except asyncio.TimeoutError:
+            logger.log(f"Log source {source.name} timed out after {self.timeout}s", level="WARNING")
+            return "timeout", None
+        except Exception as e:
+            logger.log(f"Log source {source.name} failed: {str(e)}", level="ERROR")
+            return f"error: {str(e)}", None
+
+    async def page(self, query: LogQuery, positions: dict, page_size: int) -> tuple[list[dict], dict, dict]:
+        """
+        One merged page, newest first. positions is the decoded cursor, {} for
+        the first page; returns (entries, positions for the next page, status
+        of each source queried).
+        """
+        # a source missing from positions starts from its newest entry; None means it is exhausted
+        active = [source for source in self.sources if source.name not in positions or positions[source.name]]
+        results = await asyncio.gather(*(
+            self._fetch(source, query, positions.get(source.name), page_size) for source in active
+        ))
+        statuses = {source.name: status for source, (status, _) in zip(active, results)}
+        fetched = {source.name: entries for source, (_, entries) in zip(active, results) if entries is not None}
+
+        # every source is already newest first, so the merge only looks at the head of each
+        merged = list(itertools.islice(
+            heapq.merge(*fetched.values(), key=lambda entry: (entry["timestamp"], entry["id"]), reverse=True),
+            page_size
+        ))
+
+        next_positions = dict(positions)
+        taken = {}
+        for entry in merged:
+            taken[entry["service"]] = taken.get(entry["service"], 0) + 1
+        for name, entries in fetched.items():
+            count = taken.get(name, 0)
+            if count == len(entries) and len(entries) < page_size:
+                next_positions[name] = None
+            elif count:
+                last = entries[count - 1]
+                next_positions[name] = (last["timestamp"], last["id"])
+        return merged, next_positions, statuses
+
+    def exhausted(self, positions: dict) -> bool:
+        return all(source.name in positions and positions[source.name] is None for source in self.sources)
+
+
+def get_log_fanout() -> LogFanOut:
+    sources = [PartitionLogSource("orchestration", config.LOG_DIR, "timestamp")]
+    if config.LOG_FANOUT_MODE == "files":
+        sources.append(PartitionLogSource("order", config.ORDER_LOG_DIR, "created"))
+        sources.append(PartitionLogSource("payment", config.PAYMENT_LOG_DIR, "created"))
+    else:
+        sources.append(HttpLogSource("order", config.ORDER_SERVICE_URL))
+        sources.append(HttpLogSource("payment", config.PAYMENT_SERVICE_URL))
+    return LogFanOut(sources)
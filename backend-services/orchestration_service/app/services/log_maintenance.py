@@ -0,0 +1,14 @@
+"""
+Log partition maintenance.
+
+Runs in the background: deletes the daily log partitions that are past
+LOG_RETENTION_DAYS and VACUUMs the closed ones, so neither a DELETE over the
+log table nor a VACUUM of the partition being written ever runs on a request.
+"""
+from service_logs.partitions import PartitionMaintenance
+import config
+from logger import logger
+
+
+def get_log_maintenance() -> PartitionMaintenance:
+    return PartitionMaintenance(config.LOG_DIR, logger.log)
@@ -2,19 +2,137 @@
 RabbitMQ message publisher for sending messages to a queue.
 This module provides a simple interface for publishing messages to RabbitMQ queues.
 """
+import asyncio
+import queue as queue_lib
+import threading
+import uuid
 from typing import List
+import aio_pika
 import pika
 import json
 from models.saga_state import OrderSagaState, PaymentSagaState
 import config
 from models.order import OrderCreateRequest, OrderResponse, OrderItemCreate
 from models.payment import PaymentCreate, PaymentResponse
-from logger import logger
+from logger import logger, current_log_context
+
+
+def _encode(message: dict) -> str:
+    # every message gets an id consumers deduplicate redeliveries by
+    message = {"message_id": str(uuid.uuid4()), **message}
+    # and carries the sender's log context, which the consumer logs under
+    context = current_log_context()
+    if context:
+        message.setdefault("log_context", context)
+    # make every object with .dict() into a plain dict,
+    # and leave primitives/lists alone
+    return json.dumps(
+        message,
+        default=lambda o: o.dict() if hasattr(o, "dict") else super(type(o), o)
+    )
+
+# Command builders shared by the blocking and the asyncio publisher.
+# Each returns the command body together with the queue it is routed to.
+
+def _reduce_stock_command(products: List[OrderItemCreate], transaction_id: str) -> tuple[dict, str]:
+    command = {
+        "event": "reduce_stock",
+        "transaction_id": transaction_id,
+        "data": {
+            "products": [{"product_id": product.product_id, "quantity": product.quantity} for product in products]
+        }
+    }
+    return command, config.RABBITMQ_PRODUCTS_QUEUE
+
+def _create_order_command(order_data: OrderCreateRequest | OrderSagaState, transaction_id: str) -> tuple[dict, str]:
+    command = {
+        "event": "create_order",
+        "transaction_id": transaction_id,
+        "data": {
+            "user_email": order_data.user_email,
+            "vendor_email": order_data.vendor_email,
+            "delivery_address": order_data.delivery_address,
+            "description": order_data.description,
+            "status": order_data.status,
+            "items": order_data.items
+        }
+    }
+    return command, config.RABBITMQ_ORDERS_QUEUE
+
+def _take_payment_command(payment_data: PaymentSagaState) -> tuple[dict, str]:
+    command = {
+        "event": "take_payment",
+        "transaction_id": payment_data.transaction_id,
+        "data": {
+            "user_email": payment_data.user_email,
+            "order_id": payment_data.order_id,
+            "amount": payment_data.amount,
+            "payment_method": payment_data.payment_method,
+            "payment_status": payment_data.payment_status
+        }
+    }
+    return command, config.RABBITMQ_PAYMENT_QUEUE
+
+def _rollback_stock_command(transaction_id: str, products: dict | None = None) -> tuple[dict, str]:
+    command = {
+        "event": "rollback_stock",
+        "transaction_id": transaction_id,
+        "data": {
+            "transaction_id": transaction_id,
+            # product_id -> quantity to release, from the saga's stock ledger
+            "products": [
+                {"product_id": product_id, "quantity": quantity}
+                for product_id, quantity in (products or {}).items()
+            ]
+        }
+    }
+    return command, config.RABBITMQ_PRODUCTS_QUEUE
+
+def _rollback_payment_command(transaction_id: str, payment_id: str) -> tuple[dict, str]:
+    command = {
+        "event": "rollback_payment",
+        "transaction_id": transaction_id,
+        "data": {
+            "payment_id": payment_id
+        }
+    }
+    return command, config.RABBITMQ_PAYMENT_QUEUE
+
+def _rollback_order_command(transaction_id: str) -> tuple[dict, str]:
+    command = {
+        "event": "rollback_order",
+        "transaction_id": transaction_id,
+        "data": {
+
+        }
+    }
+    return command, config.RABBITMQ_ORDERS_QUEUE
+
+def _update_order_payment_id_command(order_id: str, payment_id: str) -> tuple[dict, str]:
+    command = {
+        "event": "update_order_payment_id",
+        "data": {
+            "order_id": order_id,
+            "payment_id": payment_id
+        }
+    }
+    return command, config.RABBITMQ_ORDERS_QUEUE
+
+def _update_payment_order_id_command(payment_id: str, order_id: str) -> tuple[dict, str]:
+    command = {
+        "event": "update_payment_order_id",
+        "data": {
+            "payment_id": payment_id,
+            "order_id": order_id
+        }
+    }
+    return command, config.RABBITMQ_PAYMENT_QUEUE
+
 
 class RabbitMQPublisher:
     def __init__(self):
         credentials = pika.PlainCredentials(
-            username=config.RABBITMQ_USER, 
+            username=config.RABBITMQ_USER,
             password=config.RABBITMQ_PASSWORD
         )
         self.connection_params = pika.ConnectionParameters(
@@ -42,12 +160,7 @@ class RabbitMQPublisher:
             if not self.connection or self.connection.is_closed:
                 self.connect()
 
-            # make every object with .dict() into a plain dict,
-            # and leave primitives/lists alone
-            body_str = json.dumps(
-                message,
-                default=lambda o: o.dict() if hasattr(o, "dict") else super(type(o), o)
-            )
+            body_str = _encode(message)
 
             self.channel.queue_declare(queue=queue, durable=True)
             self.channel.basic_publish(
@@ -66,71 +179,27 @@ class RabbitMQPublisher:
     def publish_reduce_stock_command(self, products: List[OrderItemCreate], transaction_id: str):
         """Publish a command to reduce stock."""
         logger.log(f"Publishing reduce stock command for transaction {transaction_id}")
-        command = {
-            "event": "reduce_stock",
-            "transaction_id": transaction_id,
-            "data": {
-                "products": [{"product_id": product.product_id, "quantity": product.quantity} for product in products]
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_PRODUCTS_QUEUE)
+        self.publish_message(*_reduce_stock_command(products, transaction_id))
 
     def publish_create_order_command(self, order_data: OrderCreateRequest | OrderSagaState, transaction_id: str):
         """Publish a command to create an order."""
         logger.log(f"Publishing create order command for transaction {transaction_id}")
-        command = {
-            "event": "create_order",
-            "transaction_id": transaction_id,
-            "data": {
-                "user_email": order_data.user_email,
-                "vendor_email": order_data.vendor_email,
-                "delivery_address": order_data.delivery_address,
-                "description": order_data.description,
-                "status": order_data.status,
-                "items": order_data.items
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_ORDERS_QUEUE)
+        self.publish_message(*_create_order_command(order_data, transaction_id))
 
     def publish_take_payment_command(self, payment_data: PaymentSagaState):
         """Publish a command to take payment."""
         logger.log(f"Publishing take payment command for transaction {payment_data.transaction_id}")
-        command = {
-            "event": "take_payment",
-            "transaction_id": payment_data.transaction_id,
-            "data": {
-                "user_email": payment_data.user_email,
-                "order_id": payment_data.order_id,
-                "amount": payment_data.amount,
-                "payment_method": payment_data.payment_method,
-                "payment_status": payment_data.payment_status
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_PAYMENT_QUEUE)
-    
-    def publish_rollback_stock_command(self, transaction_id: str):
+        self.publish_message(*_take_payment_command(payment_data))
+
+    def publish_rollback_stock_command(self, transaction_id: str, products: dict | None = None):
         """Publish a command to rollback stock."""
         logger.log(f"Publishing rollback stock command for transaction {transaction_id}")
-        command = {
-            "event": "rollback_stock",
-            "transaction_id": transaction_id,
-            "data": {
-                
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_PRODUCTS_QUEUE)
+        self.publish_message(*_rollback_stock_command(transaction_id, products))
 
     def publish_rollback_payment_command(self, transaction_id: str, payment_id: str):
         """Publish a command to rollback payment."""
         logger.log(f"Publishing rollback payment command for transaction {transaction_id} and payment {payment_id}")
-        command = {
-            "event": "rollback_payment",
-            "transaction_id": transaction_id,
-            "data": {
-                "payment_id": payment_id
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_PAYMENT_QUEUE)
+        self.publish_message(*_rollback_payment_command(transaction_id, payment_id))
 
     def close(self):
         if self.connection and not self.connection.is_closed:
@@ -140,38 +209,376 @@ class RabbitMQPublisher:
     def publish_rollback_order_command(self, transaction_id: str):
         """Publish a command to rollback order."""
         logger.log(f"Publishing rollback order command for transaction {transaction_id}")
-        command = {
-            "event": "rollback_order",
-            "transaction_id": transaction_id,
-            "data": {
-                
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_ORDERS_QUEUE)
+        self.publish_message(*_rollback_order_command(transaction_id))
 
     def publish_update_order_payment_id(self, order_id: str, payment_id: str):
         """Publish a command to update order with payment ID."""
         logger.log(f"Publishing update order payment ID command for order {order_id} and payment {payment_id}")
-        command = {
-            "event": "update_order_payment_id",
-            "data": {
-                "order_id": order_id,
-                "payment_id": payment_id
-            }
-        }
-        self.publish_message(command, config.RABBITMQ_ORDERS_QUEUE)
-    
+        self.publish_message(*_update_order_payment_id_command(order_id, payment_id))
+
     def publish_update_payment_order_id(self, payment_id: str, order_id: str):
         """Publish a command to update payment with order ID."""
         logger.log(f"Publishing update payment order ID command for payment {payment_id} and order {order_id}")
-        command = {
-            "event": "update_payment_order_id",
-            "data": {
-                "payment_id": payment_id,
-                "order_id": order_id
+        self.publish_message(*_update_payment_order_id_command(payment_id, order_id))
+
+
+class _PooledChannel:
+    """A pooled connection and its channel. Only one thread uses it at a time."""
+    def __init__(self, connection_params: pika.ConnectionParameters):
+        self.connection = pika.BlockingConnection(connection_params)
+        self.channel = self.connection.channel()
+        self.declared_queues = set()
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection.is_open and self.channel.is_open
+
+    def close(self):
+        try:
+            if self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+
+
+class PooledRabbitMQPublisher(RabbitMQPublisher):
+    """
+    Thread-safe publisher shared by the whole process. It keeps a bounded pool of
+    long-lived connections, each with its own channel, and hands one out per
+    publish. pika's BlockingConnection is not thread-safe, so a pooled connection
+    is never used by two threads at once. A connection that fails mid-publish is
+    discarded and the publish is retried once on a fresh one.
+    """
+    def __init__(self, pool_size: int = config.RABBITMQ_PUBLISHER_POOL_SIZE,
+                 checkout_timeout: float = config.RABBITMQ_PUBLISHER_POOL_TIMEOUT):
+        super().__init__()
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue_lib.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+        self._counters = {
+            "publishes": 0,
+            "publish_failures": 0,
+            "connections_opened": 0,
+            "reconnects": 0,
+            "checkout_waits": 0,
+        }
+
+    def connect(self):
+        """Open one pooled connection; kept for compatibility with RabbitMQPublisher."""
+        self._checkin(self._checkout())
+
+    def _open_slot(self) -> _PooledChannel:
+        try:
+            slot = _PooledChannel(self.connection_params)
+        except Exception as e:
+            with self._lock:
+                self._open -= 1
+            logger.log(f"Failed to connect to RabbitMQ: {str(e)}", level="ERROR")
+            raise
+        with self._lock:
+            self._counters["connections_opened"] += 1
+        return slot
+
+    def _checkout(self) -> _PooledChannel:
+        try:
+            slot = self._idle.get_nowait()
+        except queue_lib.Empty:
+            with self._lock:
+                can_open = self._open < self.pool_size
+                if can_open:
+                    self._open += 1
+                else:
+                    self._counters["checkout_waits"] += 1
+            if can_open:
+                slot = self._open_slot()
+            else:
+                try:
+                    slot = self._idle.get(timeout=self.checkout_timeout)
+                except queue_lib.Empty:
+                    raise TimeoutError(
+                        f"No RabbitMQ channel available within {self.checkout_timeout}s "
+                        f"(pool size {self.pool_size})"
+                    )
+
+        if not slot.is_open:
+            slot.close()
+            with self._lock:
+                self._counters["reconnects"] += 1
+            slot = self._open_slot()
+
+        with self._lock:
+            self._in_use += 1
+        return slot
+
+    def _checkin(self, slot: _PooledChannel, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+            if broken:
+                self._open -= 1
+        if broken:
+            slot.close()
+        else:
+            self._idle.put(slot)
+
+    def publish_message(self, message: dict, queue: str):
+        """Publish a message to the specified RabbitMQ queue on a pooled channel."""
+        body_str = _encode(message)
+        for attempt in (1, 2):
+            slot = self._checkout()
+            try:
+                # services heartbeats on connections that sat idle in the pool
+                slot.connection.process_data_events(time_limit=0)
+                if queue not in slot.declared_queues:
+                    slot.channel.queue_declare(queue=queue, durable=True)
+                    slot.declared_queues.add(queue)
+                slot.channel.basic_publish(
+                    exchange='',
+                    routing_key=queue,
+                    body=body_str,
+                    properties=pika.BasicProperties(
+                        delivery_mode=2  # make message persistent
+                    )
+                )
+            except pika.exceptions.AMQPError as e:
+                self._checkin(slot, broken=True)
+                if attempt == 1:
+                    with self._lock:
+                        self._counters["reconnects"] += 1
+                    logger.log(f"RabbitMQ connection lost while publishing to {queue}, retrying: {str(e)}", level="WARNING")
+                    continue
+                with self._lock:
+                    self._counters["publish_failures"] += 1
+                logger.log(f"Failed to publish message to queue {queue}: {str(e)}", level="ERROR")
+                raise
+            except Exception as e:
+                self._checkin(slot, broken=True)
+                with self._lock:
+                    self._counters["publish_failures"] += 1
+                logger.log(f"Failed to publish message to queue {queue}: {str(e)}", level="ERROR")
+                raise
+
+            self._checkin(slot)
+            with self._lock:
+                self._counters["publishes"] += 1
+            logger.log(f"Successfully published message to queue {queue} with event type: {message.get('event')}")
+            return
+
+    def stats(self) -> dict:
+        """Pool utilisation counters."""
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": self._open - self._in_use,
+                **self._counters,
             }
+
+    def close(self):
+        while True:
+            try:
+                slot = self._idle.get_nowait()
+            except queue_lib.Empty:
+                break
+            with self._lock:
+                self._open -= 1
+            slot.close()
+        logger.log("Closed pooled RabbitMQ connections")
+
+
+class AsyncRabbitMQPublisher:
+    """
+    asyncio variant of RabbitMQPublisher built on aio-pika. One robust connection
+    is shared by all callers and publishes go out over a bounded pool of channels;
+    queues are declared once per connection instead of on every publish.
+    """
+    def __init__(self, pool_size: int = config.RABBITMQ_PUBLISHER_POOL_SIZE,
+                 checkout_timeout: float = config.RABBITMQ_PUBLISHER_POOL_TIMEOUT):
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.connection = None
+        self._channels = None
+        self._open = 0
+        # channels checked out of the current pool; connect() and close() start a new one
+        self._checked_out = set()
+        self._declared_queues = set()
+        self._connect_lock = None
+        self._counters = {
+            "publishes": 0,
+            "publish_failures": 0,
+            "channels_opened": 0,
+            "checkout_waits": 0,
+        }
+        logger.log("Initialized asyncio RabbitMQ publisher")
+
+    async def connect(self):
+        """Establish the shared connection and reset the channel pool."""
+        try:
+            self.connection = await aio_pika.connect_robust(
+                host=config.RABBITMQ_HOST,
+                port=config.RABBITMQ_PORT,
+                login=config.RABBITMQ_USER,
+                password=config.RABBITMQ_PASSWORD
+            )
+            self._channels = asyncio.Queue()
+            self._open = 0
+            self._checked_out = set()
+            self._declared_queues.clear()
+            logger.log("Successfully connected to RabbitMQ (asyncio)")
+        except Exception as e:
+            logger.log(f"Failed to connect to RabbitMQ: {str(e)}", level="ERROR")
+            raise
+
+    async def _ensure_connection(self):
+        if self.connection and not self.connection.is_closed:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if not self.connection or self.connection.is_closed:
+                await self.connect()
+
+    async def _open_channel(self):
+        """A new channel for a slot already counted in _open; the slot is given up if it fails."""
+        try:
+            channel = await self.connection.channel()
+        except Exception as e:
+            self._open -= 1
+            logger.log(f"Failed to open RabbitMQ channel: {str(e)}", level="ERROR")
+            raise
+        self._counters["channels_opened"] += 1
+        return channel
+
+    async def _checkout(self):
+        await self._ensure_connection()
+        if self._channels.empty() and self._open < self.pool_size:
+            self._open += 1
+            channel = await self._open_channel()
+        else:
+            if self._channels.empty():
+                self._counters["checkout_waits"] += 1
+            try:
+                channel = await asyncio.wait_for(self._channels.get(), self.checkout_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"No RabbitMQ channel available within {self.checkout_timeout}s "
+                    f"(pool size {self.pool_size})"
+                )
+            if channel.is_closed:
+                channel = await self._open_channel()
+        self._checked_out.add(channel)
+        return channel
+
+    def _checkin(self, channel):
+        if channel not in self._checked_out:
+            # checked out before a reconnect; its connection is gone and the new pool has no slot for it
+            return
+        self._checked_out.remove(channel)
+        self._channels.put_nowait(channel)
+
+    async def publish_message(self, message: dict, queue: str):
+        """Publish a message to the specified RabbitMQ queue."""
+        try:
+            channel = await self._checkout()
+            try:
+                if queue not in self._declared_queues:
+                    await channel.declare_queue(queue, durable=True)
+                    self._declared_queues.add(queue)
+
+                await channel.default_exchange.publish(
+                    aio_pika.Message(
+                        body=_encode(message).encode(),
+                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT  # make message persistent
+                    ),
+                    routing_key=queue
+                )
+            finally:
+                self._checkin(channel)
+            self._counters["publishes"] += 1
+            logger.log(f"Successfully published message to queue {queue} with event type: {message.get('event')}")
+        except Exception as e:
+            self._counters["publish_failures"] += 1
+            logger.log(f"Failed to publish message to queue {queue}: {str(e)}", level="ERROR")
+            raise
+
+    def stats(self) -> dict:
+        """Channel pool utilisation counters."""
+        return {
+            "pool_size": self.pool_size,
+            "open": self._open,
+            "in_use": len(self._checked_out),
+            "idle": self._open - len(self._checked_out),
+            **self._counters,
         }
-        self.publish_message(command, config.RABBITMQ_PAYMENT_QUEUE)
 
-def get_publisher_service() -> RabbitMQPublisher:
-    return RabbitMQPublisher()
\ No newline at end of file
+    async def publish_reduce_stock_command(self, products: List[OrderItemCreate], transaction_id: str):
+        """Publish a command to reduce stock."""
+        logger.log(f"Publishing reduce stock command for transaction {transaction_id}")
+        await self.publish_message(*_reduce_stock_command(products, transaction_id))
+
+    async def publish_create_order_command(self, order_data: OrderCreateRequest | OrderSagaState, transaction_id: str):
+        """Publish a command to create an order."""
+        logger.log(f"Publishing create order command for transaction {transaction_id}")
+        await self.publish_message(*_create_order_command(order_data, transaction_id))
+
+    async def publish_take_payment_command(self, payment_data: PaymentSagaState):
+        """Publish a command to take payment."""
+        logger.log(f"Publishing take payment command for transaction {payment_data.transaction_id}")
+        await self.publish_message(*_take_payment_command(payment_data))
+
+    async def publish_rollback_stock_command(self, transaction_id: str, products: dict | None = None):
+        """Publish a command to rollback stock."""
+        logger.log(f"Publishing rollback stock command for transaction {transaction_id}")
+        await self.publish_message(*_rollback_stock_command(transaction_id, products))
+
+    async def publish_rollback_payment_command(self, transaction_id: str, payment_id: str):
+        """Publish a command to rollback payment."""
+        logger.log(f"Publishing rollback payment command for transaction {transaction_id} and payment {payment_id}")
+        await self.publish_message(*_rollback_payment_command(transaction_id, payment_id))
+
+    async def publish_rollback_order_command(self, transaction_id: str):
+        """Publish a command to rollback order."""
+        logger.log(f"Publishing rollback order command for transaction {transaction_id}")
+        await self.publish_message(*_rollback_order_command(transaction_id))
+
+    async def publish_update_order_payment_id(self, order_id: str, payment_id: str):
+        """Publish a command to update order with payment ID."""
+        logger.log(f"Publishing update order payment ID command for order {order_id} and payment {payment_id}")
+        await self.publish_message(*_update_order_payment_id_command(order_id, payment_id))
+
+    async def publish_update_payment_order_id(self, payment_id: str, order_id: str):
+        """Publish a command to update payment with order ID."""
+        logger.log(f"Publishing update payment order ID command for payment {payment_id} and order {order_id}")
+        await self.publish_message(*_update_payment_order_id_command(payment_id, order_id))
+
+    async def close(self):
+        if self.connection and not self.connection.is_closed:
+            # closing the connection closes every pooled channel with it
+            await self.connection.close()
+            self._channels = None
+            self._open = 0
+            self._checked_out = set()
+            logger.log("Closed RabbitMQ connection (asyncio)")
+
+_publisher: PooledRabbitMQPublisher | None = None
+_publisher_lock = threading.Lock()
+
+def get_publisher_service() -> PooledRabbitMQPublisher:
+    """Return the process-wide pooled publisher, creating it on first use."""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = PooledRabbitMQPublisher()
+    return _publisher
+
+_async_publisher: AsyncRabbitMQPublisher | None = None
+
+def get_async_publisher_service() -> AsyncRabbitMQPublisher:
+    global _async_publisher
+    if _async_publisher is None:
+        _async_publisher = AsyncRabbitMQPublisher()
+    return _async_publisher
@@ -0,0 +1,51 @@
+"""Order service client."""
+import httpx
+import config
+from logger import logger
+
+class OrderServiceClient:
+    """
+    Reads orders from the order service. Used as the durable fallback for
+    order_id -> transaction_id lookups once the mapping has left Redis.
+    """
+    def __init__(self):
+        self.base_url = config.ORDER_SERVICE_URL
+        self.timeout = 5
+
+    def _headers(self, jwt_token: str | None) -> dict:
+        headers = {"accept": "application/json"}
+        if jwt_token:
+            headers["Authorization"] = jwt_token
+        return headers
+
+    def _parse(self, order_id: str, response: httpx.Response) -> dict | None:
+        if response.status_code == 404:
+            logger.log(f"Order {order_id} not found in order service", level="WARNING")
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def get_order(self, order_id: str, jwt_token: str | None = None) -> dict | None:
+        url = f"{self.base_url}/orders/{order_id}"
+        logger.log(f"Fetching order {order_id} from order service")
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            try:
+                response = await client.get(url, headers=self._headers(jwt_token))
+                return self._parse(order_id, response)
+            except Exception as e:
+                logger.log(f"Failed to fetch order {order_id}: {str(e)}", level="ERROR")
+                return None
+
+    def get_order_blocking(self, order_id: str, jwt_token: str | None = None) -> dict | None:
+        url = f"{self.base_url}/orders/{order_id}"
+        logger.log(f"Fetching order {order_id} from order service")
+        with httpx.Client(timeout=self.timeout) as client:
+            try:
+                response = client.get(url, headers=self._headers(jwt_token))
+                return self._parse(order_id, response)
+            except Exception as e:
+                logger.log(f"Failed to fetch order {order_id}: {str(e)}", level="ERROR")
+                return None
+
+def get_order_service_client() -> OrderServiceClient:
+    return OrderServiceClient()
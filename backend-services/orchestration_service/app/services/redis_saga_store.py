@@ -1,19 +1,364 @@
+import threading
+from typing import NamedTuple
+from contextlib import contextmanager, asynccontextmanager
 import redis
+import redis.asyncio as aioredis
 import json
 from models.order import OrderItemCreate
 from models.saga_state import OrderSagaState, ProductSagaState, PaymentSagaState
 import config
+
+# Every transaction is a single hash, saga:{transaction_id}. The order, product
+# and payment saga states are views over its fields, so a step reads (HMGET) and
+# writes (HSET) only the fields it touches. user_email and payment_method are
+# shared between the order and the payment view.
+ORDER_SAGA_FIELDS = (
+    "transaction_id", "description", "user_email", "vendor_email",
+    "delivery_address", "payment_method", "status", "items", "payment_id",
+)
+PRODUCT_SAGA_FIELDS = ("transaction_id", "products", "reserved_products")
+PAYMENT_SAGA_FIELDS = (
+    "transaction_id", "user_email", "order_id", "amount", "payment_method", "payment_status",
+)
+
+# fields that only one view writes; their presence means that view was saved
+_ORDER_ONLY_FIELDS = ("description", "vendor_email", "delivery_address", "status", "items", "payment_id")
+_PRODUCT_ONLY_FIELDS = ("products", "reserved_products")
+# product_id -> quantity ledgers, kept as compact JSON objects
+_LEDGER_FIELDS = ("products", "reserved_products")
+_PAYMENT_ONLY_FIELDS = ("order_id", "amount", "payment_status")
+
+
+# Sorted set of in-flight sagas scored by the time their current step times out.
+# Terminal steps drop out of it, so its size is the number of sagas in flight.
+SAGA_DEADLINES_KEY = "saga_deadlines"
+
+# Atomically moves a saga from one of the allowed steps to the next one, bumping
+# its version, so concurrent consumers can never apply the same step twice or
+# interleave read-modify-write cycles on one saga. The saga's entry in the
+# deadline index is moved (or removed) in the same step.
+#   KEYS[1]  saga hash
+#   KEYS[2]  deadline index
+#   ARGV[1]  transaction id
+#   ARGV[2]  expected version ('' skips the check)
+#   ARGV[3]  step to move to
+#   ARGV[4]  ttl in seconds
+#   ARGV[5]  deadline of the new step ('' removes the saga from the index)
+#   ARGV[6]  number of allowed current steps, followed by the steps themselves
+#   rest     field/value pairs to set with the transition
+TRANSITION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {'missing', '', '0'}
+end
+local current = redis.call('HMGET', KEYS[1], 'step', 'version')
+local step = current[1] or ''
+local version = current[2] or '0'
+if ARGV[2] ~= '' and ARGV[2] ~= version then
+    return {'conflict', step, version}
+end
+local allowed_count = tonumber(ARGV[6])
+local allowed = false
+for i = 7, 6 + allowed_count do
+    if ARGV[i] == step then
+        allowed = true
+        break
+    end
+end
+if not allowed then
+    return {'conflict', step, version}
+end
+local first_field = 7 + allowed_count
+if #ARGV >= first_field then
+    redis.call('HSET', KEYS[1], unpack(ARGV, first_field))
+end
+redis.call('HSET', KEYS[1], 'step', ARGV[3])
+local new_version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+if ARGV[5] == '' then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+else
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+end
+return {'ok', ARGV[3], tostring(new_version)}
+"""
+
+# Claims up to ARGV[2] sagas whose deadline (score) is at or before ARGV[1] and
+# pushes their deadline out by a lease of ARGV[3] seconds, so a sweeper that
+# dies halfway leaves them to be claimed again rather than lost.
+CLAIM_EXPIRED_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local retry_at = tonumber(ARGV[1]) + tonumber(ARGV[3])
+for _, transaction_id in ipairs(expired) do
+    redis.call('ZADD', KEYS[1], retry_at, transaction_id)
+end
+return expired
+"""
+
+
+class SagaTransition(NamedTuple):
+    """Outcome of a step transition: the saga's step and version afterwards, or as found when not applied."""
+    applied: bool
+    step: str | None
+    version: int
+
+
+def _transition_args(transaction_id: str, from_steps, to_step: str, fields: dict | None,
+                     expected_version, deadline, ttl: int) -> list:
+    if isinstance(from_steps, str):
+        from_steps = (from_steps,)
+    args = [
+        transaction_id,
+        "" if expected_version is None else str(expected_version),
+        to_step,
+        ttl,
+        "" if deadline is None else repr(float(deadline)),
+        len(from_steps),
+        *from_steps,
+    ]
+    for field, value in (fields or {}).items():
+        args += [field, _encode_field(field, value)]
+    return args
+
+
+def _transition_result(reply) -> SagaTransition:
+    outcome, step, version = reply
+    return SagaTransition(applied=outcome == "ok", step=step or None, version=int(version))
+
+
+def saga_key(transaction_id: str) -> str:
+    return f"saga:{transaction_id}"
+
+
+def _encode_field(field: str, value) -> str:
+    if field == "items":
+        return json.dumps([item if isinstance(item, dict) else item.dict() for item in value])
+    if field in _LEDGER_FIELDS:
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+def _decode_field(field: str, raw: str | None):
+    if raw is None:
+        return None
+    if field == "version":
+        return int(raw)
+    if field == "amount":
+        return float(raw)
+    if field == "items":
+        return [OrderItemCreate(**it) for it in json.loads(raw)]
+    if field in _LEDGER_FIELDS:
+        return json.loads(raw)
+    return raw
+
+
+def _decode_fields(fields: tuple, values: list) -> dict | None:
+    if all(value is None for value in values):
+        return None
+    return {field: _decode_field(field, raw) for field, raw in zip(fields, values)}
+
+
+def _order_saga_from_fields(data: dict | None) -> OrderSagaState | None:
+    if not data or data["vendor_email"] is None:
+        return None
+    return OrderSagaState(
+        transaction_id   = data["transaction_id"],
+        description      = data["description"],
+        user_email       = data["user_email"],
+        vendor_email     = data["vendor_email"],
+        delivery_address = data["delivery_address"],
+        payment_method   = data["payment_method"],
+        status           = data["status"] or "Pending",
+        items            = data["items"] or [],
+        payment_id       = data["payment_id"],
+    )
+
+
+def _product_saga_from_fields(data: dict | None) -> ProductSagaState | None:
+    if not data or data["products"] is None:
+        return None
+    return ProductSagaState(**data)
+
+
+def _payment_saga_from_fields(data: dict | None) -> PaymentSagaState | None:
+    if not data or data["amount"] is None:
+        return None
+    return PaymentSagaState(**data)
+
+
+_connection_pools: dict[tuple, redis.ConnectionPool] = {}
+_connection_pools_lock = threading.Lock()
+
+def get_redis_connection_pool(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB) -> redis.ConnectionPool:
+    """Return the process-wide connection pool for the given Redis database."""
+    key = (host, port, db)
+    pool = _connection_pools.get(key)
+    if pool is None:
+        with _connection_pools_lock:
+            pool = _connection_pools.get(key)
+            if pool is None:
+                # blocks callers when every connection is checked out instead
+                # of failing with "Too many connections"
+                pool = redis.BlockingConnectionPool(
+                    host=host, port=port, db=db,
+                    decode_responses=True,
+                    max_connections=config.REDIS_MAX_CONNECTIONS
+                )
+                _connection_pools[key] = pool
+    return pool
+
+
+class SagaWriteBatch:
+    """
+    Queues saga writes on a Redis pipeline. Works for both the blocking and the
+    asyncio pipeline, since queueing a command is synchronous on either; the
+    owning store sends the whole batch in one round trip as a MULTI/EXEC.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def update_saga_fields(self, transaction_id: str, fields: dict, ttl: int = 600):
+        """Set only the given fields of the saga hash. A None value removes the field."""
+        key = saga_key(transaction_id)
+        mapping = {field: _encode_field(field, value) for field, value in fields.items() if value is not None}
+        cleared = [field for field, value in fields.items() if value is None]
+        if mapping:
+            self.client.hset(key, mapping=mapping)
+        if cleared:
+            self.client.hdel(key, *cleared)
+        self.client.expire(key, ttl)
+
+    def schedule_deadline(self, transaction_id: str, deadline: float):
+        """(Re)arm the timeout of the saga's current step."""
+        self.client.zadd(SAGA_DEADLINES_KEY, {transaction_id: deadline})
+
+    def save_order_saga(self, saga: OrderSagaState, ttl: int = 600):
+        self.update_saga_fields(saga.transaction_id, saga.dict(), ttl)
+
+    def save_order_id_with_saga(self, order_id: str, transaction_id: str,
+                                ttl: int = config.ORDER_ID_MAPPING_TTL):
+        key = f"order_id:{order_id}"
+        self.client.set(key, transaction_id, ex=ttl)
+
+    def delete_order_saga(self, transaction_id: str):
+        self.client.hdel(saga_key(transaction_id), *_ORDER_ONLY_FIELDS)
+
+    def save_product_saga(self, saga: ProductSagaState, ttl: int = 600):
+        self.update_saga_fields(saga.transaction_id, saga.dict(), ttl)
+
+    def delete_product_saga(self, transaction_id: str):
+        self.client.hdel(saga_key(transaction_id), *_PRODUCT_ONLY_FIELDS)
+
+    def save_payment_saga(self, saga: PaymentSagaState, ttl: int = 600):
+        self.update_saga_fields(saga.transaction_id, saga.dict(), ttl)
+
+    def delete_payment_saga(self, transaction_id: str):
+        self.client.hdel(saga_key(transaction_id), *_PAYMENT_ONLY_FIELDS)
+
+
 class RedisSagaStore:
+    _transition_script = None
+    _claim_script = None
+
     def __init__(self, host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB):
-        self.client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+        self.client = redis.Redis(connection_pool=get_redis_connection_pool(host, port, db))
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect several saga writes and send them in a single round trip:
+
+            with store.batch() as batch:
+                batch.save_order_saga(order_saga_state)
+                batch.save_payment_saga(payment_saga_state)
+        """
+        pipe = self.client.pipeline(transaction=True)
+        try:
+            yield SagaWriteBatch(pipe)
+            pipe.execute()
+        finally:
+            pipe.reset()
+
+    def get_saga_fields(self, transaction_id: str, *fields: str) -> dict | None:
+        """HMGET the given fields of a saga; None when none of them is set."""
+        values = self.client.hmget(saga_key(transaction_id), fields)
+        return _decode_fields(fields, values)
+
+    def update_saga_fields(self, transaction_id: str, fields: dict, ttl: int = 600):
+        with self.batch() as batch:
+            batch.update_saga_fields(transaction_id, fields, ttl)
+
+    def transition(self, transaction_id: str, from_steps, to_step: str, fields: dict | None = None,
+                   expected_version: int | None = None, deadline: float | None = None,
+                   ttl: int = 600) -> SagaTransition:
+        """
+        Move the saga to ``to_step`` and set ``fields`` in one atomic step, but only
+        if it is currently at one of ``from_steps`` (and at ``expected_version``,
+        when given). Otherwise nothing is written and ``applied`` is False.
+
+        ``deadline`` (epoch seconds) is when the new step times out; without one
+        the saga leaves the deadline index, as it should on a final step.
+        """
+        if self._transition_script is None:
+            self._transition_script = self.client.register_script(TRANSITION_SCRIPT)
+        reply = self._transition_script(
+            keys=[saga_key(transaction_id), SAGA_DEADLINES_KEY],
+            args=_transition_args(transaction_id, from_steps, to_step, fields, expected_version, deadline, ttl)
+        )
+        return _transition_result(reply)
+
+    def transition_many(self, transitions: list[dict], ttl: int = 600) -> list[SagaTransition]:
+        """
+        Send several transitions (keyword arguments of ``transition``) in one round
+        trip. Each one is still applied atomically and independently.
+        """
+        if self._transition_script is None:
+            self._transition_script = self.client.register_script(TRANSITION_SCRIPT)
+        with self.client.pipeline(transaction=False) as pipe:
+            for request in transitions:
+                self._transition_script(
+                    keys=[saga_key(request["transaction_id"]), SAGA_DEADLINES_KEY],
+                    args=_transition_args(
+                        request["transaction_id"], request["from_steps"], request["to_step"],
+                        request.get("fields"), request.get("expected_version"), request.get("deadline"), ttl
+                    ),
+                    client=pipe
+                )
+            return [_transition_result(reply) for reply in pipe.execute()]
+
+    def get_many_saga_fields(self, transaction_ids: list[str], *fields: str) -> list[dict | None]:
+        """HMGET the same fields of several sagas in one round trip."""
+        with self.client.pipeline(transaction=False) as pipe:
+            for transaction_id in transaction_ids:
+                pipe.hmget(saga_key(transaction_id), fields)
+            return [_decode_fields(fields, values) for values in pipe.execute()]
+
+    def claim_expired_sagas(self, now: float, limit: int, lease: float) -> list[str]:
+        """
+        Return up to ``limit`` sagas whose deadline has passed, oldest first, and
+        hold them for ``lease`` seconds before they can be claimed again.
+        """
+        if self._claim_script is None:
+            self._claim_script = self.client.register_script(CLAIM_EXPIRED_SCRIPT)
+        return self._claim_script(keys=[SAGA_DEADLINES_KEY], args=[repr(float(now)), limit, lease])
+
+    def mark_cancelled(self, transaction_id: str, ttl: int = config.ORDER_ID_MAPPING_TTL) -> bool:
+        """Record a cancellation; False when the transaction was already cancelled."""
+        return bool(self.client.set(f"saga_cancelled:{transaction_id}", 1, nx=True, ex=ttl))
+
+    def clear_deadline(self, transaction_id: str):
+        self.client.zrem(SAGA_DEADLINES_KEY, transaction_id)
+
+    def count_in_flight(self) -> int:
+        return self.client.zcard(SAGA_DEADLINES_KEY)
 
     def save_order_saga(self, saga: OrderSagaState, ttl: int = 600):
-        key = f"order_saga:{saga.transaction_id}"
-        self.client.set(key, json.dumps(saga.dict()), ex=ttl)
+        with self.batch() as batch:
+            batch.save_order_saga(saga, ttl)
 
-    def save_order_id_with_saga(self, order_id: str, transaction_id: str):
+    def save_order_id_with_saga(self, order_id: str, transaction_id: str,
+                                ttl: int = config.ORDER_ID_MAPPING_TTL):
         key = f"order_id:{order_id}"
-        self.client.set(key, transaction_id)
+        self.client.set(key, transaction_id, ex=ttl)
 
     def get_order_id_with_saga(self, order_id: str) -> str | None:
         key = f"order_id:{order_id}"
@@ -21,58 +366,149 @@ class RedisSagaStore:
         if not transaction_id:
             return None
         return transaction_id
-    
-    def get_order_saga(self, transaction_id: str) -> OrderSagaState | None:
-        raw = self.client.get(f"order_saga:{transaction_id}")
-        if not raw:
-            return None
 
-        payload = json.loads(raw)
-        items_data = payload.pop("items", [])
-        items = [OrderItemCreate(**it) for it in items_data]
-
-        return OrderSagaState(
-            transaction_id   = payload["transaction_id"],
-            description      = payload["description"],
-            user_email       = payload["user_email"],
-            vendor_email     = payload["vendor_email"],
-            delivery_address = payload["delivery_address"],
-            payment_method   = payload["payment_method"],
-            status           = payload.get("status", "Pending"),
-            items            = items,
-            payment_id       = payload.get("payment_id"),
-        )
+    def get_order_saga(self, transaction_id: str) -> OrderSagaState | None:
+        return _order_saga_from_fields(self.get_saga_fields(transaction_id, *ORDER_SAGA_FIELDS))
 
     def delete_order_saga(self, transaction_id: str):
-        key = f"order_saga:{transaction_id}"
-        self.client.delete(key)
+        SagaWriteBatch(self.client).delete_order_saga(transaction_id)
 
     def save_product_saga(self, saga: ProductSagaState, ttl: int = 600):
-        key = f"product_saga:{saga.transaction_id}"
-        self.client.set(key, json.dumps(saga.dict()), ex=ttl)
+        with self.batch() as batch:
+            batch.save_product_saga(saga, ttl)
 
     def get_product_saga(self, transaction_id: str) -> ProductSagaState | None:
-        key = f"product_saga:{transaction_id}"
-        data = self.client.get(key)
-        return ProductSagaState(**json.loads(data)) if data else None
+        return _product_saga_from_fields(self.get_saga_fields(transaction_id, *PRODUCT_SAGA_FIELDS))
 
     def delete_product_saga(self, transaction_id: str):
-        key = f"product_saga:{transaction_id}"
-        self.client.delete(key)
-    
+        SagaWriteBatch(self.client).delete_product_saga(transaction_id)
+
     def save_payment_saga(self, saga: PaymentSagaState, ttl: int = 600):
-        key = f"payment_saga:{saga.transaction_id}"
-        self.client.set(key, json.dumps(saga.dict()), ex=ttl)
-    
+        with self.batch() as batch:
+            batch.save_payment_saga(saga, ttl)
+
     def get_payment_saga(self, transaction_id: str) -> PaymentSagaState | None:
-        key = f"payment_saga:{transaction_id}"
-        data = self.client.get(key)
-        return PaymentSagaState(**json.loads(data)) if data else None
+        return _payment_saga_from_fields(self.get_saga_fields(transaction_id, *PAYMENT_SAGA_FIELDS))
+
     def delete_payment_saga(self, transaction_id: str):
-        key = f"payment_saga:{transaction_id}"
-        self.client.delete(key)
-    
-    
+        SagaWriteBatch(self.client).delete_payment_saga(transaction_id)
+
+
+class AsyncRedisSagaStore:
+    """
+    asyncio variant of RedisSagaStore, backed by redis.asyncio so saga reads and
+    writes never block the event loop. Keys and fields are identical to the
+    synchronous store, so both can operate on the same sagas.
+    """
+    _transition_script = None
+
+    def __init__(self, host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB):
+        self.client = aioredis.Redis(
+            connection_pool=aioredis.BlockingConnectionPool(
+                host=host, port=port, db=db,
+                decode_responses=True,
+                max_connections=config.REDIS_MAX_CONNECTIONS
+            )
+        )
+
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Collect several saga writes and send them in a single round trip:
+
+            async with store.batch() as batch:
+                batch.save_order_saga(order_saga_state)
+                batch.save_payment_saga(payment_saga_state)
+        """
+        pipe = self.client.pipeline(transaction=True)
+        try:
+            yield SagaWriteBatch(pipe)
+            await pipe.execute()
+        finally:
+            await pipe.reset()
+
+    async def get_saga_fields(self, transaction_id: str, *fields: str) -> dict | None:
+        """HMGET the given fields of a saga; None when none of them is set."""
+        values = await self.client.hmget(saga_key(transaction_id), fields)
+        return _decode_fields(fields, values)
+
+    async def update_saga_fields(self, transaction_id: str, fields: dict, ttl: int = 600):
+        async with self.batch() as batch:
+            batch.update_saga_fields(transaction_id, fields, ttl)
+
+    async def transition(self, transaction_id: str, from_steps, to_step: str, fields: dict | None = None,
+                         expected_version: int | None = None, deadline: float | None = None,
+                         ttl: int = 600) -> SagaTransition:
+        """See RedisSagaStore.transition."""
+        if self._transition_script is None:
+            self._transition_script = self.client.register_script(TRANSITION_SCRIPT)
+        reply = await self._transition_script(
+            keys=[saga_key(transaction_id), SAGA_DEADLINES_KEY],
+            args=_transition_args(transaction_id, from_steps, to_step, fields, expected_version, deadline, ttl)
+        )
+        return _transition_result(reply)
+
+    async def mark_cancelled(self, transaction_id: str, ttl: int = config.ORDER_ID_MAPPING_TTL) -> bool:
+        """Record a cancellation; False when the transaction was already cancelled."""
+        return bool(await self.client.set(f"saga_cancelled:{transaction_id}", 1, nx=True, ex=ttl))
+
+    async def save_order_saga(self, saga: OrderSagaState, ttl: int = 600):
+        async with self.batch() as batch:
+            batch.save_order_saga(saga, ttl)
+
+    async def save_order_id_with_saga(self, order_id: str, transaction_id: str,
+                                      ttl: int = config.ORDER_ID_MAPPING_TTL):
+        key = f"order_id:{order_id}"
+        await self.client.set(key, transaction_id, ex=ttl)
+
+    async def get_order_id_with_saga(self, order_id: str) -> str | None:
+        key = f"order_id:{order_id}"
+        transaction_id = await self.client.get(key)
+        if not transaction_id:
+            return None
+        return transaction_id
+
+    async def get_order_saga(self, transaction_id: str) -> OrderSagaState | None:
+        return _order_saga_from_fields(await self.get_saga_fields(transaction_id, *ORDER_SAGA_FIELDS))
+
+    async def delete_order_saga(self, transaction_id: str):
+        await self.client.hdel(saga_key(transaction_id), *_ORDER_ONLY_FIELDS)
+
+    async def save_product_saga(self, saga: ProductSagaState, ttl: int = 600):
+        async with self.batch() as batch:
+            batch.save_product_saga(saga, ttl)
+
+    async def get_product_saga(self, transaction_id: str) -> ProductSagaState | None:
+        return _product_saga_from_fields(await self.get_saga_fields(transaction_id, *PRODUCT_SAGA_FIELDS))
+
+    async def delete_product_saga(self, transaction_id: str):
+        await self.client.hdel(saga_key(transaction_id), *_PRODUCT_ONLY_FIELDS)
+
+    async def save_payment_saga(self, saga: PaymentSagaState, ttl: int = 600):
+        async with self.batch() as batch:
+            batch.save_payment_saga(saga, ttl)
+
+    async def get_payment_saga(self, transaction_id: str) -> PaymentSagaState | None:
+        return _payment_saga_from_fields(await self.get_saga_fields(transaction_id, *PAYMENT_SAGA_FIELDS))
+
+    async def delete_payment_saga(self, transaction_id: str):
+        await self.client.hdel(saga_key(transaction_id), *_PAYMENT_ONLY_FIELDS)
+
+    async def close(self):
+        await self.client.aclose()
+        await self.client.connection_pool.disconnect()
+
+
 def get_redis_saga_store() -> RedisSagaStore:
     return RedisSagaStore(
-    )
\ No newline at end of file
+    )
+
+# The asyncio client owns its own connection pool, so one instance is shared
+# by every request and by the asyncio consumer.
+_async_saga_store: AsyncRedisSagaStore | None = None
+
+def get_async_redis_saga_store() -> AsyncRedisSagaStore:
+    global _async_saga_store
+    if _async_saga_store is None:
+        _async_saga_store = AsyncRedisSagaStore()
+    return _async_saga_store
@@ -0,0 +1,122 @@
+"""
+Saga deadline sweeper.
+
+Every in-flight saga has an entry in the ``saga_deadlines`` sorted set, scored
+by the time its current step times out. The sweeper claims expired entries in
+batches (a range query on the sorted set, never a scan of the keyspace), moves
+those sagas to the timed_out step and publishes the rollback commands their
+last step needs.
+"""
+import threading
+import time
+from models.saga_state import SagaStep
+from services.message_publisher import get_publisher_service, RabbitMQPublisher
+from services.redis_saga_store import get_redis_saga_store, RedisSagaStore
+import config
+from logger import logger, log_context
+
+# steps a saga can time out in
+PENDING_STEPS = (SagaStep.STOCK_PENDING, SagaStep.PAYMENT_PENDING, SagaStep.ORDER_PENDING)
+
+
+class SagaDeadlineSweeper:
+    def __init__(self, saga_store: RedisSagaStore, publisher: RabbitMQPublisher,
+                 batch_size: int = config.SAGA_SWEEP_BATCH_SIZE,
+                 interval: float = config.SAGA_SWEEP_INTERVAL,
+                 lease: float = config.SAGA_SWEEP_LEASE):
+        self.saga_store = saga_store
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sweep_once(self, now: float | None = None) -> int:
+        """Time out one batch of expired sagas; returns how many were claimed."""
+        now = time.time() if now is None else now
+        expired = self.saga_store.claim_expired_sagas(now, self.batch_size, self.lease)
+        if not expired:
+            return 0
+
+        states = self.saga_store.get_many_saga_fields(
+            expired, "step", "version", "products", "reserved_products", "payment_id"
+        )
+        timeouts = []
+        for transaction_id, state in zip(expired, states):
+            if not state or state["step"] not in PENDING_STEPS:
+                # saga hash expired, or it finished without clearing its deadline
+                self.saga_store.clear_deadline(transaction_id)
+                continue
+            timeouts.append((transaction_id, state))
+
+        results = self.saga_store.transition_many([
+            {
+                "transaction_id": transaction_id,
+                "from_steps": state["step"],
+                "to_step": SagaStep.TIMED_OUT,
+                "expected_version": state["version"],
+            }
+            for transaction_id, state in timeouts
+        ])
+        compensated = 0
+        for (transaction_id, state), transition in zip(timeouts, results):
+            # a reply that raced the sweep has moved the saga on; leave it be
+            if transition.applied:
+                with log_context(transaction_id=transaction_id, payment_id=state.get("payment_id")):
+                    self.compensate(transaction_id, state)
+                compensated += 1
+
+        logger.log(f"Saga sweeper claimed {len(expired)} expired sagas, rolled back {compensated}", "INFO")
+        return len(expired)
+
+    def compensate(self, transaction_id: str, state: dict):
+        """Publish the rollbacks for everything done before the step that timed out."""
+        step = state["step"]
+        if step == SagaStep.STOCK_PENDING:
+            # the inventory service may have reduced part of the cart
+            self.publisher.publish_rollback_stock_command(
+                transaction_id=transaction_id, products=state["products"]
+            )
+            return
+        self.publisher.publish_rollback_stock_command(
+            transaction_id=transaction_id, products=state["reserved_products"]
+        )
+        # the payment service may still take the payment; the rollback finds it by
+        # transaction ID, so it works before the saga has a payment_id
+        self.publisher.publish_rollback_payment_command(
+            transaction_id=transaction_id, payment_id=state["payment_id"]
+        )
+        if step == SagaStep.ORDER_PENDING:
+            self.publisher.publish_rollback_order_command(transaction_id=transaction_id)
+
+    def run(self):
+        """Sweep until stopped; a full batch is followed immediately by the next one."""
+        logger.log("Saga deadline sweeper started", "INFO")
+        while not self._stop.is_set():
+            try:
+                claimed = self.sweep_once()
+            except Exception as e:
+                logger.log(f"Saga deadline sweep failed: {str(e)}", "ERROR")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._stop.wait(self.interval)
+        logger.log("Saga deadline sweeper stopped", "INFO")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="saga-deadline-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+def get_saga_deadline_sweeper() -> SagaDeadlineSweeper:
+    return SagaDeadlineSweeper(
+        saga_store=get_redis_saga_store(),
+        publisher=get_publisher_service()
+    )
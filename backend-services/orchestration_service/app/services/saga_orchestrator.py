@@ -5,29 +5,97 @@ Handles the orchestration of the Saga pattern.
 
 """
 """
+import time
 import uuid
+from typing import Callable, Generator, NamedTuple
 from fastapi import Depends
 from services.auth_http_client import get_auth_service
-from services.message_publisher import get_publisher_service
-from models.saga_state import OrderSagaState, ProductSagaState, PaymentSagaState
-from models.order import OrderCreateRequest
-from services.redis_saga_store import get_redis_saga_store, RedisSagaStore
-from logger import logger
+from services.message_publisher import get_publisher_service, get_async_publisher_service
+from services.order_http_client import get_order_service_client
+from models.saga_state import OrderSagaState, ProductSagaState, PaymentSagaState, SagaStep
+from models.order import OrderCreateRequest, OrderItemCreate
+from services.redis_saga_store import (
+    get_redis_saga_store, RedisSagaStore,
+    get_async_redis_saga_store, AsyncRedisSagaStore
+)
+import config
+from logger import logger, bind_log_context
 
-class SagaOrchestrator:
-    def __init__(self, saga_store: RedisSagaStore):
+
+def step_deadline() -> float:
+    """Time by which the reply to a step that starts now must have arrived."""
+    return time.time() + config.SAGA_STEP_TIMEOUT
+
+
+def archived_order_ledger(order_id: str, order: dict | None) -> ProductSagaState | None:
+    """
+    Stock ledger of an order fetched from the order service, or None when the
+    order cannot (or no longer needs to) be cancelled.
+    """
+    if not order or not order.get("transaction_id"):
+        logger.log(f"Order ID {order_id} not found in saga store or order service.", "ERROR")
+        return None
+    if order.get("status") == "Canceled":
+        logger.log(f"Order {order_id} is already cancelled", "WARNING")
+        return None
+    return ProductSagaState.from_order_items(
+        transaction_id=order["transaction_id"],
+        items=[OrderItemCreate(**item) for item in order.get("items", [])]
+    )
+
+class SagaCall(NamedTuple):
+    """
+    One call a saga step needs made: method of the orchestrator's saga_store,
+    publisher or order_client, or, with target "batch", a function filling a
+    saga store write batch.
+    """
+    target: str
+    method: str
+    args: tuple = ()
+    kwargs: dict | None = None
+
+
+def _store(method: str, *args, **kwargs) -> SagaCall:
+    return SagaCall("saga_store", method, args, kwargs)
+
+
+def _publish(method: str, **kwargs) -> SagaCall:
+    return SagaCall("publisher", method, (), kwargs)
+
+
+def _batch(fill: Callable) -> SagaCall:
+    return SagaCall("batch", "", (fill,))
+
+
+# a saga step: yields the calls it needs made and is sent their results
+SagaSteps = Generator[SagaCall, object, object]
+
+
+class BaseSagaOrchestrator:
+    """
+    The saga's steps and decisions, shared by SagaOrchestrator and
+    AsyncSagaOrchestrator. Each step is a generator that yields the SagaCalls
+    it needs made and is sent back their results; the subclasses only make the
+    calls, blocking or awaited, in _run().
+    """
+    # method of the order client that fetches an order
+    ORDER_LOOKUP = "get_order"
+
+    def __init__(self, saga_store, publisher):
         self.auth_client = get_auth_service()  # Synchronous calls
-        self.publisher = get_publisher_service()  # Publishes to RabbitMQ
-        self.saga_store = saga_store  
-        logger.log("SagaOrchestrator initialized", "INFO")
+        self.publisher = publisher  # Publishes to RabbitMQ
+        self.saga_store = saga_store
+        self.order_client = get_order_service_client()  # Fallback for cancelling archived orders
+        logger.log(f"{type(self).__name__} initialized", "INFO")
 
-    def start_order_saga(self, order_data: OrderCreateRequest, token: str):
+    def _start_order_saga(self, order_data: OrderCreateRequest, token: str) -> SagaSteps:
         logger.log(f"Starting order saga for user: {order_data.user_email}", "INFO")
         # verified = self.auth_client.authenticate_customer(jwt_token=token)
         # if not verified:
         #    raise Exception("Authentication failed")
-        
+
         transaction_id = str(uuid.uuid4())
+        bind_log_context(transaction_id=transaction_id)
         logger.log(f"Generated transaction ID: {transaction_id}", "INFO")
         # If verified, store saga state
         order_saga_state = OrderSagaState(
@@ -40,158 +108,327 @@ class SagaOrchestrator:
             items=order_data.items,
             payment_method=order_data.payment_method
         )
-        prouct_saga_state = ProductSagaState(
+        product_saga_state = ProductSagaState.from_order_items(
             transaction_id=transaction_id,
-            product_id=order_data.items[0].product_id,
-            quantity=order_data.items[0].quantity
+            items=order_data.items
         )
 
-        self.saga_store.save_product_saga(prouct_saga_state)
-        self.saga_store.save_order_saga(order_saga_state)
+        def save(batch):
+            batch.save_product_saga(product_saga_state)
+            batch.save_order_saga(order_saga_state)
+            batch.update_saga_fields(transaction_id, {"step": SagaStep.STOCK_PENDING, "version": 1})
+            batch.schedule_deadline(transaction_id, step_deadline())
+        yield _batch(save)
         logger.log(f"Saved initial saga states for transaction: {transaction_id}", "INFO")
 
-        self.publisher.publish_reduce_stock_command(
-            transaction_id=transaction_id, 
+        yield _publish(
+            "publish_reduce_stock_command",
+            transaction_id=transaction_id,
             products=order_data.items
         )
         logger.log(f"Published reduce stock command for transaction: {transaction_id}", "INFO")
         return True
 
-    def cancel_order_saga(self, order_id: str, token: str):
+    def _cancel_order_saga(self, order_id: str, token: str) -> SagaSteps:
         logger.log(f"Starting order cancellation for order: {order_id}", "INFO")
         # verified = self.auth_client.authenticate_customer(jwt_token=token)
         # if not verified:
         #    raise Exception("Authentication failed")
-        
-        transaction_id = self.saga_store.get_order_id_with_saga(order_id)
-        order_saga_state = self.saga_store.get_order_saga(transaction_id)
-        if not order_saga_state:
-            logger.log(f"Order ID {order_id} not found in saga store.", "ERROR")
+
+        transaction_id = yield _store("get_order_id_with_saga", order_id)
+        bind_log_context(transaction_id=transaction_id, order_id=order_id)
+        saga = yield _store("get_saga_fields", transaction_id, "vendor_email", "payment_id", "reserved_products")
+        if not saga or saga["vendor_email"] is None:
+            # the mapping or the saga has left Redis; the order service still has the order
+            return (yield from self._cancel_archived_order(order_id, token))
+        transition = yield _store(
+            "transition", transaction_id, from_steps=SagaStep.COMPLETED, to_step=SagaStep.CANCELLED
+        )
+        if not transition.applied:
+            logger.log(f"Order {order_id} cannot be cancelled at saga step {transition.step}", "WARNING")
             return
-        transaction_id = order_saga_state.transaction_id
         logger.log(f"Starting rollback for transaction: {transaction_id}", "INFO")
+        yield from self._rollback_all(transaction_id, saga["reserved_products"], saga["payment_id"])
+        return True
+
+    def _cancel_archived_order(self, order_id: str, token: str) -> SagaSteps:
+        order = yield SagaCall("order_client", self.ORDER_LOOKUP, (order_id,), {"jwt_token": token})
+        ledger = archived_order_ledger(order_id, order)
+        if not ledger:
+            return
+        transaction_id = ledger.transaction_id
+        if not (yield _store("mark_cancelled", transaction_id)):
+            logger.log(f"Order {order_id} is already being cancelled", "WARNING")
+            return
+        logger.log(f"Starting rollback for archived transaction: {transaction_id}", "INFO")
+        yield from self._rollback_all(transaction_id, ledger.products, order.get("payment_id"))
+        return True
+
+    def _rollback_all(self, transaction_id: str, products: dict | None, payment_id: str | None) -> SagaSteps:
+        """Release the stock, refund the payment and cancel the order of a completed saga."""
         # Trigger rollback stock if needed
-        self.publisher.publish_rollback_stock_command(
-            transaction_id=transaction_id
-        )
-        self.publisher.publish_rollback_payment_command(
-            transaction_id=transaction_id,
-            payment_id=order_saga_state.payment_id
-        )
-        self.publisher.publish_rollback_order_command(
-            transaction_id=transaction_id
-        )
+        yield _publish("publish_rollback_stock_command", transaction_id=transaction_id, products=products)
+        yield _publish("publish_rollback_payment_command", transaction_id=transaction_id, payment_id=payment_id)
+        yield _publish("publish_rollback_order_command", transaction_id=transaction_id)
         logger.log(f"Published all rollback commands for transaction: {transaction_id}", "INFO")
-        return True
 
-    def handle_stock_reduced_event(self, message: dict):
+    def _handle_stock_reduced_event(self, message: dict) -> SagaSteps:
         transaction_id : str = message["transaction_id"]
-        data : dict = message["data"]
         status : str = message["status"]
         logger.log(f"Handling stock reduced event for transaction: {transaction_id}", "INFO")
-        
-        saga_state = self.saga_store.get_product_saga(transaction_id)
-        order_saga_state = self.saga_store.get_order_saga(transaction_id)
-        if not saga_state:
+
+        saga = yield _store(
+            "get_saga_fields", transaction_id, "products", "user_email", "payment_method", "items", "version"
+        )
+        if not saga or saga["products"] is None:
             logger.log(f"Transaction ID {transaction_id} not found in saga store.", "ERROR")
             return
-        
+
         if "error" in status:
             logger.log(f"Error reducing stock: {status}", "ERROR")
+            transition = yield _store(
+                "transition", transaction_id, from_steps=SagaStep.STOCK_PENDING, to_step=SagaStep.FAILED
+            )
+            if transition.applied:
+                # lines before the failing one may already be reserved
+                yield _publish(
+                    "publish_rollback_stock_command",
+                    transaction_id=transaction_id,
+                    products=saga["products"]
+                )
             return
-        
+
         payment_saga_state = PaymentSagaState(
             transaction_id=transaction_id,
-            user_email=order_saga_state.user_email,
-            amount=order_saga_state.total_price(),
-            payment_method=order_saga_state.payment_method,
+            user_email=saga["user_email"],
+            amount=sum(item.quantity * item.unit_price for item in saga["items"] or []),
+            payment_method=saga["payment_method"],
             payment_status="Pending"
         )
-        self.saga_store.save_payment_saga(payment_saga_state)
+        # the inventory service reduced the whole cart
+        ledger = ProductSagaState(transaction_id=transaction_id, products=saga["products"])
+        ledger.reserve()
+        # user_email and payment_method are already on the saga hash
+        transition = yield _store(
+            "transition",
+            transaction_id,
+            from_steps=SagaStep.STOCK_PENDING,
+            to_step=SagaStep.PAYMENT_PENDING,
+            deadline=step_deadline(),
+            fields={
+                "amount": payment_saga_state.amount,
+                "payment_status": payment_saga_state.payment_status,
+                "reserved_products": ledger.reserved_products,
+            },
+            expected_version=saga["version"]
+        )
+        if not transition.applied:
+            logger.log(f"Skipping stock reduced event for transaction {transaction_id}: saga is at step {transition.step}", "WARNING")
+            return
         logger.log(f"Saved payment saga state for transaction: {transaction_id}", "INFO")
-        self.publisher.publish_take_payment_command(payment_data=payment_saga_state)
+        yield _publish("publish_take_payment_command", payment_data=payment_saga_state)
         logger.log(f"Published take payment command for transaction: {transaction_id}", "INFO")
 
-    def hande_take_payment_event(self, message: dict):
+    def _handle_take_payment_event(self, message: dict) -> SagaSteps:
         transaction_id : str = message["transaction_id"]
         data : dict = message["data"]
         payment_id : str = data["payment_id"]
         status : str = message["status"]
         logger.log(f"Handling take payment event for transaction: {transaction_id}", "INFO")
-        
-        payment_saga_state = self.saga_store.get_payment_saga(transaction_id)
-        order_saga_state = self.saga_store.get_order_saga(transaction_id)
-        
-        if not payment_saga_state or not order_saga_state:
+
+        order_saga_state = yield _store("get_order_saga", transaction_id)
+
+        if not order_saga_state:
             logger.log(f"Transaction ID {transaction_id} not found in saga store.", "ERROR")
         if "error" in status:
             logger.log(f"Error taking payment: {status}", "ERROR")
+            transition = yield _store(
+                "transition", transaction_id, from_steps=SagaStep.PAYMENT_PENDING, to_step=SagaStep.FAILED
+            )
+            if not transition.applied:
+                logger.log(f"Skipping take payment event for transaction {transaction_id}: saga is at step {transition.step}", "WARNING")
+                return
+            ledger = yield _store("get_saga_fields", transaction_id, "reserved_products")
             # Trigger rollback stock if needed
-            self.publisher.publish_rollback_stock_command(
-                transaction_id=transaction_id
+            yield _publish(
+                "publish_rollback_stock_command",
+                transaction_id=transaction_id,
+                products=ledger["reserved_products"] if ledger else None
             )
             return
-        
+
         # Update saga state
-        payment_saga_state.payment_status = status
-        self.saga_store.save_payment_saga(payment_saga_state)
+        transition = yield _store(
+            "transition",
+            transaction_id,
+            from_steps=SagaStep.PAYMENT_PENDING,
+            to_step=SagaStep.ORDER_PENDING,
+            deadline=step_deadline(),
+            fields={"payment_status": status, "payment_id": payment_id}
+        )
+        if not transition.applied:
+            logger.log(f"Skipping take payment event for transaction {transaction_id}: saga is at step {transition.step}", "WARNING")
+            if transition.step == SagaStep.TIMED_OUT:
+                # taken after the deadline; the sweeper's rollback may have reached the payment service first
+                yield _publish("publish_rollback_payment_command", transaction_id=transaction_id, payment_id=payment_id)
+            return
         order_saga_state.payment_id = payment_id
-        self.saga_store.save_order_saga(order_saga_state)
         logger.log(f"Updated payment and order saga states for transaction: {transaction_id}", "INFO")
-        
-        order_saga_state = self.saga_store.get_order_saga(transaction_id)
-        if not order_saga_state:
-            logger.log(f"Transaction ID {transaction_id} not found in saga store.", "ERROR")
-        
+
         # next step: publih create order command
-        self.publisher.publish_create_order_command(
+        yield _publish(
+            "publish_create_order_command",
             order_data=order_saga_state,
             transaction_id=transaction_id
         )
         logger.log(f"Published create order command for transaction: {transaction_id}", "INFO")
-        return
-    
-    def handle_create_order_event(self, message: dict):
+
+    def _handle_create_order_event(self, message: dict) -> SagaSteps:
         transaction_id : str = message["transaction_id"]
         data : dict = message["data"]
         order_id : str = data["order_id"]
         status : str = message["status"]
         logger.log(f"Handling create order event for transaction: {transaction_id}", "INFO")
-        
-        self.saga_store.save_order_id_with_saga(
-            order_id=order_id, 
-            transaction_id=transaction_id)
-        order_saga_state = self.saga_store.get_order_saga(transaction_id)
-        payment_saga_state = self.saga_store.get_payment_saga(transaction_id)
-        if not order_saga_state or not payment_saga_state:
+
+        saga = yield _store(
+            "get_saga_fields", transaction_id, "vendor_email", "amount", "payment_id", "reserved_products"
+        )
+        if not saga or saga["vendor_email"] is None or saga["amount"] is None:
             logger.log(f"Transaction ID {transaction_id} not found in saga store.", "ERROR")
-        
+        payment_id = saga["payment_id"] if saga else None
+
         if "error" in status:
             logger.log(f"Error creating order: {status}", "ERROR")
+            transition = yield _store(
+                "transition", transaction_id, from_steps=SagaStep.ORDER_PENDING, to_step=SagaStep.FAILED
+            )
+            if not transition.applied:
+                logger.log(f"Skipping create order event for transaction {transaction_id}: saga is at step {transition.step}", "WARNING")
+                return
+            yield _store("save_order_id_with_saga", order_id=order_id, transaction_id=transaction_id)
             # Trigger rollback stock if needed
-            self.publisher.publish_rollback_stock_command(
-                transaction_id=transaction_id
+            yield _publish(
+                "publish_rollback_stock_command",
+                transaction_id=transaction_id,
+                products=saga["reserved_products"] if saga else None
             )
-            self.publisher.publish_rollback_payment_command(
+            yield _publish(
+                "publish_rollback_payment_command",
                 transaction_id=transaction_id,
-                payment_id=order_saga_state.payment_id
+                payment_id=payment_id
             )
             return
-        
+
         # Update saga state
-        order_saga_state.status = status
-        self.saga_store.save_order_saga(order_saga_state)
-        payment_saga_state.order_id = order_id
-        self.saga_store.save_payment_saga(payment_saga_state)
+        transition = yield _store(
+            "transition",
+            transaction_id,
+            from_steps=SagaStep.ORDER_PENDING,
+            to_step=SagaStep.COMPLETED,
+            fields={"status": status, "order_id": order_id}
+        )
+        if not transition.applied:
+            logger.log(f"Skipping create order event for transaction {transaction_id}: saga is at step {transition.step}", "WARNING")
+            return
+        yield _store("save_order_id_with_saga", order_id=order_id, transaction_id=transaction_id)
         logger.log(f"Updated order and payment saga states for transaction: {transaction_id}", "INFO")
-        
-        self.publisher.publish_update_order_payment_id(order_id=order_id, payment_id=order_saga_state.payment_id)
-        self.publisher.publish_update_payment_order_id(
+
+        yield _publish("publish_update_order_payment_id", order_id=order_id, payment_id=payment_id)
+        yield _publish(
+            "publish_update_payment_order_id",
             order_id=order_id,
-            payment_id=order_saga_state.payment_id
+            payment_id=payment_id
         )
         logger.log(f"Published payment and order ID updates for transaction: {transaction_id}", "INFO")
 
+
+class SagaOrchestrator(BaseSagaOrchestrator):
+    """Runs the saga steps with blocking Redis, RabbitMQ and HTTP calls."""
+    ORDER_LOOKUP = "get_order_blocking"
+
+    def __init__(self, saga_store: RedisSagaStore):
+        super().__init__(saga_store, get_publisher_service())
+
+    def _call(self, call: SagaCall):
+        if call.target == "batch":
+            with self.saga_store.batch() as batch:
+                return call.args[0](batch)
+        return getattr(getattr(self, call.target), call.method)(*call.args, **(call.kwargs or {}))
+
+    def _run(self, steps: SagaSteps):
+        result = None
+        while True:
+            try:
+                call = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            result = self._call(call)
+
+    def start_order_saga(self, order_data: OrderCreateRequest, token: str):
+        return self._run(self._start_order_saga(order_data, token))
+
+    def cancel_order_saga(self, order_id: str, token: str):
+        return self._run(self._cancel_order_saga(order_id, token))
+
+    def cancel_archived_order(self, order_id: str, token: str):
+        return self._run(self._cancel_archived_order(order_id, token))
+
+    def handle_stock_reduced_event(self, message: dict):
+        return self._run(self._handle_stock_reduced_event(message))
+
+    def hande_take_payment_event(self, message: dict):
+        return self._run(self._handle_take_payment_event(message))
+
+    def handle_create_order_event(self, message: dict):
+        return self._run(self._handle_create_order_event(message))
+
+
+class AsyncSagaOrchestrator(BaseSagaOrchestrator):
+    """
+    Runs the saga steps on the event loop: saga state goes through
+    AsyncRedisSagaStore and commands through the shared AsyncRabbitMQPublisher,
+    so starting, cancelling and advancing a saga never blocks it.
+    """
+    def __init__(self, saga_store: AsyncRedisSagaStore):
+        super().__init__(saga_store, get_async_publisher_service())
+
+    async def _call(self, call: SagaCall):
+        if call.target == "batch":
+            async with self.saga_store.batch() as batch:
+                return call.args[0](batch)
+        return await getattr(getattr(self, call.target), call.method)(*call.args, **(call.kwargs or {}))
+
+    async def _run(self, steps: SagaSteps):
+        result = None
+        while True:
+            try:
+                call = steps.send(result)
+            except StopIteration as done:
+                return done.value
+            result = await self._call(call)
+
+    async def start_order_saga(self, order_data: OrderCreateRequest, token: str):
+        return await self._run(self._start_order_saga(order_data, token))
+
+    async def cancel_order_saga(self, order_id: str, token: str):
+        return await self._run(self._cancel_order_saga(order_id, token))
+
+    async def cancel_archived_order(self, order_id: str, token: str):
+        return await self._run(self._cancel_archived_order(order_id, token))
+
+    async def handle_stock_reduced_event(self, message: dict):
+        return await self._run(self._handle_stock_reduced_event(message))
+
+    async def hande_take_payment_event(self, message: dict):
+        return await self._run(self._handle_take_payment_event(message))
+
+    async def handle_create_order_event(self, message: dict):
+        return await self._run(self._handle_create_order_event(message))
+
 def get_saga_orchestrator() -> SagaOrchestrator:
     store = get_redis_saga_store()
-    return SagaOrchestrator(saga_store=store)
\ No newline at end of file
+    return SagaOrchestrator(saga_store=store)
+
+def get_async_saga_orchestrator() -> AsyncSagaOrchestrator:
+    store = get_async_redis_saga_store()
+    return AsyncSagaOrchestrator(saga_store=store)
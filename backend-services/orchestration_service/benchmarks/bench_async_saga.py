@@ -0,0 +1,239 @@
+"""
+Benchmark: /orders/create_order throughput with the blocking vs. the asyncio saga path.
+
+Redis and RabbitMQ are replaced by stand-ins that add a fixed round-trip latency,
+so the numbers isolate what happens to the event loop while I/O is in flight.
+The blocking path is the previous behaviour: an ``async def`` route calling the
+synchronous SagaOrchestrator directly on the loop.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_async_saga.py --requests 500 --concurrency 50 --latency-ms 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py writes its daily log partitions under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_saga_"))
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from routers.auth_dependencies import authenticate_user  # noqa: E402
+from services.saga_orchestrator import (  # noqa: E402
+    SagaOrchestrator, AsyncSagaOrchestrator, get_async_saga_orchestrator
+)
+from services.redis_saga_store import RedisSagaStore, AsyncRedisSagaStore  # noqa: E402
+from services.message_publisher import RabbitMQPublisher, AsyncRabbitMQPublisher  # noqa: E402
+
+
+class HashData(dict):
+    """Key -> value / field dict, applying the saga store's commands in memory."""
+    def apply(self, command, key, *args):
+        if command == "set":
+            self[key] = args[0]
+        elif command in ("hset", "zadd"):
+            self.setdefault(key, {}).update(args[0])
+        elif command == "hdel":
+            for field in args:
+                self.get(key, {}).pop(field, None)
+        elif command == "delete":
+            self.pop(key, None)
+
+    def hmget(self, key, fields):
+        fields_map = self.get(key) or {}
+        return [fields_map.get(field) for field in fields]
+
+
+class PipelineStandIn:
+    """Queues writes and applies them in one simulated round trip."""
+    def __init__(self, owner):
+        self.owner = owner
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append(("set", key, value))
+        return self
+
+    def hset(self, key, mapping):
+        self.commands.append(("hset", key, mapping))
+        return self
+
+    def hdel(self, key, *fields):
+        self.commands.append(("hdel", key, *fields))
+        return self
+
+    def zadd(self, key, mapping):
+        self.commands.append(("zadd", key, mapping))
+        return self
+
+    def expire(self, key, ttl):
+        return self
+
+    def delete(self, key):
+        self.commands.append(("delete", key))
+        return self
+
+    def _apply(self):
+        for command in self.commands:
+            self.owner.data.apply(*command)
+        self.commands = []
+
+    def execute(self):
+        time.sleep(self.owner.latency)
+        self._apply()
+
+    def reset(self):
+        self.commands = []
+
+
+class AsyncPipelineStandIn(PipelineStandIn):
+    async def execute(self):
+        await asyncio.sleep(self.owner.latency)
+        self._apply()
+
+    async def reset(self):
+        self.commands = []
+
+
+class BlockingRedisStandIn:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.data = HashData()
+
+    def pipeline(self, transaction=True):
+        return PipelineStandIn(self)
+
+    def set(self, key, value, ex=None):
+        time.sleep(self.latency)
+        self.data.apply("set", key, value)
+
+    def get(self, key):
+        time.sleep(self.latency)
+        return self.data.get(key)
+
+    def hmget(self, key, fields):
+        time.sleep(self.latency)
+        return self.data.hmget(key, fields)
+
+
+class AsyncRedisStandIn:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.data = HashData()
+
+    def pipeline(self, transaction=True):
+        return AsyncPipelineStandIn(self)
+
+    async def set(self, key, value, ex=None):
+        await asyncio.sleep(self.latency)
+        self.data.apply("set", key, value)
+
+    async def get(self, key):
+        await asyncio.sleep(self.latency)
+        return self.data.get(key)
+
+    async def hmget(self, key, fields):
+        await asyncio.sleep(self.latency)
+        return self.data.hmget(key, fields)
+
+
+class BlockingPublisherStandIn(RabbitMQPublisher):
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    def publish_message(self, message: dict, queue: str):
+        time.sleep(self.latency)
+
+
+class AsyncPublisherStandIn(AsyncRabbitMQPublisher):
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    async def publish_message(self, message: dict, queue: str):
+        await asyncio.sleep(self.latency)
+
+
+class BlockingPathAdapter:
+    """Exposes the synchronous orchestrator through the awaitable interface the route uses."""
+    def __init__(self, orchestrator: SagaOrchestrator):
+        self.orchestrator = orchestrator
+
+    async def start_order_saga(self, order_data, token):
+        return self.orchestrator.start_order_saga(order_data, token=token)
+
+    async def cancel_order_saga(self, order_id, token):
+        return self.orchestrator.cancel_order_saga(order_id, token=token)
+
+
+def build_blocking(latency: float):
+    store = RedisSagaStore.__new__(RedisSagaStore)
+    store.client = BlockingRedisStandIn(latency)
+    orchestrator = SagaOrchestrator(saga_store=store)
+    orchestrator.publisher = BlockingPublisherStandIn(latency)
+    adapter = BlockingPathAdapter(orchestrator)
+    return lambda: adapter
+
+
+def build_async(latency: float):
+    store = AsyncRedisSagaStore.__new__(AsyncRedisSagaStore)
+    store.client = AsyncRedisStandIn(latency)
+    orchestrator = AsyncSagaOrchestrator(saga_store=store)
+    orchestrator.publisher = AsyncPublisherStandIn(latency)
+    return lambda: orchestrator
+
+
+ORDER = {
+    "user_email": "bench@example.com",
+    "vendor_email": "vendor@example.com",
+    "delivery_address": "1 Bench Street",
+    "description": "benchmark order",
+    "items": [{"product_id": "p-1", "quantity": 2, "unit_price": 9.5}],
+    "payment_method": "Credit Card",
+}
+
+
+async def run(dependency, total: int, concurrency: int) -> float:
+    app.dependency_overrides[authenticate_user] = lambda: "customer"
+    app.dependency_overrides[get_async_saga_orchestrator] = dependency
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.post(
+                    "/orders/create_order", json=ORDER, headers={"Authorization": "bench"}
+                )
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    app.dependency_overrides.clear()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated Redis/RabbitMQ round trip")
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    blocking = asyncio.run(run(build_blocking(latency), args.requests, args.concurrency))
+    non_blocking = asyncio.run(run(build_async(latency), args.requests, args.concurrency))
+
+    print(f"requests={args.requests} concurrency={args.concurrency} latency={args.latency_ms}ms")
+    print(f"blocking saga path : {blocking:8.1f} req/s")
+    print(f"asyncio saga path  : {non_blocking:8.1f} req/s  ({non_blocking / blocking:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: deep pages of GET /logs/ on a large log table.
+
+Compares the previous query (COUNT(*) plus ORDER BY timestamp LIMIT/OFFSET on
+the unindexed table) with the current endpoint: the (level, timestamp),
+(module, timestamp) and (timestamp) indexes, keyset pagination through
+the X-Next-Cursor header and the approximate count.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_log_pagination.py --rows 2000000 --page 500
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py and the log endpoints use the partitions in logs/ under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_logs_"))
+
+import config  # noqa: E402
+from logger import logger  # noqa: E402
+from service_logs.partitions import init_partition, partition_path  # noqa: E402
+from fastapi import Response  # noqa: E402
+from routers.logs import get_logs  # noqa: E402
+
+LEVELS = ["INFO"] * 8 + ["WARNING", "ERROR"]
+MODULES = ["services.saga_orchestrator", "services.event_consumer", "services.message_publisher", "main"]
+
+
+def populate(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            module TEXT NOT NULL,
+            funcName TEXT,
+            lineno INTEGER
+        )
+    ''')
+    started = datetime(2026, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append((
+            (started + timedelta(milliseconds=i * 10)).isoformat(),
+            random.choice(LEVELS), f"Processing event type: take_payment ({i})",
+            random.choice(MODULES), "handle", 42
+        ))
+        if len(batch) == 50000:
+            conn.executemany(
+                "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)",
+            batch
+        )
+    conn.commit()
+    conn.close()
+
+
+def previous_query(path: str, level, page: int, page_size: int):
+    """The former get_logs: exact count plus LIMIT/OFFSET, no indexes."""
+    conn = sqlite3.connect(path)
+    where, params = ("WHERE level = ?", [level]) if level else ("", [])
+    conn.execute(f"SELECT COUNT(*) FROM logs {where}", params).fetchone()
+    conn.execute(
+        f"SELECT id, timestamp, level, message, module, funcName, lineno FROM logs {where} "
+        "ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+        params + [page_size, (page - 1) * page_size]
+    ).fetchall()
+    conn.close()
+
+
+def current_endpoint(level, page: int, page_size: int, cursor=None, count="exact") -> Response:
+    # the endpoint body, called directly rather than on a log query thread
+    response = Response()
+    get_logs.__wrapped__(
+        response=response, level=level, start_date=None, end_date=None, module=None, search=None,
+        page=page, page_size=page_size, cursor=cursor, count=count
+    )
+    return response
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--page", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    logger.close()
+
+    # rows are 10 ms apart, so up to 8.6 million of them fall into one daily partition
+    populate("previous.db", args.rows)
+    os.makedirs(config.LOG_DIR, exist_ok=True)
+    # the same data as that day's partition, before the logger has created its indexes
+    with sqlite3.connect("previous.db") as source, sqlite3.connect(partition_path(config.LOG_DIR, "2026-01-01")) as target:
+        source.backup(target)
+
+    for level in (None, "ERROR"):
+        label = level or "all levels"
+        before = timed(lambda: previous_query("previous.db", level, args.page, args.page_size), repeat=3)
+        if level is None:
+            with sqlite3.connect(partition_path(config.LOG_DIR, "2026-01-01")) as conn:
+                init_partition(conn, "timestamp")  # creates the indexes
+        # the cursor a client holds after paging down to the requested page
+        cursor = current_endpoint(level, args.page - 1, args.page_size, count="none").headers["X-Next-Cursor"]
+        offset = timed(lambda: current_endpoint(level, args.page, args.page_size, count="exact"))
+        keyset = timed(lambda: current_endpoint(level, args.page, args.page_size, cursor=cursor, count="approximate"))
+        print(f"rows={args.rows} page={args.page} size={args.page_size} filter={label}")
+        print(f"  previous: COUNT(*) + OFFSET, no index   {before:9.1f} ms")
+        print(f"  indexed: exact count + OFFSET           {offset:9.1f} ms")
+        print(f"  indexed: cursor + approximate count     {keyset:9.1f} ms  ({before / keyset:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: latency of a plain endpoint while heavy log queries are running.
+
+Fills one daily log partition, then sends --heavy concurrent GET /logs/ searches
+that match most rows with an exact count, and times a trivial sync endpoint
+sent meanwhile. Before, the log handlers ran on the server's shared thread pool
+(here limited to --threads threads) and the trivial request queued behind
+them; now they run on the LOG_QUERY_THREADS log query threads. Also checks that
+a query exceeding LOG_QUERY_TIMEOUT is answered with 503.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_log_query_isolation.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py and the log endpoints use the partitions in logs/ under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_isolation_"))
+
+import anyio.to_thread  # noqa: E402
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+import config  # noqa: E402
+from logger import logger  # noqa: E402
+from service_logs import config as log_config  # noqa: E402
+from service_logs.partitions import open_partition  # noqa: E402
+from routers import logs  # noqa: E402
+from routers.auth_dependencies import authenticate_admin  # noqa: E402
+
+# all rows are loaded into this day's partition
+DAY = "2026-01-01"
+HEAVY = "/logs/?search=transaction*&count=exact"
+
+
+def populate(rows: int):
+    conn = open_partition(config.LOG_DIR, DAY, "timestamp")
+    started = datetime(2026, 1, 1)
+    for first in range(0, rows, 100000):
+        conn.executemany(
+            "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                ((started + timedelta(milliseconds=i)).isoformat(), "INFO",
+                 f"Processing event for transaction {i:032x}", "services.saga_orchestrator", "handle", 1)
+                for i in range(first, min(first + 100000, rows))
+            )
+        )
+    conn.commit()
+    conn.close()
+
+
+def build_app(isolated: bool) -> FastAPI:
+    app = FastAPI()
+    if isolated:
+        app.include_router(logs.router)
+        app.dependency_overrides[authenticate_admin] = lambda: None
+    else:
+        # the former handler: a sync def, run by the server on its shared thread pool
+        app.add_api_route("/logs/", logs.get_logs.__wrapped__)
+
+    @app.get("/ping")
+    def ping():
+        return "pong"
+
+    return app
+
+
+async def ping_under_load(app: FastAPI, heavy: int, threads: int) -> tuple[float, float]:
+    """(ms for /ping, s for all heavy queries) with heavy log queries in flight."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        queries = [asyncio.create_task(client.get(HEAVY)) for _ in range(heavy)]
+        await asyncio.sleep(0.05)
+        sent = time.perf_counter()
+        await client.get("/ping")
+        ping = time.perf_counter() - sent
+        await asyncio.gather(*queries)
+        return ping * 1000, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--heavy", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    logger.close()
+
+    populate(args.rows)
+    print(f"rows={args.rows} heavy queries={args.heavy} server threads={args.threads} "
+          f"log query threads={log_config.LOG_QUERY_THREADS}")
+    for label, isolated in (("shared thread pool", False), ("log query threads", True)):
+        ping, total = asyncio.run(ping_under_load(build_app(isolated), args.heavy, args.threads))
+        print(f"{label:<20} /ping {ping:8.1f} ms   heavy queries done in {total:5.2f} s")
+
+    log_config.LOG_QUERY_TIMEOUT = 0.05
+    async def timed_out():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app(True)), base_url="http://bench") as client:
+            return await client.get(HEAVY)
+    response = asyncio.run(timed_out())
+    if response.status_code in (503, 504):
+        print(f"LOG_QUERY_TIMEOUT=0.05: {response.status_code} {response.json()['detail']}")
+    else:
+        print(f"LOG_QUERY_TIMEOUT=0.05: {response.status_code}, the query finished within the timeout")
+
+
+if __name__ == "__main__":
+    main()
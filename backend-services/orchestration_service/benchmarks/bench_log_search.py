@@ -0,0 +1,133 @@
+"""
+Benchmark: GET /logs/?search= with LIKE '%term%' vs. the FTS5 message index.
+
+Fills one daily log partition with saga-style messages, then times the previous search (a
+LIKE scan plus COUNT(*)) against the endpoint, which now matches through
+logs_fts, for a rare term (one transaction id), a phrase and a prefix query.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_log_search.py --rows 5000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py and the log endpoints use the partitions in logs/ under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_search_"))
+
+import config  # noqa: E402
+from logger import logger  # noqa: E402
+from service_logs.partitions import open_partition, partition_path  # noqa: E402
+
+# all rows are loaded into this day's partition
+DAY = "2026-01-01"
+from fastapi import Response  # noqa: E402
+from routers.logs import get_logs  # noqa: E402
+
+TEMPLATES = [
+    "Processing event type: {event} for transaction {tid}",
+    "Successfully processed event type: {event}",
+    "Published message to queue {queue} for transaction {tid}",
+    "Rolled back stock for transaction {tid}",
+    "Skipping duplicate message {tid} ({event})",
+]
+EVENTS = ["reduce_stock", "take_payment", "create_order", "rollback_payment"]
+QUEUES = ["products_queue", "payment_queue", "orders_queue"]
+
+
+def populate(rows: int) -> str:
+    """Insert rows without the full-text triggers; returns one transaction id to look for."""
+    conn = open_partition(config.LOG_DIR, DAY, "timestamp")
+    conn.execute("DROP TRIGGER logs_fts_insert")
+    started = datetime(2026, 1, 1)
+    needle = None
+    batch = []
+    for i in range(rows):
+        tid = "%032x" % random.getrandbits(128)
+        if i == rows // 3:
+            needle = tid
+        message = random.choice(TEMPLATES).format(
+            event=random.choice(EVENTS), tid=tid, queue=random.choice(QUEUES)
+        )
+        batch.append(((started + timedelta(milliseconds=i)).isoformat(), "INFO", message, "services.saga_orchestrator", "handle", 1))
+        if len(batch) == 100000:
+            conn.executemany(
+                "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)", batch
+            )
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)", batch
+        )
+    conn.commit()
+    conn.close()
+    return needle
+
+
+def like_search(term: str, page_size: int):
+    """The former search: COUNT(*) and a page, both scanning with LIKE."""
+    conn = sqlite3.connect(partition_path(config.LOG_DIR, DAY))
+    conn.execute("SELECT COUNT(*) FROM logs WHERE message LIKE ?", (f"%{term}%",)).fetchone()
+    conn.execute(
+        "SELECT id, timestamp, level, message, module, funcName, lineno FROM logs WHERE message LIKE ? "
+        "ORDER BY timestamp DESC LIMIT ? OFFSET 0",
+        (f"%{term}%", page_size)
+    ).fetchall()
+    conn.close()
+
+
+def fts_search(search: str, page_size: int, count: str):
+    # the endpoint body, called directly rather than on a log query thread
+    return get_logs.__wrapped__(
+        response=Response(),
+        level=None, start_date=None, end_date=None, module=None, search=search, highlight=True,
+        page=1, page_size=page_size, cursor=None, count=count
+    )
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    logger.close()
+
+    started = time.perf_counter()
+    needle = populate(args.rows)
+    print(f"rows={args.rows} loaded in {time.perf_counter() - started:.0f}s")
+    started = time.perf_counter()
+    with open_partition(config.LOG_DIR, DAY, "timestamp") as conn:  # recreates the trigger
+        conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")  # indexes the existing rows
+    print(f"full-text index built in {time.perf_counter() - started:.0f}s")
+
+    cases = [
+        ("rare term (transaction id)", needle, needle, "exact"),
+        ("phrase", "Rolled back stock", '"Rolled back stock"', "approximate"),
+        ("prefix", "rollback_pay", "rollback_pay*", "approximate"),
+    ]
+    for label, like_term, search, count in cases:
+        before = timed(lambda: like_search(like_term, args.page_size), repeat=1)
+        after = timed(lambda: fts_search(search, args.page_size, count))
+        print(f"{label:<28} LIKE {before:9.1f} ms   FTS5 {after:8.1f} ms  ({before / after:.0f}x)")
+    entries = fts_search(needle, args.page_size, "exact")
+    print("highlighted:", entries[0].highlighted_message if entries else None)
+
+
+if __name__ == "__main__":
+    main()
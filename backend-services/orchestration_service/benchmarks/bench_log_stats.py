@@ -0,0 +1,148 @@
+"""
+Benchmark: GET /logs/stats from full-table scans vs. the hourly rollup.
+
+The previous endpoint ran three GROUP BY/COUNT scans over logs plus a 24h range
+scan; the current one reads logs_rollup, the per-(hour, level, module) counters
+the log writer maintains in every daily partition. Also reports what maintaining the rollup adds to a
+batch insert.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_log_stats.py --rows 2000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py and the log endpoints use the partitions in logs/ under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_stats_"))
+
+import config  # noqa: E402
+from logger import SQLiteLogger, logger  # noqa: E402
+from service_logs.partitions import (  # noqa: E402
+    ROLLUP_UPSERT, hourly_counts, init_partition, open_partition, list_partitions
+)
+from routers.logs import get_log_stats  # noqa: E402
+
+LEVELS = ["INFO"] * 8 + ["WARNING", "ERROR"]
+MODULES = ["services.saga_orchestrator", "services.event_consumer", "services.message_publisher", "main"]
+
+
+INSERT = "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def write_partitions(partitions: dict, rows: list):
+    """What the writer does with a batch: insert into each day's partition and bump its rollup."""
+    days = {}
+    for row in rows:
+        days.setdefault(row[0][:10], []).append(row)
+    for day, day_rows in days.items():
+        if day not in partitions:
+            partitions[day] = open_partition(config.LOG_DIR, day, "timestamp")
+        partitions[day].executemany(INSERT, day_rows)
+        partitions[day].executemany(ROLLUP_UPSERT, hourly_counts(day_rows))
+
+
+def populate(rows: int):
+    """
+    Load rows over the last 30 days without going through the writer: into
+    previous.db, one indexed table without a rollup as before, and into the
+    daily partitions with their rollups.
+    """
+    previous = sqlite3.connect("previous.db")
+    init_partition(previous, "timestamp")
+    previous.execute("DROP TRIGGER logs_fts_insert")
+    previous.execute("DROP TABLE logs_rollup")
+    partitions = {}
+    start = datetime.now() - timedelta(days=30)
+    step = timedelta(days=30) / rows
+    batch = []
+    for i in range(rows):
+        batch.append(((start + step * i).isoformat(), random.choice(LEVELS), "message",
+                      random.choice(MODULES), "handle", 1))
+        if len(batch) == 100000:
+            previous.executemany(INSERT, batch)
+            write_partitions(partitions, batch)
+            batch = []
+    if batch:
+        previous.executemany(INSERT, batch)
+        write_partitions(partitions, batch)
+    previous.commit()
+    previous.close()
+    for conn in partitions.values():
+        conn.commit()
+        conn.close()
+
+
+def previous_stats():
+    conn = sqlite3.connect("previous.db")
+    conn.execute("SELECT level, COUNT(*) FROM logs GROUP BY level").fetchall()
+    conn.execute("SELECT module, COUNT(*) FROM logs GROUP BY module").fetchall()
+    yesterday = (datetime.now() - timedelta(days=1)).isoformat()
+    conn.execute("SELECT COUNT(*) FROM logs WHERE level = 'ERROR' AND timestamp >= ?", (yesterday,)).fetchone()
+    conn.execute("SELECT COUNT(*) FROM logs").fetchone()
+    conn.close()
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+class WithoutRollup(SQLiteLogger):
+    """The writer as it was before the rollup: only the logs insert."""
+    def _write(self, batch, conns=None):
+        rows = [self._row(record) for record in batch]
+        day = rows[0][0][:10]
+        if day not in conns:
+            conns[day] = self._connect(day)
+        with conns[day] as conn:
+            conn.executemany(INSERT, [row[:6] for row in rows])
+
+
+def write_batches(writer: SQLiteLogger, batches: int, size: int) -> float:
+    records = [(time.time(), random.choice(LEVELS), "message", {"__name__": random.choice(MODULES)}, None, 1, None)
+               for _ in range(size)]
+    conns = {}
+    started = time.perf_counter()
+    for _ in range(batches):
+        writer._write(records, conns)
+    for conn in conns.values():
+        conn.close()
+    return (time.perf_counter() - started) / batches * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    args = parser.parse_args()
+    logger.close()
+
+    populate(args.rows)
+    before = timed(previous_stats, repeat=3)
+    # the endpoint body, called directly rather than on a log query thread
+    after = timed(get_log_stats.__wrapped__)
+    stats = get_log_stats.__wrapped__()
+    print(f"rows={args.rows} daily partitions={len(list_partitions(config.LOG_DIR))}")
+    print(f"/logs/stats  full scans {before:9.1f} ms   rollup {after:6.2f} ms  ({before / after:.0f}x)")
+    print(f"  total={stats.total_logs} recent_errors_24h={stats.recent_errors_24h}")
+
+    with_rollup = write_batches(logger, 50, 500)
+    plain = WithoutRollup("plain")
+    plain.close()
+    without_rollup = write_batches(plain, 50, 500)
+    print(f"500-row batch insert: {without_rollup:.2f} ms plain, {with_rollup:.2f} ms with rollup upsert")
+
+
+if __name__ == "__main__":
+    main()
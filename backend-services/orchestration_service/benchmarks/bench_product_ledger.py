@@ -0,0 +1,89 @@
+"""
+Micro-benchmark: the per-saga stock ledger (ProductSagaState) for carts of
+1, 50 and 500 lines.
+
+For each cart size it measures, per saga:
+  * building the ledger from the order lines (start_order_saga)
+  * writing it to the saga hash and reading it back (HSET / HMGET)
+  * marking it reserved and building the rollback_stock command from it
+and compares the size of the stored ledger with the order's full item list,
+which is what a compensation would otherwise have to re-read and re-aggregate.
+
+Runs against fakeredis in-process, so the numbers are client-side CPU and
+payload size, not network time.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_product_ledger.py --sagas 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py writes its daily log partitions under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_ledger_"))
+
+import fakeredis  # noqa: E402
+from models.order import OrderItemCreate  # noqa: E402
+from models.saga_state import ProductSagaState  # noqa: E402
+from services.message_publisher import _rollback_stock_command  # noqa: E402
+from services.redis_saga_store import RedisSagaStore, saga_key  # noqa: E402
+
+
+def make_cart(lines: int) -> list[OrderItemCreate]:
+    return [
+        OrderItemCreate(product_id=uuid.uuid4().hex[:24], quantity=(n % 5) + 1, unit_price=9.5)
+        for n in range(lines)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def run(store: RedisSagaStore, lines: int, sagas: int):
+    cart = make_cart(lines)
+    transaction_id = str(uuid.uuid4())
+    ledger = ProductSagaState.from_order_items(transaction_id, cart)
+
+    build_us = timed(lambda: ProductSagaState.from_order_items(transaction_id, cart), sagas)
+    write_us = timed(lambda: store.save_product_saga(ledger), sagas)
+    read_us = timed(lambda: store.get_product_saga(transaction_id), sagas)
+
+    def reserve_and_compensate():
+        saga = store.get_product_saga(transaction_id)
+        saga.reserve()
+        store.update_saga_fields(transaction_id, {"reserved_products": saga.reserved_products})
+        _rollback_stock_command(transaction_id, saga.reserved_products)
+    compensate_us = timed(reserve_and_compensate, sagas)
+
+    ledger_bytes = len(store.client.hget(saga_key(transaction_id), "products"))
+    items_bytes = len(json.dumps([item.dict() for item in cart]))
+    print(f"{lines:>5} lines  build {build_us:8.1f} us  write {write_us:8.1f} us  read {read_us:8.1f} us"
+          f"  reserve+rollback {compensate_us:8.1f} us  ledger {ledger_bytes:6d} B"
+          f"  (order items {items_bytes:6d} B)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sagas", type=int, default=500)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 50, 500])
+    args = parser.parse_args()
+
+    store = RedisSagaStore.__new__(RedisSagaStore)
+    store.client = fakeredis.FakeRedis(decode_responses=True)
+    print(f"sagas={args.sagas} (per-saga timings)")
+    for lines in args.lines:
+        run(store, lines, args.sagas)
+
+
+if __name__ == "__main__":
+    main()
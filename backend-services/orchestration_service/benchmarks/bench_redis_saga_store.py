@@ -0,0 +1,235 @@
+"""
+Micro-benchmark: saga-state writes through RedisSagaStore.
+
+Compares, per saga (start_order_saga + handle_create_order_event writes):
+  * a new client per request with one write per state (previous behaviour)
+  * the shared connection pool with one write per state
+  * the shared connection pool with pipelined batch() writes
+
+and, for the payment/order-id steps that only change a couple of fields, the
+previous layout (three JSON documents read, decoded, re-encoded and rewritten)
+against field-level HMGET/HSET on the single saga hash.
+
+By default it runs against an in-process Redis stand-in listening on loopback
+(fakeredis' TcpFakeServer), so every command is a real TCP round trip. Loopback
+is far faster than a real network hop, so --rtt-ms adds a simulated delay to
+every write to the socket (and to every TCP connect). Pass --host/--port to run
+against a real Redis instead.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_redis_saga_store.py --sagas 2000 --rtt-ms 0.5
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py writes its daily log partitions under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_redis_"))
+
+import redis  # noqa: E402
+from models.order import OrderItemCreate  # noqa: E402
+from models.saga_state import OrderSagaState, ProductSagaState, PaymentSagaState  # noqa: E402
+from services.redis_saga_store import RedisSagaStore  # noqa: E402
+from fakeredis import TcpFakeServer  # noqa: E402
+
+
+class NoDelayFakeServer(TcpFakeServer):
+    """TcpFakeServer writes each reply separately; without TCP_NODELAY pipelined
+    replies stall on delayed ACKs, which would measure the stand-in, not the client."""
+    def get_request(self):
+        sock, addr = super().get_request()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, addr
+
+
+class LatencyConnection(redis.Connection):
+    """Adds a simulated network round trip to every request sent and every connect."""
+    rtt = 0.0
+    round_trips = 0
+    bytes_sent = 0
+
+    def connect(self):
+        if self._sock is None:
+            time.sleep(self.rtt)
+            LatencyConnection.round_trips += 1
+        super().connect()
+
+    def send_packed_command(self, command, check_health=True):
+        time.sleep(self.rtt)
+        LatencyConnection.round_trips += 1
+        LatencyConnection.bytes_sent += sum(len(chunk) for chunk in command) if isinstance(command, list) else len(command)
+        super().send_packed_command(command, check_health)
+
+
+def new_client(host, port, pool=None):
+    if pool is None:
+        pool = redis.ConnectionPool(
+            host=host, port=port, decode_responses=True, connection_class=LatencyConnection
+        )
+    return redis.Redis(connection_pool=pool)
+
+
+def store_with(client) -> RedisSagaStore:
+    store = RedisSagaStore.__new__(RedisSagaStore)
+    store.client = client
+    return store
+
+
+def make_states():
+    transaction_id = str(uuid.uuid4())
+    order = OrderSagaState(
+        transaction_id=transaction_id,
+        description="benchmark order",
+        user_email="bench@example.com",
+        vendor_email="vendor@example.com",
+        delivery_address="1 Bench Street",
+        payment_method="Credit Card",
+        items=[OrderItemCreate(product_id="p-1", quantity=2, unit_price=9.5)],
+    )
+    product = ProductSagaState.from_order_items(transaction_id, order.items)
+    payment = PaymentSagaState(
+        transaction_id=transaction_id, user_email="bench@example.com",
+        amount=19.0, payment_method="Credit Card",
+    )
+    return order, product, payment
+
+
+def per_request_client(host, port, order, product, payment):
+    store = store_with(new_client(host, port))
+    store.save_product_saga(product)
+    store.save_order_saga(order)
+    store.client.connection_pool.disconnect()
+
+    store = store_with(new_client(host, port))
+    store.save_order_id_with_saga("order-" + order.transaction_id, order.transaction_id)
+    store.save_order_saga(order)
+    store.save_payment_saga(payment)
+    store.client.connection_pool.disconnect()
+
+
+def shared_pool_sequential(store, order, product, payment):
+    store.save_product_saga(product)
+    store.save_order_saga(order)
+
+    store.save_order_id_with_saga("order-" + order.transaction_id, order.transaction_id)
+    store.save_order_saga(order)
+    store.save_payment_saga(payment)
+
+
+def shared_pool_batched(store, order, product, payment):
+    with store.batch() as batch:
+        batch.save_product_saga(product)
+        batch.save_order_saga(order)
+
+    with store.batch() as batch:
+        batch.save_order_id_with_saga("order-" + order.transaction_id, order.transaction_id)
+        batch.save_order_saga(order)
+        batch.save_payment_saga(payment)
+
+
+def json_blob_steps(store, order, product, payment):
+    """take_payment + create_order bookkeeping on the previous three-document layout."""
+    client = store.client
+    tid = order.transaction_id
+    with client.pipeline(transaction=False) as pipe:
+        pipe.get(f"order_saga:{tid}")
+        pipe.get(f"payment_saga:{tid}")
+        order_doc, payment_doc = (json.loads(raw) for raw in pipe.execute())
+    order_doc["payment_id"] = "pay-" + tid
+    payment_doc["payment_status"] = "Success"
+    with client.pipeline(transaction=True) as pipe:
+        pipe.set(f"order_saga:{tid}", json.dumps(order_doc), ex=600)
+        pipe.set(f"payment_saga:{tid}", json.dumps(payment_doc), ex=600)
+        pipe.execute()
+
+    order_doc = json.loads(client.get(f"order_saga:{tid}"))
+    payment_doc = json.loads(client.get(f"payment_saga:{tid}"))
+    order_doc["status"] = "Success"
+    payment_doc["order_id"] = "order-" + tid
+    with client.pipeline(transaction=True) as pipe:
+        pipe.set(f"order_id:order-{tid}", tid)
+        pipe.set(f"order_saga:{tid}", json.dumps(order_doc), ex=600)
+        pipe.set(f"payment_saga:{tid}", json.dumps(payment_doc), ex=600)
+        pipe.execute()
+
+
+def hash_field_steps(store, order, product, payment):
+    """The same two steps as field-level reads and writes on saga:{transaction_id}."""
+    tid = order.transaction_id
+    store.get_order_saga(tid)
+    store.update_saga_fields(tid, {"payment_status": "Success", "payment_id": "pay-" + tid})
+
+    store.get_saga_fields(tid, "vendor_email", "amount", "payment_id")
+    with store.batch() as batch:
+        batch.save_order_id_with_saga(order_id="order-" + tid, transaction_id=tid)
+        batch.update_saga_fields(tid, {"status": "Success", "order_id": "order-" + tid})
+
+
+def seed_json_blobs(store, order, product, payment):
+    tid = order.transaction_id
+    store.client.set(f"order_saga:{tid}", json.dumps(order.dict()), ex=600)
+    store.client.set(f"payment_saga:{tid}", json.dumps(payment.dict()), ex=600)
+
+
+def measure(label, fn, sagas, seed=None):
+    states = [make_states() for _ in range(sagas)]
+    if seed is not None:
+        for state in states:
+            seed(*state)
+    LatencyConnection.round_trips = 0
+    LatencyConnection.bytes_sent = 0
+    started = time.perf_counter()
+    for order, product, payment in states:
+        fn(order, product, payment)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {sagas / elapsed:9.0f} sagas/s  {elapsed / sagas * 1e6:8.1f} us/saga"
+          f"  {LatencyConnection.round_trips / sagas:5.1f} round trips/saga"
+          f"  {LatencyConnection.bytes_sent / sagas:7.0f} bytes sent/saga")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sagas", type=int, default=2000)
+    parser.add_argument("--host", default=None, help="real Redis host (default: local stand-in)")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated network round trip")
+    args = parser.parse_args()
+    LatencyConnection.rtt = args.rtt_ms / 1000
+
+    server = None
+    host, port = args.host, args.port
+    if host is None:
+        server = NoDelayFakeServer(("127.0.0.1", 0))
+        host, port = server.server_address
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # same shape as the pool RedisSagaStore shares process-wide
+    shared_pool = redis.BlockingConnectionPool(
+        host=host, port=port, decode_responses=True, connection_class=LatencyConnection
+    )
+    store = store_with(new_client(host, port, shared_pool))
+    print(f"redis={host}:{port} sagas={args.sagas} rtt={args.rtt_ms}ms (5 state writes per saga)")
+    measure("per-request client, one write each", lambda *s: per_request_client(host, port, *s), args.sagas)
+    measure("shared pool, one write each", lambda *s: shared_pool_sequential(store, *s), args.sagas)
+    measure("shared pool, pipelined batch()", lambda *s: shared_pool_batched(store, *s), args.sagas)
+
+    print("payment + create-order steps:")
+    measure("JSON documents, read-modify-write", lambda *s: json_blob_steps(store, *s), args.sagas,
+            seed=lambda *s: seed_json_blobs(store, *s))
+    measure("saga hash, field-level HMGET/HSET", lambda *s: hash_field_steps(store, *s), args.sagas,
+            seed=lambda *s: shared_pool_batched(store, *s))
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
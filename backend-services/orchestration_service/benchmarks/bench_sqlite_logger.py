@@ -0,0 +1,109 @@
+"""
+Benchmark: latency of SQLiteLogger.log() as seen by the caller.
+
+Compares the previous behaviour (connect, insert and commit on the caller's
+thread under a global lock) with the buffered logger, whose writer thread
+inserts batches in the background. Several threads log concurrently, like the
+request handlers, consumer and publisher do in the service.
+
+Usage (from the orchestration_service directory):
+    python benchmarks/bench_sqlite_logger.py --threads 8 --messages 2000
+"""
+import argparse
+import inspect
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# logger.py writes its daily log partitions under the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_logger_"))
+
+from logger import SQLiteLogger  # noqa: E402
+from service_logs.partitions import init_partition  # noqa: E402
+
+
+class InlineSQLiteLogger(SQLiteLogger):
+    """The previous log(): one connection, insert and commit per call."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with sqlite3.connect(db_path) as conn:
+            init_partition(conn, "timestamp")
+
+    def log(self, message, level="INFO"):
+        timestamp = datetime.utcnow().isoformat()
+        frame = inspect.currentframe().f_back
+        module = frame.f_globals.get('__name__', 'unknown')
+        func_name = frame.f_code.co_name
+        line_no = frame.f_lineno
+        with self._lock:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)",
+                    (timestamp, level, message, module, func_name, line_no)
+                )
+                conn.commit()
+
+    def flush(self, timeout=None):
+        return True
+
+    def close(self, timeout=5):
+        pass
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(label, logger, threads, messages):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(messages):
+            started = time.perf_counter_ns()
+            logger.log(f"Processing event type: take_payment ({n}/{i})")
+            local.append(time.perf_counter_ns() - started)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    logged = time.perf_counter() - started
+    logger.flush()
+    persisted = time.perf_counter() - started
+    logger.close()
+
+    latencies.sort()
+    total = threads * messages
+    print(f"{label:<18} p50 {percentile(latencies, 0.5) / 1000:8.1f} us"
+          f"  p99 {percentile(latencies, 0.99) / 1000:8.1f} us"
+          f"  max {latencies[-1] / 1000:9.1f} us"
+          f"  {total / logged:9.0f} calls/s  {total / persisted:9.0f} rows/s persisted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=2000, help="log calls per thread")
+    args = parser.parse_args()
+
+    print(f"threads={args.threads} messages/thread={args.messages}")
+    measure("inline commit", InlineSQLiteLogger("inline.db"), args.threads, args.messages)
+    measure("buffered, drop", SQLiteLogger("drop", overflow_policy="drop"), args.threads, args.messages)
+    measure("buffered, block", SQLiteLogger("block", overflow_policy="block"), args.threads, args.messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Unit tests import the service modules the way app/main.py does, with app/ on
+sys.path. The logger writes its daily partitions under LOG_DIR, so the tests
+point it at a temporary directory before anything imports it.
+"""
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="orchestration_tests_"))
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def saga_store(redis_server):
+    """RedisSagaStore on fakeredis."""
+    from services.redis_saga_store import RedisSagaStore
+    store = RedisSagaStore.__new__(RedisSagaStore)
+    store.client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    return store
+
+
+@pytest.fixture
+def async_saga_store(redis_server):
+    """AsyncRedisSagaStore on the same fakeredis server as saga_store."""
+    from services.redis_saga_store import AsyncRedisSagaStore
+    store = AsyncRedisSagaStore.__new__(AsyncRedisSagaStore)
+    store.client = fakeredis.aioredis.FakeRedis(server=redis_server, decode_responses=True)
+    return store
+
+
+class RecordingPublisher:
+    """Records the publish_* calls instead of sending them."""
+    def __init__(self):
+        self.published = []
+
+    def __getattr__(self, name):
+        def publish(**kwargs):
+            self.published.append((name, kwargs))
+        return publish
+
+    def names(self) -> list:
+        return [name for name, _ in self.published]
+
+    def command(self, name: str) -> dict:
+        return next(kwargs for published, kwargs in self.published if published == name)
+
+
+class AsyncRecordingPublisher(RecordingPublisher):
+    def __getattr__(self, name):
+        async def publish(**kwargs):
+            self.published.append((name, kwargs))
+        return publish
+
+
+@pytest.fixture
+def publisher():
+    return RecordingPublisher()
+
+
+@pytest.fixture
+def async_publisher():
+    return AsyncRecordingPublisher()
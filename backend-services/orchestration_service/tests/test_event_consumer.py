@@ -0,0 +1,171 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import fakeredis
+import pytest
+from message_dedup.window import DedupWindow, AsyncDedupWindow
+from services import event_consumer
+from logger import logger
+
+
+class Handlers:
+    """Stands in for the orchestrator; fails the first ``failures`` calls."""
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.handled = []
+
+    def handle(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("RabbitMQ is down")
+        self.handled.append(message["message_id"])
+
+    async def handle_async(self, message):
+        self.handle(message)
+
+
+class Channel:
+    def __init__(self):
+        self.acked = []
+        self.nacked = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacked.append((delivery_tag, requeue))
+
+
+class Incoming:
+    def __init__(self, body: bytes, redelivered: bool):
+        self.body = body
+        self.redelivered = redelivered
+        self.acked = False
+        self.nacked = None
+
+    async def ack(self):
+        self.acked = True
+
+    async def nack(self, requeue):
+        self.nacked = requeue
+
+
+MESSAGE = json.dumps({"event": "take_payment", "message_id": "m-1", "transaction_id": "t-1"}).encode()
+
+
+@pytest.fixture
+def handlers():
+    return Handlers()
+
+
+@pytest.fixture
+def consumer(handlers, redis_server):
+    consumer = event_consumer.RabbitMQConsumer.__new__(event_consumer.RabbitMQConsumer)
+    consumer.event_handlers = {"take_payment": handlers.handle}
+    consumer.dedup = DedupWindow("orchestration_queue", fakeredis.FakeRedis(server=redis_server), logger.log)
+    return consumer
+
+
+@pytest.fixture
+def async_consumer(handlers, redis_server):
+    consumer = event_consumer.AsyncRabbitMQConsumer.__new__(event_consumer.AsyncRabbitMQConsumer)
+    consumer.event_handlers = {"take_payment": handlers.handle_async}
+    consumer.dedup = AsyncDedupWindow(
+        "orchestration_queue", fakeredis.aioredis.FakeRedis(server=redis_server), logger.log
+    )
+    return consumer
+
+
+def deliver(consumer, redelivered: bool = False) -> Channel:
+    channel = Channel()
+    consumer.callback(channel, SimpleNamespace(delivery_tag=1, redelivered=redelivered), None, MESSAGE)
+    return channel
+
+
+def deliver_async(consumer, redelivered: bool = False) -> Incoming:
+    incoming = Incoming(MESSAGE, redelivered)
+    asyncio.run(consumer.callback(incoming))
+    return incoming
+
+
+def test_redelivery_after_a_failure_is_handled(consumer, handlers):
+    handlers.failures = 1
+    assert deliver(consumer).nacked == [(1, True)]
+    assert not consumer.dedup.seen("m-1")
+
+    assert deliver(consumer, redelivered=True).acked == [1]
+    assert deliver(consumer, redelivered=True).acked == [1]
+    assert handlers.handled == ["m-1"]
+
+
+def test_message_failing_twice_is_dropped(consumer, handlers):
+    handlers.failures = 2
+    deliver(consumer)
+    assert deliver(consumer, redelivered=True).nacked == [(1, False)]
+    assert handlers.handled == []
+
+
+def test_async_redelivery_after_a_failure_is_handled(async_consumer, handlers):
+    handlers.failures = 1
+    assert deliver_async(async_consumer).nacked is True
+
+    assert deliver_async(async_consumer, redelivered=True).acked
+    assert deliver_async(async_consumer, redelivered=True).acked
+    assert handlers.handled == ["m-1"]
+
+
+def test_async_message_failing_twice_is_dropped(async_consumer, handlers):
+    handlers.failures = 2
+    deliver_async(async_consumer)
+    assert deliver_async(async_consumer, redelivered=True).nacked is False
+    assert handlers.handled == []
+
+
+class ShardIncoming(Incoming):
+    def __init__(self, message_id: str):
+        super().__init__(
+            json.dumps({"event": "take_payment", "message_id": message_id, "transaction_id": "t-1"}).encode(), False
+        )
+        self.headers = {"transaction_id": "t-1"}
+
+
+@pytest.fixture
+def sharded_consumer(handlers, redis_server):
+    consumer = event_consumer.ShardedRabbitMQConsumer.__new__(event_consumer.ShardedRabbitMQConsumer)
+    consumer.event_handlers = {"take_payment": handlers.handle_async}
+    consumer.dedup = AsyncDedupWindow(
+        "orchestration_queue", fakeredis.aioredis.FakeRedis(server=redis_server), logger.log
+    )
+    consumer._worker_queues = [asyncio.Queue()]
+    return consumer
+
+
+def work(consumer, deliveries: list):
+    """Dispatch the deliveries of one saga together, as prefetch does, and let the worker run them."""
+    async def run():
+        for incoming in deliveries:
+            await consumer.dispatch(incoming)
+        await consumer._worker_queues[0].put(None)
+        await consumer._work(consumer._worker_queues[0])
+    asyncio.run(run())
+
+
+def test_sharded_retry_of_a_failed_event_comes_before_the_next_event_of_its_saga(sharded_consumer, handlers):
+    handlers.failures = 1
+    first, second = ShardIncoming("m-1"), ShardIncoming("m-2")
+
+    work(sharded_consumer, [first, second])
+
+    assert handlers.handled == ["m-1", "m-2"]
+    assert first.acked and first.nacked is None
+    assert second.acked
+
+
+def test_sharded_event_failing_twice_is_dropped_not_requeued_behind_its_saga(sharded_consumer, handlers):
+    handlers.failures = 2
+    first, second = ShardIncoming("m-1"), ShardIncoming("m-2")
+
+    work(sharded_consumer, [first, second])
+
+    assert first.nacked is False
+    assert handlers.handled == ["m-2"]
@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from services.log_fanout import LogFanOut, LogQuery, decode_positions, encode_positions
+
+
+class ListSource:
+    """Serves its entries newest first, continuing below after=(timestamp, id) like the real sources."""
+    def __init__(self, name: str, timestamps: list[str], delay: float = 0, error: Exception | None = None):
+        self.name = name
+        self.entries = sorted(
+            ({"service": name, "id": i + 1, "timestamp": timestamp} for i, timestamp in enumerate(timestamps)),
+            key=lambda entry: (entry["timestamp"], entry["id"]), reverse=True
+        )
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def fetch(self, query: LogQuery, after: tuple | None, limit: int) -> list[dict]:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        entries = [e for e in self.entries if not after or (e["timestamp"], e["id"]) < tuple(after)]
+        return entries[:limit]
+
+
+def walk(fanout: LogFanOut, page_size: int) -> list[list[dict]]:
+    """Every page, passing the cursor along as a client would."""
+    pages, cursor = [], None
+    while True:
+        positions = decode_positions(cursor) if cursor else {}
+        entries, positions, _ = asyncio.run(fanout.page(LogQuery(), positions, page_size))
+        pages.append(entries)
+        if fanout.exhausted(positions):
+            return pages
+        cursor = encode_positions(positions)
+
+
+def keys(entries: list[dict]) -> list[tuple]:
+    return [(entry["timestamp"], entry["service"], entry["id"]) for entry in entries]
+
+
+def test_pages_merge_every_source_newest_first():
+    sources = [
+        ListSource("orchestration", ["10:00", "10:03", "10:06", "10:09"]),
+        ListSource("order", ["10:01", "10:04", "10:04"]),
+        ListSource("payment", ["10:02", "10:05", "10:07", "10:08", "10:10"]),
+    ]
+    pages = walk(LogFanOut(sources), page_size=3)
+
+    merged = sum(pages, [])
+    assert all(len(page) == 3 for page in pages[:-1])
+    assert sorted(keys(merged)) == sorted(keys(sum((source.entries for source in sources), [])))
+    timestamps = [entry["timestamp"] for entry in merged]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+
+def test_a_short_source_is_exhausted_and_not_asked_again():
+    short = ListSource("order", ["10:30"])
+    long = ListSource("orchestration", [f"10:{minute:02}" for minute in range(1, 10)])
+    fanout = LogFanOut([long, short])
+
+    entries, positions, statuses = asyncio.run(fanout.page(LogQuery(), {}, 3))
+    assert positions["order"] is None
+    assert statuses == {"orchestration": "ok", "order": "ok"}
+
+    _, _, statuses = asyncio.run(fanout.page(LogQuery(), positions, 3))
+    assert statuses == {"orchestration": "ok"}
+    assert short.calls == 1
+    assert not fanout.exhausted(positions)
+
+
+def test_a_source_ending_on_a_full_page_is_exhausted_on_the_next():
+    fanout = LogFanOut([ListSource("orchestration", ["10:00", "10:01"])])
+
+    pages = walk(fanout, page_size=2)
+
+    assert [len(page) for page in pages] == [2, 0]
+
+
+def test_a_slow_source_is_reported_and_retried_from_its_position():
+    slow = ListSource("order", ["10:00", "10:05"], delay=1)
+    fanout = LogFanOut([ListSource("orchestration", ["10:01", "10:02", "10:03"]), slow], timeout=0.05)
+
+    entries, positions, statuses = asyncio.run(fanout.page(LogQuery(), {}, 2))
+
+    assert statuses == {"orchestration": "ok", "order": "timeout"}
+    assert keys(entries) == [("10:03", "orchestration", 3), ("10:02", "orchestration", 2)]
+    assert "order" not in positions
+    slow.delay = 0
+    entries, positions, statuses = asyncio.run(fanout.page(LogQuery(), positions, 2))
+    assert statuses == {"orchestration": "ok", "order": "ok"}
+    assert keys(entries) == [("10:05", "order", 2), ("10:01", "orchestration", 1)]
+
+
+def test_a_failing_source_does_not_fail_the_page():
+    fanout = LogFanOut([
+        ListSource("orchestration", ["10:01"]), ListSource("payment", ["10:02"], error=ConnectionError("refused"))
+    ])
+
+    entries, positions, statuses = asyncio.run(fanout.page(LogQuery(), {}, 10))
+
+    assert statuses == {"orchestration": "ok", "payment": "error: refused"}
+    assert keys(entries) == [("10:01", "orchestration", 1)]
+    assert not fanout.exhausted(positions)
+
+
+def test_positions_round_trip_through_the_cursor():
+    positions = {"orchestration": ("2020-01-01T10:00:00", 7), "order": None}
+
+    assert decode_positions(encode_positions(positions)) == positions
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_positions([1, 2])])
+def test_invalid_positions_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_positions(cursor)
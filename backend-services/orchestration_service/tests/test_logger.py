@@ -0,0 +1,84 @@
+import random
+import sqlite3
+import threading
+import pytest
+from service_logs.partitions import list_partitions
+from logger import SQLiteLogger
+
+
+@pytest.fixture
+def make_logger(tmp_path):
+    """SQLiteLogger on a directory of its own whose writer only runs on a full batch or a flush."""
+    loggers = []
+
+    def make(**kwargs):
+        kwargs = {"batch_size": 100, "flush_interval": 60, "caller_sample_rate": 0, **kwargs}
+        logger = SQLiteLogger(log_dir=str(tmp_path), **kwargs)
+        loggers.append(logger)
+        return logger
+    yield make
+    for logger in loggers:
+        logger.close()
+
+
+def messages(log_dir: str) -> list[str]:
+    rows = []
+    for _, path in list_partitions(log_dir):
+        with sqlite3.connect(path) as conn:
+            rows += [row[0] for row in conn.execute("SELECT message FROM logs ORDER BY id")]
+    return rows
+
+
+def test_drop_discards_the_oldest_buffered_records(make_logger, tmp_path):
+    logger = make_logger(buffer_size=3, overflow_policy="drop")
+    for i in range(5):
+        logger.log(f"message {i}")
+
+    assert logger.flush(timeout=5)
+    assert logger.stats() == {"buffered": 0, "written": 3, "dropped": 2, "overflow_policy": "drop"}
+    assert messages(str(tmp_path)) == ["message 2", "message 3", "message 4"]
+
+
+def test_block_waits_for_the_writer_and_loses_nothing(make_logger, tmp_path):
+    logger = make_logger(buffer_size=1, overflow_policy="block")
+    logger.log("message 0")
+    blocked = threading.Thread(target=logger.log, args=("message 1",))
+    blocked.start()
+
+    # the buffer is full and the writer waits for a batch, so the caller waits too
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+    assert logger.flush(timeout=5)
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+    assert logger.flush(timeout=5)
+    assert logger.stats()["dropped"] == 0
+    assert messages(str(tmp_path)) == ["message 0", "message 1"]
+
+
+def test_block_writes_inline_once_closed(make_logger, tmp_path):
+    logger = make_logger(buffer_size=1, overflow_policy="block")
+    logger.close()
+    logger.log("late message")
+
+    assert messages(str(tmp_path)) == ["late message"]
+
+
+def test_unknown_overflow_policy(make_logger):
+    with pytest.raises(ValueError):
+        make_logger(overflow_policy="grow")
+
+
+@pytest.mark.parametrize("rate, draw, module", [
+    (1, 0.99, __name__), (0.3, 0.29, __name__), (0.3, 0.3, "unknown"), (0, 0.0, "unknown")
+])
+def test_caller_sample_rate_is_the_probability_of_recording_the_caller(make_logger, tmp_path, monkeypatch,
+                                                                       rate, draw, module):
+    monkeypatch.setattr(random, "random", lambda: draw)
+    logger = make_logger(caller_sample_rate=rate)
+    logger.log("message")
+
+    assert logger.flush(timeout=5)
+    (_, path), = list_partitions(str(tmp_path))
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT module FROM logs").fetchall() == [(module,)]
@@ -0,0 +1,145 @@
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from service_logs.partitions import ROLLUP_UPSERT, hourly_counts, open_partition, list_partitions
+import config
+from routers import logs
+from routers.auth_dependencies import authenticate_admin
+
+# the logger writes today's partition while the tests run; these rows live on days of their own
+DAYS = ("2020-01-01", "2020-01-02")
+RANGE = {"start_date": "2020-01-01", "end_date": "2020-01-02T23:59:59"}
+
+
+@pytest.fixture(scope="module")
+def rows():
+    """Seven rows over two daily partitions, two of them with the same timestamp."""
+    written = []
+    for day, times in ((DAYS[0], ("00:00:01", "00:00:02", "00:00:02", "00:00:03")), (DAYS[1], ("00:00:01", "00:00:02", "00:00:03"))):
+        conn = open_partition(config.LOG_DIR, day, "timestamp")
+        conn.execute("DELETE FROM logs")
+        for i, time in enumerate(times):
+            level = "ERROR" if i % 2 else "INFO"
+            cursor = conn.execute(
+                "INSERT INTO logs (timestamp, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)",
+                (f"{day}T{time}", level, f"message {day} {i}", "tests", "test", i)
+            )
+            written.append((f"{day}T{time}", cursor.lastrowid, level))
+        conn.commit()
+        conn.close()
+    # newest first, id breaking ties between equal timestamps
+    return sorted(written, reverse=True)
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(logs.router)
+    app.dependency_overrides[authenticate_admin] = lambda: "admin"
+    with TestClient(app) as client:
+        yield client
+
+
+def follow(client, **params) -> list:
+    """Every page of GET /logs/, following X-Next-Cursor."""
+    pages = []
+    cursor = None
+    while True:
+        response = client.get("/logs/", params={**RANGE, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return pages
+
+
+def test_body_is_a_list_with_the_paging_in_headers(client, rows):
+    response = client.get("/logs/", params={**RANGE, "page_size": 3})
+
+    assert [(entry["timestamp"], entry["id"]) for entry in response.json()] == [row[:2] for row in rows[:3]]
+    assert response.headers["x-total-count"] == "7"
+    assert response.headers["x-total-is-estimate"] == "false"
+    assert "x-next-cursor" in response.headers
+
+
+def test_cursor_walks_every_row_once_across_partitions(client, rows):
+    pages = follow(client, page_size=3, count="none")
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [(entry["timestamp"], entry["id"]) for page in pages for entry in page] == [row[:2] for row in rows]
+
+
+def test_cursor_keeps_the_filters(client, rows):
+    pages = follow(client, page_size=2, level="error")
+
+    errors = [row[:2] for row in rows if row[2] == "ERROR"]
+    assert [(entry["timestamp"], entry["id"]) for page in pages for entry in page] == errors
+
+
+def test_cursor_and_offset_pages_agree(client):
+    by_cursor = follow(client, page_size=2)
+    by_offset = [client.get("/logs/", params={**RANGE, "page_size": 2, "page": page}).json() for page in (1, 2, 3, 4)]
+    assert by_cursor == by_offset
+
+
+def test_last_page_has_no_cursor_and_none_skips_the_count(client, rows):
+    response = client.get("/logs/", params={**RANGE, "page_size": 10, "count": "none"})
+
+    assert len(response.json()) == 7
+    assert "x-next-cursor" not in response.headers
+    assert "x-total-count" not in response.headers
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/logs/", params={"cursor": "not a cursor"}).status_code == 400
+
+
+@pytest.fixture
+def write_errors(monkeypatch, tmp_path):
+    """Writes ERROR rows, with their rollup counts, into partitions of their own at the given UTC times."""
+    monkeypatch.setattr(logs, "list_partitions", lambda *args, **kwargs: list_partitions(str(tmp_path)))
+
+    def write(at: datetime, count: int):
+        rows = [(at.isoformat(), "ERROR", "failed", "tests")] * count
+        conn = open_partition(str(tmp_path), at.isoformat()[:10], "timestamp")
+        with conn:
+            conn.executemany("INSERT INTO logs (timestamp, level, message, module) VALUES (?, ?, ?, ?)", rows)
+            conn.executemany(ROLLUP_UPSERT, hourly_counts(rows))
+        conn.close()
+    return write
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def local_time_behind_utc(monkeypatch):
+    """Runs the test with the local clock five hours behind UTC."""
+    monkeypatch.setenv("TZ", "Etc/GMT+5")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_recent_errors_use_utc_time(client, write_errors, local_time_behind_utc):
+    write_errors(utc_now() - timedelta(hours=22), 3)
+    write_errors(utc_now() - timedelta(hours=26), 5)
+    stats = client.get("/logs/stats").json()
+
+    assert stats["level_counts"] == {"ERROR": 8}
+    assert stats["recent_errors_24h"] == 3
+
+
+def test_recent_errors_stop_exactly_24_hours_back(client, write_errors):
+    cutoff = utc_now() - timedelta(days=1)
+    # in the rollup hour of the cutoff, but before it
+    write_errors(cutoff.replace(minute=0, second=0, microsecond=0), 2)
+    write_errors(cutoff + timedelta(minutes=1), 3)
+    stats = client.get("/logs/stats").json()
+
+    assert stats["level_counts"] == {"ERROR": 5}
+    assert stats["recent_errors_24h"] == 3
@@ -0,0 +1,89 @@
+import asyncio
+import aio_pika
+import pytest
+from services.message_publisher import AsyncRabbitMQPublisher
+
+
+class FakeChannel:
+    def __init__(self):
+        self.is_closed = False
+
+
+class FakeConnection:
+    def __init__(self):
+        self.is_closed = False
+        self.fail = False
+
+    async def channel(self):
+        if self.fail:
+            raise ConnectionError("channel refused")
+        return FakeChannel()
+
+
+def publisher(pool_size: int = 1) -> AsyncRabbitMQPublisher:
+    publisher = AsyncRabbitMQPublisher(pool_size=pool_size, checkout_timeout=0.05)
+    publisher.connection = FakeConnection()
+    publisher._channels = asyncio.Queue()
+    return publisher
+
+
+def test_failed_reopen_of_closed_channel_gives_up_its_slot():
+    async def run():
+        pool = publisher()
+        channel = await pool._checkout()
+        channel.is_closed = True
+        pool._checkin(channel)
+
+        pool.connection.fail = True
+        with pytest.raises(ConnectionError):
+            await pool._checkout()
+        assert pool.stats()["open"] == 0
+
+        pool.connection.fail = False
+        reopened = await pool._checkout()
+        assert not reopened.is_closed
+        assert pool.stats()["open"] == 1
+
+    asyncio.run(run())
+
+
+def test_failed_first_open_gives_up_its_slot():
+    async def run():
+        pool = publisher()
+        pool.connection.fail = True
+        with pytest.raises(ConnectionError):
+            await pool._checkout()
+        assert pool.stats()["open"] == 0
+
+    asyncio.run(run())
+
+
+def test_checkout_times_out_when_every_channel_is_in_use():
+    async def run():
+        pool = publisher(pool_size=1)
+        held = await pool._checkout()
+        with pytest.raises(TimeoutError):
+            await pool._checkout()
+        pool._checkin(held)
+        assert await pool._checkout() is held
+
+    asyncio.run(run())
+
+
+def test_channel_checked_out_before_a_reconnect_is_dropped_on_return(monkeypatch):
+    async def connect_robust(**kwargs):
+        return FakeConnection()
+    monkeypatch.setattr(aio_pika, "connect_robust", connect_robust)
+
+    async def run():
+        pool = publisher(pool_size=1)
+        stale = await pool._checkout()
+        await pool.connect()
+        pool._checkin(stale)
+
+        assert pool.stats()["in_use"] == 0
+        fresh = await pool._checkout()
+        assert fresh is not stale
+        assert pool.stats()["open"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+import asyncio
+from models.saga_state import SagaStep
+from services.redis_saga_store import SAGA_DEADLINES_KEY, saga_key
+
+NOW = 1_700_000_000.0
+
+
+def seed(store, transaction_id: str, step: str, version: int = 1, deadline: float | None = NOW):
+    store.client.hset(saga_key(transaction_id), mapping={"step": step, "version": version})
+    if deadline is not None:
+        store.client.zadd(SAGA_DEADLINES_KEY, {transaction_id: deadline})
+
+
+def test_transition_moves_the_step_and_bumps_the_version(saga_store):
+    seed(saga_store, "t-1", SagaStep.STOCK_PENDING)
+
+    transition = saga_store.transition(
+        "t-1", SagaStep.STOCK_PENDING, SagaStep.PAYMENT_PENDING, {"payment_id": "p-1"}, deadline=NOW + 30, ttl=120
+    )
+
+    assert transition == (True, SagaStep.PAYMENT_PENDING, 2)
+    assert saga_store.get_saga_fields("t-1", "step", "payment_id") == {
+        "step": SagaStep.PAYMENT_PENDING, "payment_id": "p-1"
+    }
+    assert saga_store.client.zscore(SAGA_DEADLINES_KEY, "t-1") == NOW + 30
+    assert 0 < saga_store.client.ttl(saga_key("t-1")) <= 120
+
+
+def test_transition_from_any_of_several_steps(saga_store):
+    seed(saga_store, "t-1", SagaStep.ORDER_PENDING)
+
+    transition = saga_store.transition("t-1", (SagaStep.PAYMENT_PENDING, SagaStep.ORDER_PENDING), SagaStep.FAILED)
+
+    assert transition.applied
+
+
+def test_transition_from_another_step_writes_nothing(saga_store):
+    seed(saga_store, "t-1", SagaStep.COMPLETED, version=4)
+
+    transition = saga_store.transition("t-1", SagaStep.ORDER_PENDING, SagaStep.FAILED, {"payment_id": "p-1"})
+
+    assert transition == (False, SagaStep.COMPLETED, 4)
+    assert saga_store.get_saga_fields("t-1", "step", "version", "payment_id") == {
+        "step": SagaStep.COMPLETED, "version": 4, "payment_id": None
+    }
+
+
+def test_transition_checks_the_expected_version(saga_store):
+    seed(saga_store, "t-1", SagaStep.STOCK_PENDING, version=3)
+
+    stale = saga_store.transition("t-1", SagaStep.STOCK_PENDING, SagaStep.PAYMENT_PENDING, expected_version=2)
+    current = saga_store.transition("t-1", SagaStep.STOCK_PENDING, SagaStep.PAYMENT_PENDING, expected_version=3)
+
+    assert stale == (False, SagaStep.STOCK_PENDING, 3)
+    assert current == (True, SagaStep.PAYMENT_PENDING, 4)
+
+
+def test_transition_of_a_missing_saga(saga_store):
+    transition = saga_store.transition("t-1", SagaStep.STOCK_PENDING, SagaStep.PAYMENT_PENDING)
+
+    assert transition == (False, None, 0)
+    assert not saga_store.client.exists(saga_key("t-1"))
+
+
+def test_final_step_leaves_the_deadline_index(saga_store):
+    seed(saga_store, "t-1", SagaStep.ORDER_PENDING)
+
+    saga_store.transition("t-1", SagaStep.ORDER_PENDING, SagaStep.COMPLETED)
+
+    assert saga_store.client.zscore(SAGA_DEADLINES_KEY, "t-1") is None
+    assert saga_store.count_in_flight() == 0
+
+
+def test_transition_many_applies_each_transition_on_its_own(saga_store):
+    seed(saga_store, "t-1", SagaStep.STOCK_PENDING)
+    seed(saga_store, "t-2", SagaStep.COMPLETED)
+
+    transitions = saga_store.transition_many([
+        {"transaction_id": "t-1", "from_steps": SagaStep.STOCK_PENDING, "to_step": SagaStep.TIMED_OUT},
+        {"transaction_id": "t-2", "from_steps": SagaStep.STOCK_PENDING, "to_step": SagaStep.TIMED_OUT},
+    ])
+
+    assert [transition.applied for transition in transitions] == [True, False]
+
+
+def test_async_transition_runs_the_same_script(saga_store, async_saga_store):
+    seed(saga_store, "t-1", SagaStep.PAYMENT_PENDING)
+
+    first = asyncio.run(async_saga_store.transition("t-1", SagaStep.PAYMENT_PENDING, SagaStep.ORDER_PENDING))
+    second = asyncio.run(async_saga_store.transition("t-1", SagaStep.PAYMENT_PENDING, SagaStep.ORDER_PENDING))
+
+    assert first == (True, SagaStep.ORDER_PENDING, 2)
+    assert second == (False, SagaStep.ORDER_PENDING, 2)
+
+
+def test_claim_returns_expired_sagas_oldest_first(saga_store):
+    seed(saga_store, "late", SagaStep.STOCK_PENDING, deadline=NOW - 1)
+    seed(saga_store, "early", SagaStep.STOCK_PENDING, deadline=NOW - 10)
+    seed(saga_store, "pending", SagaStep.STOCK_PENDING, deadline=NOW + 10)
+
+    assert saga_store.claim_expired_sagas(NOW, limit=10, lease=30) == ["early", "late"]
+
+
+def test_claim_stops_at_the_limit(saga_store):
+    for i in range(3):
+        seed(saga_store, f"t-{i}", SagaStep.STOCK_PENDING, deadline=NOW - 10 + i)
+
+    assert saga_store.claim_expired_sagas(NOW, limit=2, lease=30) == ["t-0", "t-1"]
+    assert saga_store.claim_expired_sagas(NOW, limit=2, lease=30) == ["t-2"]
+
+
+def test_claimed_sagas_are_held_for_the_lease(saga_store):
+    seed(saga_store, "t-1", SagaStep.STOCK_PENDING, deadline=NOW - 1)
+
+    assert saga_store.claim_expired_sagas(NOW, limit=10, lease=30) == ["t-1"]
+    assert saga_store.client.zscore(SAGA_DEADLINES_KEY, "t-1") == NOW + 30
+    # a second sweeper within the lease finds nothing; once it has run out, the saga is claimed again
+    assert saga_store.claim_expired_sagas(NOW + 29, limit=10, lease=30) == []
+    assert saga_store.claim_expired_sagas(NOW + 30, limit=10, lease=30) == ["t-1"]
@@ -0,0 +1,84 @@
+import time
+import pytest
+from models.order import OrderCreateRequest, OrderItemCreate
+from models.saga_state import SagaStep
+from services.saga_deadline_sweeper import SagaDeadlineSweeper
+from services.saga_orchestrator import SagaOrchestrator
+
+ORDER = OrderCreateRequest(
+    user_email="customer@example.com",
+    vendor_email="vendor@example.com",
+    delivery_address="1 Test Street",
+    description="test order",
+    items=[OrderItemCreate(product_id="p-1", quantity=2, unit_price=5.0)],
+    payment_method="Credit Card",
+)
+LATER = time.time() + 3600
+
+
+@pytest.fixture
+def orchestrator(saga_store, publisher):
+    orchestrator = SagaOrchestrator(saga_store=saga_store)
+    orchestrator.publisher = publisher
+    return orchestrator
+
+
+@pytest.fixture
+def sweeper(saga_store, publisher):
+    return SagaDeadlineSweeper(saga_store, publisher, batch_size=10, interval=0, lease=30)
+
+
+def start(orchestrator, publisher) -> str:
+    orchestrator.start_order_saga(ORDER, token="token")
+    transaction_id = publisher.command("publish_reduce_stock_command")["transaction_id"]
+    publisher.published.clear()
+    return transaction_id
+
+
+def reply(transaction_id: str, **data) -> dict:
+    return {"transaction_id": transaction_id, "status": "success", "data": data}
+
+
+def test_stock_pending_timeout_releases_the_requested_stock(orchestrator, sweeper, saga_store, publisher):
+    transaction_id = start(orchestrator, publisher)
+
+    assert sweeper.sweep_once(now=LATER) == 1
+    assert saga_store.get_saga_fields(transaction_id, "step")["step"] == SagaStep.TIMED_OUT
+    assert publisher.names() == ["publish_rollback_stock_command"]
+    assert publisher.command("publish_rollback_stock_command")["products"] == {"p-1": 2}
+
+
+def test_payment_pending_timeout_rolls_back_the_payment_by_transaction(orchestrator, sweeper, saga_store, publisher):
+    transaction_id = start(orchestrator, publisher)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    publisher.published.clear()
+
+    assert sweeper.sweep_once(now=LATER) == 1
+    assert publisher.names() == ["publish_rollback_stock_command", "publish_rollback_payment_command"]
+    assert publisher.command("publish_rollback_payment_command") == {
+        "transaction_id": transaction_id, "payment_id": None
+    }
+
+
+def test_order_pending_timeout_rolls_back_everything(orchestrator, sweeper, saga_store, publisher):
+    transaction_id = start(orchestrator, publisher)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+    publisher.published.clear()
+
+    assert sweeper.sweep_once(now=LATER) == 1
+    assert publisher.names() == [
+        "publish_rollback_stock_command", "publish_rollback_payment_command", "publish_rollback_order_command"
+    ]
+    assert publisher.command("publish_rollback_payment_command")["payment_id"] == "pay-1"
+
+
+def test_completed_saga_is_not_swept(orchestrator, sweeper, publisher):
+    transaction_id = start(orchestrator, publisher)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+    orchestrator.handle_create_order_event(reply(transaction_id, order_id="order-1"))
+    publisher.published.clear()
+
+    assert sweeper.sweep_once(now=LATER) == 0
+    assert publisher.published == []
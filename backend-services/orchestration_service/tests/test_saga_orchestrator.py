@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from models.order import OrderCreateRequest, OrderItemCreate
+from models.saga_state import SagaStep
+from services.saga_orchestrator import SagaOrchestrator, AsyncSagaOrchestrator
+
+
+class Driver:
+    """Runs either orchestrator through the same blocking interface."""
+    def __init__(self, orchestrator, run):
+        self.orchestrator = orchestrator
+        self.run = run
+
+    def __getattr__(self, name):
+        method = getattr(self.orchestrator, name)
+        return lambda *args, **kwargs: self.run(method(*args, **kwargs))
+
+    @property
+    def published(self) -> list:
+        return self.orchestrator.publisher.names()
+
+    def command(self, name: str) -> dict:
+        return self.orchestrator.publisher.command(name)
+
+
+@pytest.fixture(params=["sync", "async"])
+def orchestrator(request, saga_store, async_saga_store, publisher, async_publisher):
+    if request.param == "sync":
+        orchestrator = SagaOrchestrator(saga_store=saga_store)
+        orchestrator.publisher = publisher
+        return Driver(orchestrator, lambda result: result)
+    orchestrator = AsyncSagaOrchestrator(saga_store=async_saga_store)
+    orchestrator.publisher = async_publisher
+    return Driver(orchestrator, asyncio.run)
+
+
+ORDER = OrderCreateRequest(
+    user_email="customer@example.com",
+    vendor_email="vendor@example.com",
+    delivery_address="1 Test Street",
+    description="test order",
+    items=[
+        OrderItemCreate(product_id="p-1", quantity=2, unit_price=5.0),
+        OrderItemCreate(product_id="p-2", quantity=1, unit_price=3.0),
+        OrderItemCreate(product_id="p-1", quantity=1, unit_price=5.0),
+    ],
+    payment_method="Credit Card",
+)
+
+
+def start(orchestrator) -> str:
+    orchestrator.start_order_saga(ORDER, token="token")
+    return orchestrator.command("publish_reduce_stock_command")["transaction_id"]
+
+
+def reply(transaction_id: str, status: str = "success", **data) -> dict:
+    return {"transaction_id": transaction_id, "status": status, "data": data}
+
+
+def step(saga_store, transaction_id: str) -> str:
+    return saga_store.get_saga_fields(transaction_id, "step")["step"]
+
+
+def test_saga_runs_to_completion(orchestrator, saga_store):
+    transaction_id = start(orchestrator)
+    assert step(saga_store, transaction_id) == SagaStep.STOCK_PENDING
+
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    assert orchestrator.command("publish_take_payment_command")["payment_data"].amount == 18.0
+
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+    assert orchestrator.command("publish_create_order_command")["order_data"].payment_id == "pay-1"
+
+    orchestrator.handle_create_order_event(reply(transaction_id, order_id="order-1"))
+    assert step(saga_store, transaction_id) == SagaStep.COMPLETED
+    assert orchestrator.published == [
+        "publish_reduce_stock_command",
+        "publish_take_payment_command",
+        "publish_create_order_command",
+        "publish_update_order_payment_id",
+        "publish_update_payment_order_id",
+    ]
+
+
+def test_stock_failure_rolls_back_every_requested_line(orchestrator, saga_store):
+    transaction_id = start(orchestrator)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id, status="error: out of stock"))
+
+    assert step(saga_store, transaction_id) == SagaStep.FAILED
+    assert orchestrator.command("publish_rollback_stock_command")["products"] == {"p-1": 3, "p-2": 1}
+
+
+def test_redelivered_reply_is_skipped(orchestrator, saga_store):
+    transaction_id = start(orchestrator)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+
+    assert orchestrator.published.count("publish_create_order_command") == 1
+    assert step(saga_store, transaction_id) == SagaStep.ORDER_PENDING
+
+
+def test_order_failure_refunds_the_payment(orchestrator, saga_store):
+    transaction_id = start(orchestrator)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+    orchestrator.handle_create_order_event(reply(transaction_id, status="error", order_id="order-1"))
+
+    assert step(saga_store, transaction_id) == SagaStep.FAILED
+    assert orchestrator.command("publish_rollback_payment_command")["payment_id"] == "pay-1"
+    assert orchestrator.command("publish_rollback_stock_command")["products"] == {"p-1": 3, "p-2": 1}
+
+
+def test_cancel_rolls_back_a_completed_saga_once(orchestrator, saga_store):
+    transaction_id = start(orchestrator)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-1"))
+    orchestrator.handle_create_order_event(reply(transaction_id, order_id="order-1"))
+
+    assert orchestrator.cancel_order_saga("order-1", token="token") is True
+    assert orchestrator.cancel_order_saga("order-1", token="token") is None
+    assert step(saga_store, transaction_id) == SagaStep.CANCELLED
+    assert orchestrator.published[-3:] == [
+        "publish_rollback_stock_command",
+        "publish_rollback_payment_command",
+        "publish_rollback_order_command",
+    ]
+    assert orchestrator.command("publish_rollback_payment_command")["payment_id"] == "pay-1"
+
+
+def test_payment_taken_after_the_timeout_is_refunded(orchestrator, saga_store):
+    transaction_id = start(orchestrator)
+    orchestrator.handle_stock_reduced_event(reply(transaction_id))
+    saga_store.transition(transaction_id, from_steps=SagaStep.PAYMENT_PENDING, to_step=SagaStep.TIMED_OUT)
+    orchestrator.hande_take_payment_event(reply(transaction_id, payment_id="pay-late"))
+
+    assert "publish_create_order_command" not in orchestrator.published
+    assert orchestrator.command("publish_rollback_payment_command") == {
+        "transaction_id": transaction_id, "payment_id": "pay-late"
+    }
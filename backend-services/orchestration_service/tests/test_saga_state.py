@@ -0,0 +1,35 @@
+from models.order import OrderItemCreate
+from models.saga_state import ProductSagaState
+
+
+def items(*lines) -> list:
+    return [OrderItemCreate(product_id=product_id, quantity=quantity, unit_price=1.0) for product_id, quantity in lines]
+
+
+def test_from_order_items_merges_repeated_products():
+    ledger = ProductSagaState.from_order_items("t-1", items(("p-1", 2), ("p-2", 1), ("p-1", 3)))
+
+    assert ledger.transaction_id == "t-1"
+    assert ledger.products == {"p-1": 5, "p-2": 1}
+    assert ledger.reserved_products == {}
+
+
+def test_reserve_everything_by_default():
+    ledger = ProductSagaState.from_order_items("t-1", items(("p-1", 2), ("p-2", 1)))
+    ledger.reserve()
+
+    assert ledger.reserved_products == {"p-1": 2, "p-2": 1}
+
+
+def test_reserve_some_products():
+    ledger = ProductSagaState.from_order_items("t-1", items(("p-1", 2), ("p-2", 1)))
+    ledger.reserve(["p-2"])
+
+    assert ledger.reserved_products == {"p-2": 1}
+    assert ledger.dict() == {"transaction_id": "t-1", "products": {"p-1": 2, "p-2": 1}, "reserved_products": {"p-2": 1}}
+
+
+def test_ledgers_do_not_share_their_dicts():
+    first, second = ProductSagaState("t-1"), ProductSagaState("t-2")
+    first.products["p-1"] = 1
+    assert second.products == {}
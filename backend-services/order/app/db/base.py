@@ -6,7 +6,9 @@ from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from core import config
 from core.config import SQLALCHEMY_DATABASE_URL
+from db.pool import TimedQueuePool
 
 def create_engine_with_retry(
     url: str,
@@ -36,8 +38,11 @@ def create_engine_with_retry(
 engine = create_engine_with_retry(
     SQLALCHEMY_DATABASE_URL,
     pool_pre_ping=True,       # auto-check stale connections
-    pool_size=10,             # optional, tune as you like
-    max_overflow=20,          # optional
+    # records checkout waits, see GET /db/pool
+    poolclass=TimedQueuePool,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
 )
 
 SessionLocal = sessionmaker(
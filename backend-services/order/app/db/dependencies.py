@@ -1,9 +1,56 @@
 """ Database dependencies """
-from db.base import SessionLocal
+import asyncio
+import time
+from contextlib import contextmanager
 
-def get_db():
+from fastapi import Depends
+
+from core import config
+from db.base import SessionLocal, engine
+
+# Requests holding a session at once. A session keeps its connection until it
+# is closed, after the response has been serialized, and FastAPI serializes
+# the response of a sync endpoint on a worker thread. If more sessions than
+# connections were open, every worker could end up waiting in checkout for a
+# connection that only a request waiting for a worker would return. Within
+# this limit, surplus requests wait here, on the event loop, without a thread.
+_sessions = asyncio.Semaphore(config.DB_REQUEST_SESSIONS)
+
+async def _session_slot():
+    """Hold one of the DB_REQUEST_SESSIONS slots for the request; waiting takes no thread."""
+    metrics = engine.pool.metrics
+    metrics.session_waiting()
+    started = time.perf_counter()
+    async with _sessions:
+        metrics.session_opened(time.perf_counter() - started)
+        yield
+
+def get_db(_slot: None = Depends(_session_slot)):
+    """
+    Session of one request, closed once the request is done. A sync generator,
+    so FastAPI opens and closes it on a worker thread: close() rolls back and
+    returns the connection over the blocking driver, which must not run on the
+    event loop. The slot is released after the session is closed.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def unit_of_work():
+    """
+    Session of one consumed message: committed once the handler is done, rolled
+    back if it raised, and closed either way, so nothing it loaded outlives the
+    message.
+    """
     db = SessionLocal()
     try:
         yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
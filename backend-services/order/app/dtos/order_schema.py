@@ -32,6 +32,7 @@ class OrderResponse(BaseModel):
     order_date: datetime
     delivery_date: Optional[datetime] = None
     payment_id: Optional[str] = None
+    transaction_id: Optional[str] = None
     items: List[OrderItemResponse]
 
     class Config:
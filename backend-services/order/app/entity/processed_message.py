@@ -0,0 +1,23 @@
+"""Processed message model."""
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, TIMESTAMP
+from db.base import Base
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ProcessedMessage(Base):
+    """
+    Id of a consumed message, inserted in the same transaction as its handler's
+    writes. A redelivery finds it even when the Redis dedup window was never
+    marked, e.g. after a crash between the commit and the mark.
+    """
+    __tablename__ = "processed_messages"
+
+    # a message_id, or "sha1:" and the digest of a body without one
+    message_id = Column(String(64), primary_key=True)
+    processed_at = Column(TIMESTAMP, nullable=False, index=True, default=utc_now)
+    # what the handler returned, e.g. the id of the new row, for a reply sent again on redelivery
+    result = Column(String(36), nullable=True)
@@ -1,10 +1,38 @@
+import atexit
 import logging
-from .sqlite_handler import SQLiteHandler
+import queue
+from core import config
+from .sqlite_handler import SQLiteHandler, DroppingQueueHandler, BatchingQueueListener
+from .context import LogContextFilter, log_context, bind_log_context, current_log_context, message_log_context
 
 logger = logging.getLogger("order_app")
 logger.setLevel(logging.INFO)
-if not logger.hasHandlers():
-    sqlite_handler = SQLiteHandler(db_path="app/logger/logs.sqlite3")
+# set up once: importing this module again picks up the handler installed the first time
+queue_handler = next((h for h in logger.handlers if isinstance(h, DroppingQueueHandler)), None)
+if queue_handler is None:
+    handler = SQLiteHandler()
     formatter = logging.Formatter('%(asctime)s %(levelname)s %(module)s %(message)s')
-    sqlite_handler.setFormatter(formatter)
-    logger.addHandler(sqlite_handler) 
\ No newline at end of file
+    handler.setFormatter(formatter)
+    # log calls only enqueue the record; the listener thread writes batches to SQLite
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    # the context is read on the logging thread, before the record is queued
+    queue_handler.addFilter(LogContextFilter())
+    queue_handler.listener = BatchingQueueListener(
+        queue_handler.queue, handler,
+        batch_size=config.LOG_BATCH_SIZE, max_latency=config.LOG_MAX_LATENCY_MS / 1000
+    )
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    logger.addHandler(queue_handler)
+log_listener = queue_handler.listener
+sqlite_handler = log_listener.handlers[0]
+
+
+def dropped_records() -> int:
+    """Log records lost to a full queue or a failed write since startup."""
+    return queue_handler.dropped + sqlite_handler.dropped
+
+
+def log_tail():
+    """Live feed of the rows written, for GET /logs/tail."""
+    return sqlite_handler.tail
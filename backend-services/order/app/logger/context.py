@@ -0,0 +1,62 @@
+"""
+Saga context of log records.
+
+log_context() tags every record logged inside it, on the current thread or
+asyncio task, with a transaction_id, order_id, payment_id and event, which the
+SQLite handler stores in indexed columns. Consumers open one per message from
+the message itself; publishers copy the current one into the log_context
+field of the messages they send, so the next service logs under it too.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+CONTEXT_FIELDS = ("transaction_id", "order_id", "payment_id", "event")
+
+_log_context: ContextVar[dict | None] = ContextVar("log_context", default=None)
+
+
+def current_log_context() -> dict:
+    return _log_context.get() or {}
+
+
+@contextmanager
+def log_context(**fields):
+    """Add fields to the context of the records logged inside the block; None values are left out."""
+    token = _log_context.set({
+        **current_log_context(), **{name: str(value) for name, value in fields.items() if value is not None}
+    })
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def bind_log_context(**fields):
+    """Add fields to the current context, until the enclosing log_context() block ends."""
+    _log_context.set({
+        **current_log_context(), **{name: str(value) for name, value in fields.items() if value is not None}
+    })
+
+
+def message_log_context(message: dict) -> dict:
+    """
+    Context of a RabbitMQ message: the sender's context from its log_context
+    envelope field, overridden by the ids and event the message itself carries.
+    """
+    context = dict(message.get("log_context") or {})
+    data = message.get("data") if isinstance(message.get("data"), dict) else {}
+    for field in ("transaction_id", "order_id", "payment_id"):
+        value = message.get(field) or data.get(field)
+        if value:
+            context[field] = str(value)
+    if message.get("event"):
+        context["event"] = message["event"]
+    return {name: value for name, value in context.items() if name in CONTEXT_FIELDS}
+
+
+class LogContextFilter(logging.Filter):
+    """Attaches the current context to each record, on the thread that logs it."""
+    def filter(self, record):
+        record.log_context = _log_context.get()
+        return True
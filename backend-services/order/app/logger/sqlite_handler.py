@@ -1,47 +1,176 @@
 import logging
+import logging.handlers
+import queue
 import sqlite3
 import threading
-import os
+import time
 from datetime import datetime
+from core import config
+from service_logs.partitions import ROLLUP_UPSERT, hourly_counts, open_partition, upgrade_partitions
+from service_logs.tail import LogTail
+
 
 class SQLiteHandler(logging.Handler):
-    def __init__(self, db_path='logs.sqlite3'):
+    """
+    Writes log records into the daily SQLite partition of their day (see
+    service_logs.partitions), over persistent WAL-mode connections, with the saga context
+    LogContextFilter attached to it.
+
+    Meant to run behind a BatchingQueueListener, which hands it whole batches
+    through emit_batch() so a batch is one transaction per day it covers.
+    Committed rows are also published to ``tail``, for GET /logs/tail.
+    """
+    def __init__(self, log_dir=config.LOG_DIR):
         super().__init__()
-        self.db_path = db_path
+        self.log_dir = log_dir
+        self.dropped = 0
         self._lock = threading.Lock()
-        self._ensure_table()
-
-    def _ensure_table(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    created TEXT,
-                    level TEXT,
-                    message TEXT,
-                    module TEXT,
-                    funcName TEXT,
-                    lineno INTEGER
-                )
-            ''')
-            conn.commit()
+        # open partitions by day
+        self._conns = {}
+        self.tail = LogTail()
+        upgrade_partitions(log_dir, "created")
+
+    def _connection(self, day: str) -> sqlite3.Connection:
+        conn = self._conns.get(day)
+        if conn is None:
+            conn = self._conns[day] = open_partition(self.log_dir, day, "created")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # keep today's and yesterday's partitions open, not every day ever written
+            for old_day in sorted(self._conns)[:-2]:
+                if old_day != day:
+                    self._conns.pop(old_day).close()
+        return conn
+
+    def _row(self, record) -> tuple:
+        # set by LogContextFilter on the logging thread
+        context = getattr(record, "log_context", None) or {}
+        return (
+            datetime.utcfromtimestamp(record.created).isoformat(),
+            record.levelname,
+            self.format(record),
+            record.module,
+            record.funcName,
+            record.lineno,
+            context.get("transaction_id"),
+            context.get("order_id"),
+            context.get("payment_id"),
+            context.get("event")
+        )
 
     def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        """Insert several records in one transaction."""
         try:
-            msg = self.format(record)
+            days = {}
+            for record in records:
+                row = self._row(record)
+                days.setdefault(row[0][:10], []).append(row)
             with self._lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute(
-                        'INSERT INTO logs (created, level, message, module, funcName, lineno) VALUES (?, ?, ?, ?, ?, ?)',
-                        (
-                            datetime.fromtimestamp(record.created).isoformat(),
-                            record.levelname,
-                            msg,
-                            record.module,
-                            record.funcName,
-                            record.lineno
+                for day, rows in days.items():
+                    conn = self._connection(day)
+                    with conn:
+                        conn.executemany(
+                            'INSERT INTO logs (created, level, message, module, funcName, lineno, '
+                            'transaction_id, order_id, payment_id, event) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            rows
                         )
-                    )
-                    conn.commit()
+                        conn.executemany(ROLLUP_UPSERT, hourly_counts(rows))
+                    self.tail.publish(rows)
         except Exception:
-            self.handleError(record) 
\ No newline at end of file
+            self.dropped += len(records)
+            self.handleError(records[0])
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+        super().close()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler over a bounded queue that drops, and counts, records it cannot enqueue."""
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener:
+    """
+    Drains a queue of log records on a thread of its own and hands them to its
+    handlers in batches: a batch is written once it holds batch_size records or
+    its first record has waited max_latency seconds, whichever comes first.
+    """
+    _sentinel = None
+
+    def __init__(self, queue, *handlers, batch_size=500, max_latency=0.2, respect_handler_level=True):
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.respect_handler_level = respect_handler_level
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write the records still queued and wait for the thread; safe to call again, e.g. from atexit."""
+        if self._thread is None:
+            return
+        # the queue is bounded; wait for room rather than failing on shutdown
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def handle_batch(self, records):
+        for handler in self.handlers:
+            if self.respect_handler_level:
+                accepted = [record for record in records if record.levelno >= handler.level]
+            else:
+                accepted = records
+            if not accepted:
+                continue
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(accepted)
+            else:
+                for record in accepted:
+                    handler.handle(record)
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Wait for a record, then collect more until the batch is full or due; True once stopped."""
+        record = self.queue.get()
+        if record is self._sentinel:
+            return [], True
+        batch = [record]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                record = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if record is self._sentinel:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self.handle_batch(batch)
+            for _ in range(len(batch) + stopping):
+                self.queue.task_done()
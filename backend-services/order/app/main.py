@@ -1,3 +1,4 @@
+import logging
 import threading
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,11 +7,14 @@ from db.dependencies import get_db
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 from db.base import engine, Base
-from entity import order, order_item
+from db.pool import pool_stats
+from entity import order, order_item, processed_message
 from api.endpoints import orders, logs
 from services.rabbitmq_consumer import get_consumer_service
 # Add these imports for logging
 from logger import logger
+from service_logs.partitions import PartitionMaintenance
+from service_logs.reader import read_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -21,12 +25,19 @@ async def lifespan(app: FastAPI):
     thread = threading.Thread(target=consumer.start_consuming, daemon=True)
     thread.start()
     logger.info("Consumer thread started.")
+    # Drops expired log partitions and compacts closed ones
+    log_maintenance = PartitionMaintenance(
+        config.LOG_DIR, lambda message, level: logger.log(logging.getLevelName(level), message)
+    )
+    log_maintenance.start()
     try:
         yield
     finally:
         # Shutdown: Signal the consumer to stop and wait for the thread to exit
         consumer.stop_consuming()
         thread.join(timeout=5)
+        log_maintenance.stop()
+        read_pool.close()
         logger.info("Consumer stopped.")
 
 app = FastAPI(lifespan=lifespan)
@@ -38,6 +49,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    # paging headers of GET /logs/
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Is-Estimate"],
 )
 
 app.include_router(orders.router)
@@ -45,4 +58,9 @@ app.include_router(logs.router)
 
 @app.get("/")
 async def root(db: Session = Depends(get_db)):
-    return {"message": "Hello World"}
\ No newline at end of file
+    return {"message": "Hello World"}
+
+@app.get("/db/pool")
+def db_pool():
+    """Checkout wait times and usage of the database connection pool."""
+    return pool_stats(engine)
\ No newline at end of file
@@ -1,5 +1,6 @@
 """Order business logic."""
 from datetime import datetime
+from fastapi import Depends
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from core import config
@@ -15,6 +16,15 @@ class OrderService:
     """
     def __init__(self, db: Session):
         self.db = db
+
+    def _save(self, commit: bool, order: Order | None = None):
+        """Commit and reload ``order``, or only flush when the caller commits."""
+        if not commit:
+            self.db.flush()
+            return
+        self.db.commit()
+        if order is not None:
+            self.db.refresh(order)
     
     def get_all_orders(self) -> list[Order]:
         """
@@ -104,12 +114,13 @@ class OrderService:
             logger.error(f"An unexpected error occurred: {str(e)}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
-    def create_order(self, order_data: dict, transaction_id: str) -> Order:
+    def create_order(self, order_data: dict, transaction_id: str, commit: bool = True) -> Order:
         """
         Create a new order with the provided order data.
         
         Args:
             order_data (Dict): Dictionary containing order details.
+            commit (bool): Commit the change; with False it is only flushed, for a caller that commits the unit of work.
             
         Returns:
             Order: The newly created order.
@@ -154,8 +165,7 @@ class OrderService:
             
             self.db.add(new_order)
             new_order.add_items(items_data)
-            self.db.commit()
-            self.db.refresh(new_order)
+            self._save(commit, new_order)
             return new_order
         
         except KeyError as e:
@@ -225,13 +235,14 @@ class OrderService:
             logger.error(f"An unexpected error occurred: {str(e)}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
-    def update_order_payment(self, order_id: str, payment_id: str) -> Order:
+    def update_order_payment(self, order_id: str, payment_id: str, commit: bool = True) -> Order:
         """
         Update the payment ID for an order.
 
         Args:
             order_id (str): The ID of the order to update.
             payment_id (str): The new payment ID to set for the order.
+            commit (bool): Commit the change; with False it is only flushed, for a caller that commits the unit of work.
 
         Returns:
             Order: The updated order.
@@ -253,8 +264,7 @@ class OrderService:
                 raise ValueError(f"No order found with ID: {order_id}")
             
             order.update_payment(payment_id)
-            self.db.commit()
-            self.db.refresh(order)
+            self._save(commit, order)
             
             return order
         
@@ -387,8 +397,8 @@ class OrderService:
             logger.error(f"An unexpected error occurred: {str(e)}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
     
-    def rollback_order(self, transaction_id: str) -> None:
-        """ change order status to canceled """
+    def rollback_order(self, transaction_id: str, commit: bool = True) -> None:
+        """ change order status to canceled; with commit=False the caller commits """
         if not transaction_id or not isinstance(transaction_id, str):
             raise ValueError("Invalid transaction ID.")
         
@@ -398,7 +408,7 @@ class OrderService:
                 raise ValueError(f"No order found with transaction ID: {transaction_id}")
             
             order.update_status("Canceled")
-            self.db.commit()
+            self._save(commit)
         
         except SQLAlchemyError as e:
             self.db.rollback()  
@@ -441,10 +451,9 @@ class OrderService:
             logger.error(f"An unexpected error occurred: {str(e)}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
-def get_order_service() -> OrderService:
+def get_order_service(db: Session = Depends(get_db)) -> OrderService:
     """
-    Create an instance of the OrderService class."
+    Create an instance of the OrderService class over the request's session,
+    which get_db closes once the request is done.
     """
-    db_gen = get_db()         # this is a generator
-    db: Session = next(db_gen)
     return OrderService(db)
@@ -9,17 +9,27 @@ Message structure:
 }
 
 """
-import pika
 import json
+import logging
+import time
+from datetime import timedelta
+import pika
+import redis
 from core import config
-from services.order_service import OrderService, get_order_service
+from services.order_service import OrderService
+from db.dependencies import unit_of_work
 from services.rabbitmq_publisher import RabbitMQPublisher, get_publisher_service
-from logger import logger
+from entity.processed_message import ProcessedMessage, utc_now
+from message_dedup.window import DedupWindow, message_key
+from logger import logger, log_context, bind_log_context, message_log_context
 
 class RabbitMQConsumer:
-    def __init__(self, queue: str, order_service: OrderService, publisher: RabbitMQPublisher):
-        self.order_service = order_service
+    # seconds between deletions of expired processed_messages rows
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, queue: str, publisher: RabbitMQPublisher, dedup: DedupWindow):
         self.publisher = publisher
+        self.dedup = dedup
         self.queue = queue
         credentials = pika.PlainCredentials(
             username=config.RABBITMQ_USER,
@@ -32,6 +42,7 @@ class RabbitMQConsumer:
         )
         self.connection = None
         self.channel = None
+        self._next_prune = 0.0
 
         # Mapping event types to handler methods
         self.event_handlers = {
@@ -40,6 +51,10 @@ class RabbitMQConsumer:
             "rollback_order": self.handle_rollback_order,
             # Add more event mappings as needed
         }
+        # Replies of the handlers, published once their writes are committed
+        self.replies = {
+            "create_order": self.reply_order_created,
+        }
 
     def connect(self):
         """Establish the connection and declare the queue."""
@@ -55,49 +70,98 @@ class RabbitMQConsumer:
         """Callback function to process incoming messages."""
         try:
             message = json.loads(body)
-            event_type = message.get("event")
+            # everything logged while handling the message is tagged with its saga
+            with log_context(**message_log_context(message)):
+                event_type = message.get("event")
+                message_id = message_key(message, body)
+                if self.dedup.seen(message_id):
+                    # redelivery of a message that was already handled: just ack it
+                    logger.warning(f"Skipping duplicate message {message_id} ({event_type})")
+                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    return
 
-            # Dispatch the message to the appropriate handler if it exists
-            if event_type in self.event_handlers:
-                self.event_handlers[event_type](message)
-            else:
-                logger.warning(f"Unhandled event type: {event_type}")
+                # Dispatch the message to the appropriate handler if it exists
+                if event_type in self.event_handlers:
+                    # each message is a unit of work with a session of its own
+                    with unit_of_work() as db:
+                        processed = db.get(ProcessedMessage, message_id)
+                        if processed is None:
+                            result = self.event_handlers[event_type](message, OrderService(db))
+                            # committed with the handler's writes: a redelivery after a crash
+                            # before the mark below finds it and skips the handler
+                            db.add(ProcessedMessage(message_id=message_id, result=result))
+                        else:
+                            logger.warning(f"Skipping message {message_id} ({event_type}), committed before")
+                            result = processed.result
+                    # only once the writes are committed; when publishing fails, the
+                    # redelivery finds the message committed and publishes the reply again
+                    if event_type in self.replies:
+                        self.replies[event_type](message, result)
+                else:
+                    logger.warning(f"Unhandled event type: {event_type}")
+                self.dedup.mark(message_id)
 
-            # Acknowledge the message after processing
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+                # Acknowledge the message after processing
+                ch.basic_ack(delivery_tag=method.delivery_tag)
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}")
-            # Optionally, you might choose to nack the message or log it for further inspection
+            # the handler's writes were rolled back, or committed with a reply still to
+            # publish: requeue the message for one more try, and drop it if that fails
+            # as well rather than redelivering it forever
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=not method.redelivered)
+        self.prune_processed_messages()
 
-    def handle_order_created(self, message):
-        """Handle order creation logic."""
+    def prune_processed_messages(self):
+        """Delete processed message ids older than PROCESSED_MESSAGES_RETENTION_DAYS, at most every PRUNE_INTERVAL."""
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.PRUNE_INTERVAL
+        cutoff = utc_now() - timedelta(days=config.PROCESSED_MESSAGES_RETENTION_DAYS)
+        try:
+            with unit_of_work() as db:
+                deleted = db.query(ProcessedMessage).filter(
+                    ProcessedMessage.processed_at < cutoff
+                ).delete(synchronize_session=False)
+            if deleted:
+                logger.info(f"Deleted {deleted} expired processed message ids")
+        except Exception as e:
+            logger.error(f"Error deleting expired processed message ids: {str(e)}")
+
+    def handle_order_created(self, message, order_service: OrderService):
+        """Handle order creation logic; returns the order ID, which reply_order_created publishes."""
         try:
             data = message.get("data", {})
             transection_id = message.get("transaction_id")
-            order = self.order_service.create_order(
-                order_data=data, transaction_id=transection_id
+            order = order_service.create_order(
+                order_data=data, transaction_id=transection_id, commit=False
             )
-            self.publisher.publish_order_created_response(order_id=order.id, transaction_id=transection_id)
+            bind_log_context(order_id=order.id)
+            return order.id
         except Exception as e:
             logger.error(f"Error handling order creation: {str(e)}")
             raise
 
-    def handle_update_order_payment_id(self, message):
+    def reply_order_created(self, message, order_id: str):
+        """Tell the orchestrator the order was created; called once it is committed."""
+        self.publisher.publish_order_created_response(order_id=order_id, transaction_id=message.get("transaction_id"))
+
+    def handle_update_order_payment_id(self, message, order_service: OrderService):
         """Handle order payment ID update logic."""
         try:
             data = message.get("data", {})
             order_id = data.get("order_id")
             payment_id = data.get("payment_id")
-            self.order_service.update_order_payment(order_id, payment_id)
+            order_service.update_order_payment(order_id, payment_id, commit=False)
         except Exception as e:
             logger.error(f"Error updating order payment ID: {str(e)}")
             raise
 
-    def handle_rollback_order(self, message):
+    def handle_rollback_order(self, message, order_service: OrderService):
         """Handle order rollback logic."""
         try:
             transaction_id = message.get("transaction_id")
-            self.order_service.rollback_order(transaction_id)
+            order_service.rollback_order(transaction_id, commit=False)
         except Exception as e:
             logger.error(f"Error rolling back order: {str(e)}")
             raise
@@ -130,6 +194,9 @@ class RabbitMQConsumer:
 def get_consumer_service(
         queue: str,
         ) -> RabbitMQConsumer:
-    order_service = get_order_service()
     publisher = get_publisher_service()
-    return RabbitMQConsumer(queue, order_service, publisher)
\ No newline at end of file
+    dedup = DedupWindow(
+        queue, redis.Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB),
+        lambda message, level: logger.log(logging.getLevelName(level), message)
+    )
+    return RabbitMQConsumer(queue, publisher, dedup)
\ No newline at end of file
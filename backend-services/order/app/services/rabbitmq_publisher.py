@@ -1,8 +1,9 @@
 """ Rabbitmq Publisher Service """
 import pika
 import json
+import uuid
 from core import config
-from logger import logger
+from logger import logger, current_log_context
 
 class RabbitMQPublisher:
     def __init__(self):
@@ -29,6 +30,12 @@ class RabbitMQPublisher:
 
     def publish_message(self, message: dict, queue: str):
         """Publish a message to the specified RabbitMQ queue."""
+        # every message gets an id consumers deduplicate redeliveries by
+        message = {"message_id": str(uuid.uuid4()), **message}
+        # and carries the sender's log context, which the consumer logs under
+        context = current_log_context()
+        if context:
+            message.setdefault("log_context", context)
         if not self.connection or self.connection.is_closed:
             self.connect()
 
@@ -0,0 +1,186 @@
+"""
+Soak benchmark: memory of the order or payment RabbitMQ consumer over many messages.
+
+Feeds --messages saga commands straight to RabbitMQConsumer.callback, with one
+in --failures failing in its handler (an unknown order or payment), and prints
+the peak RSS, the number of live Python objects, the size of the session's
+identity map and the throughput at every --every messages. --session message
+runs the consumer as it is now, with one session per message; --session shared
+gives every message the one session the consumer used to keep for the life of
+the process.
+
+The database is DATABASE_URL, or a SQLite file in a temporary directory when
+it is not set. Nothing is published and message ids are not remembered in Redis.
+
+Usage (from the backend-services directory):
+    python order/benchmarks/bench_consumer_sessions.py --service order --session message --messages 1000000
+    python order/benchmarks/bench_consumer_sessions.py --service order --session shared --messages 1000000
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=("order", "payment"), default="order")
+    parser.add_argument("--session", choices=("message", "shared"), default="message")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--every", type=int, default=10000)
+    parser.add_argument("--failures", type=int, default=100)
+    return parser.parse_args()
+
+
+args = parse_args()
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", args.service, "app")
+sys.path.insert(0, APP_DIR)
+# the logger writes its daily partitions under LOG_DIR, relative to the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_consumer_"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.getcwd()}/bench.db")
+
+import json  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from db.base import Base, SessionLocal, engine  # noqa: E402
+from services import rabbitmq_consumer  # noqa: E402
+
+if args.service == "order":
+    from entity import order, order_item  # noqa: E402, F401
+else:
+    from entity import payment  # noqa: E402, F401
+
+
+class Publisher:
+    """Stands in for RabbitMQPublisher; remembers the id the handler created."""
+    def __init__(self):
+        self.created = None
+
+    def publish_order_created_response(self, order_id, transaction_id):
+        self.created = order_id
+
+    def publish_payment_message(self, payment_id, transaction_id):
+        self.created = payment_id
+
+
+class Dedup:
+    """Stands in for DedupWindow, whose remembered ids would grow with the run."""
+    def seen(self, message_id):
+        return False
+
+    def mark(self, message_id):
+        pass
+
+
+class Channel:
+    def basic_ack(self, delivery_tag):
+        pass
+
+    def basic_nack(self, delivery_tag, requeue):
+        pass
+
+
+def order_saga(transaction_id: str, n: int):
+    """create_order, then update_order_payment_id for the order it created, every 10th rolled back."""
+    yield {"event": "create_order", "transaction_id": transaction_id, "data": {
+        "user_email": f"user{n % 1000}@example.com", "vendor_email": "vendor@example.com",
+        "delivery_address": "1 Bench Street",
+        "items": [{"product_id": uuid.uuid4().hex[:24], "quantity": 2, "unit_price": 4.5}],
+    }}
+    yield lambda created: {"event": "update_order_payment_id", "transaction_id": transaction_id,
+                           "data": {"order_id": created, "payment_id": str(uuid.uuid4())}}
+    if n % 10 == 0:
+        yield {"event": "rollback_order", "transaction_id": transaction_id}
+
+
+def payment_saga(transaction_id: str, n: int):
+    """take_payment, then update_payment_order_id for the payment it created, every 10th rolled back."""
+    yield {"event": "take_payment", "transaction_id": transaction_id, "data": {
+        "user_email": f"user{n % 1000}@example.com", "order_id": None,
+        "amount": 9.0, "payment_method": "Credit Card",
+    }}
+    yield lambda created: {"event": "update_payment_order_id", "transaction_id": transaction_id,
+                           "data": {"order_id": str(uuid.uuid4()), "payment_id": created}}
+    if n % 10 == 0:
+        yield lambda created: {"event": "rollback_payment", "transaction_id": transaction_id,
+                               "data": {"payment_id": created}}
+
+
+def failing_message() -> dict:
+    if args.service == "order":
+        return {"event": "update_order_payment_id", "data": {"order_id": str(uuid.uuid4()), "payment_id": "p"}}
+    return {"event": "update_payment_order_id", "data": {"order_id": "o", "payment_id": str(uuid.uuid4())}}
+
+
+def messages(count: int):
+    saga = order_saga if args.service == "order" else payment_saga
+    sent = n = 0
+    while sent < count:
+        for message in saga(str(uuid.uuid4()), n):
+            if sent % args.failures == args.failures - 1:
+                yield failing_message()
+                sent += 1
+            yield message
+            sent += 1
+        n += 1
+
+
+def soak(session=None):
+    """Run the consumer; with a session, every message shares it, as the consumer used to."""
+    publisher = Publisher()
+    consumer = rabbitmq_consumer.RabbitMQConsumer("bench", publisher, Dedup())
+    if session is not None:
+        @contextmanager
+        def shared_session():
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+        rabbitmq_consumer.unit_of_work = shared_session
+
+    channel, method = Channel(), SimpleNamespace(delivery_tag=1, redelivered=False)
+    started = last = time.perf_counter()
+    for sent, message in enumerate(messages(args.messages), start=1):
+        if callable(message):
+            message = message(publisher.created)
+        message["message_id"] = str(uuid.uuid4())
+        consumer.callback(channel, method, None, json.dumps(message).encode())
+        if sent % args.every == 0:
+            now = time.perf_counter()
+            # ru_maxrss is in KiB on Linux
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            identity_map = len(session.identity_map) if session is not None else 0
+            print(f"{sent:>9} messages  peak RSS {rss:7.1f} MiB  objects {len(gc.get_objects()):>8}  "
+                  f"identity map {identity_map:>7}  {args.every / (now - last):6.0f} msg/s")
+            last = now
+    print(f"{args.messages / (time.perf_counter() - started):.0f} msg/s overall, "
+          f"{engine.pool.checkedout()} connections checked out")
+
+
+def main():
+    if engine.url.get_backend_name() == "sqlite":
+        # time the consumer rather than SQLite syncing every commit to disk
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA synchronous=OFF"))
+        engine.dispose()
+    Base.metadata.create_all(bind=engine)
+    print(f"service={args.service} session={args.session} messages={args.messages} "
+          f"database={engine.url.get_backend_name()}")
+    if args.session == "message":
+        soak()
+    else:
+        session = SessionLocal()
+        try:
+            soak(session)
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from db import dependencies
+from db.base import SessionLocal, engine
+
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Records, for every request session, whether it was opened and closed on the event loop."""
+    calls = []
+
+    def session_local():
+        calls.append(("open", on_event_loop()))
+        session = SessionLocal()
+        close = session.close
+
+        def recording_close():
+            calls.append(("close", on_event_loop()))
+            close()
+        session.close = recording_close
+        return session
+    monkeypatch.setattr(dependencies, "SessionLocal", session_local)
+    return calls
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.state.active = app.state.max_active = 0
+    lock = threading.Lock()
+
+    @app.get("/")
+    def read(db: Session = Depends(dependencies.get_db)):
+        with lock:
+            app.state.active += 1
+            app.state.max_active = max(app.state.max_active, app.state.active)
+        time.sleep(0.02)
+        value = db.execute(text("SELECT 1")).scalar()
+        with lock:
+            app.state.active -= 1
+        return value
+    return app
+
+
+def get_all(app: FastAPI, count: int) -> list[httpx.Response]:
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/") for _ in range(count)))
+    return asyncio.run(run())
+
+
+def test_request_session_is_opened_and_closed_off_the_event_loop(app, sessions):
+    responses = get_all(app, 1)
+
+    assert responses[0].json() == 1
+    assert sessions == [("open", False), ("close", False)]
+    assert engine.pool.checkedout() == 0
+
+
+def test_request_sessions_are_bounded(app, sessions, monkeypatch):
+    monkeypatch.setattr(dependencies, "_sessions", asyncio.Semaphore(2))
+
+    responses = get_all(app, 10)
+
+    assert [response.status_code for response in responses] == [200] * 10
+    assert app.state.max_active == 2
+    assert len(sessions) == 20
@@ -0,0 +1,145 @@
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+import fakeredis
+import pytest
+from db.base import SessionLocal
+from entity.order import Order
+from entity.order_item import OrderItem
+from entity.processed_message import ProcessedMessage, utc_now
+from message_dedup.window import DedupWindow
+from services.rabbitmq_consumer import RabbitMQConsumer
+
+
+class Publisher:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.published = []
+        # whether the row replied about was visible to another session when the reply went out
+        self.committed = []
+
+    def publish_order_created_response(self, order_id, transaction_id):
+        with SessionLocal() as session:
+            self.committed.append(session.get(Order, order_id) is not None)
+        if self.fail:
+            raise ConnectionError("RabbitMQ is down")
+        self.published.append((order_id, transaction_id))
+
+
+class Channel:
+    def __init__(self):
+        self.acked = []
+        self.nacked = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacked.append((delivery_tag, requeue))
+
+
+def deliver(consumer: RabbitMQConsumer, message: dict, redelivered: bool = False) -> Channel:
+    channel = Channel()
+    method = SimpleNamespace(delivery_tag=1, redelivered=redelivered)
+    consumer.callback(channel, method, None, json.dumps(message).encode())
+    return channel
+
+
+def create_order(message_id: str = "m-1") -> dict:
+    return {"event": "create_order", "message_id": message_id, "transaction_id": "t-1", "data": {
+        "user_email": "customer@example.com", "vendor_email": "vendor@example.com",
+        "delivery_address": "1 Test Street",
+        "items": [
+            {"product_id": "p-1", "quantity": 2, "unit_price": 4.5},
+            {"product_id": "p-2", "quantity": 1, "unit_price": 1.0},
+        ],
+    }}
+
+
+def discard(message: str, level: str):
+    pass
+
+
+@pytest.fixture
+def publisher():
+    return Publisher()
+
+
+@pytest.fixture
+def consumer(db, publisher):
+    return RabbitMQConsumer("orders_queue", publisher, DedupWindow("orders_queue", fakeredis.FakeRedis(), discard))
+
+
+def test_order_and_items_are_committed_together(consumer, publisher, db):
+    channel = deliver(consumer, create_order())
+
+    assert channel.acked == [1] and channel.nacked == []
+    order = db.query(Order).one()
+    assert (order.total_price, order.transaction_id) == (10.0, "t-1")
+    assert db.query(OrderItem).count() == 2
+    assert publisher.published == [(order.id, "t-1")]
+
+
+def test_failed_handler_leaves_no_order_or_items(consumer, publisher, db):
+    message = create_order()
+    del message["data"]["items"][1]["unit_price"]
+
+    assert deliver(consumer, message).nacked == [(1, True)]
+    assert deliver(consumer, message, redelivered=True).nacked == [(1, False)]
+    assert db.query(Order).count() == 0
+    assert db.query(OrderItem).count() == 0
+    assert publisher.published == []
+    assert not consumer.dedup.seen("m-1")
+
+
+def test_reply_is_published_once_the_order_is_committed(consumer, publisher, db):
+    deliver(consumer, create_order())
+
+    assert publisher.committed == [True]
+
+
+def test_failed_reply_is_published_again_on_redelivery(consumer, publisher, db):
+    publisher.fail = True
+    assert deliver(consumer, create_order()).nacked == [(1, True)]
+    order = db.query(Order).one()
+    publisher.fail = False
+
+    assert deliver(consumer, create_order(), redelivered=True).acked == [1]
+    assert deliver(consumer, create_order(), redelivered=True).acked == [1]
+    assert db.query(Order).count() == 1
+    assert publisher.published == [(order.id, "t-1")]
+
+
+def test_rollback_order_is_committed(consumer, db):
+    deliver(consumer, create_order())
+    channel = deliver(consumer, {"event": "rollback_order", "message_id": "m-2", "transaction_id": "t-1"})
+
+    assert channel.acked == [1]
+    assert db.query(Order).one().status == "Canceled"
+
+
+def test_payment_id_of_an_unknown_order_is_nacked(consumer):
+    message = {"event": "update_order_payment_id", "data": {"order_id": "unknown", "payment_id": "pay-1"}}
+    assert deliver(consumer, message).nacked == [(1, True)]
+
+
+def test_redelivery_after_a_lost_mark_does_not_run_the_handler_again(consumer, db):
+    deliver(consumer, create_order())
+    # as after a crash between the commit and the mark in Redis
+    consumer.dedup = DedupWindow("orders_queue", fakeredis.FakeRedis(), discard)
+
+    assert deliver(consumer, create_order(), redelivered=True).acked == [1]
+    assert db.query(Order).count() == 1
+    assert consumer.dedup.seen("m-1")
+
+
+def test_expired_processed_message_ids_are_deleted(consumer, db):
+    db.add_all([
+        ProcessedMessage(message_id="old", processed_at=utc_now() - timedelta(days=8)),
+        ProcessedMessage(message_id="recent", processed_at=utc_now() - timedelta(days=6)),
+    ])
+    db.commit()
+
+    consumer.prune_processed_messages()
+
+    assert [row.message_id for row in db.query(ProcessedMessage)] == ["recent"]
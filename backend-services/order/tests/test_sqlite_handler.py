@@ -0,0 +1,82 @@
+import importlib
+import logging
+import queue
+import sqlite3
+import sys
+from service_logs.partitions import list_partitions
+from logger.sqlite_handler import BatchingQueueListener, DroppingQueueHandler, SQLiteHandler
+
+
+def record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("tests", logging.INFO, __file__, 1, message, None, None)
+
+
+class BatchRecorder(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def emit_batch(self, records):
+        self.batches.append([logged.getMessage() for logged in records])
+
+
+def test_full_queue_drops_and_counts_new_records():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(record(f"message {i}"))
+
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ["message 0", "message 1"]
+
+
+def test_listener_hands_over_batches():
+    records = queue.Queue(maxsize=10)
+    for i in range(5):
+        records.put(record(f"message {i}"))
+    recorder = BatchRecorder()
+    listener = BatchingQueueListener(records, recorder, batch_size=2, max_latency=0.05)
+    listener.start()
+    listener.stop()
+
+    assert recorder.batches == [["message 0", "message 1"], ["message 2", "message 3"], ["message 4"]]
+
+
+def test_listener_stops_on_a_full_queue():
+    records = queue.Queue(maxsize=1)
+    recorder = BatchRecorder()
+    listener = BatchingQueueListener(records, recorder, batch_size=2, max_latency=0.05)
+    listener.start()
+    records.put(record("message 0"))
+    # the sentinel waits for the listener to make room instead of raising queue.Full
+    listener.stop()
+
+    assert sum(recorder.batches, []) == ["message 0"]
+
+
+def test_failed_write_counts_the_batch_as_dropped(tmp_path, monkeypatch):
+    # handleError reports to stderr instead of raising
+    monkeypatch.setattr(logging, "raiseExceptions", False)
+    handler = SQLiteHandler(log_dir=str(tmp_path))
+    handler.emit_batch([record("written")])
+    path = list_partitions(str(tmp_path))[0][1]
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE logs_rollup")
+    try:
+        handler.emit_batch([record("lost"), record("lost too")])
+    finally:
+        handler.close()
+
+    assert handler.dropped == 2
+
+
+def test_fresh_import_picks_up_the_installed_handler(monkeypatch):
+    import logger as service_logger
+    installed = service_logger.queue_handler
+    # a second copy of the module, as a reload or a test harness would import it
+    monkeypatch.delitem(sys.modules, "logger")
+    reimported = importlib.import_module("logger")
+
+    assert reimported is not service_logger
+    assert [h for h in reimported.logger.handlers if isinstance(h, DroppingQueueHandler)] == [installed]
+    assert reimported.dropped_records() == installed.dropped + installed.listener.handlers[0].dropped
+    assert reimported.log_tail() is installed.listener.handlers[0].tail
@@ -6,10 +6,21 @@ DATABASE_PASSWORD = os.getenv("DATABASE_PASSWORD",default="root")
 DATABASE_HOST = os.getenv("DATABASE_HOST",default="localhost")  # 'localhost' works if you're connecting from the host
 DATABASE_NAME = os.getenv("DATABASE_NAME",default="payments_db")
 
-SQLALCHEMY_DATABASE_URL = (
-    f"mysql+pymysql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}/{DATABASE_NAME}"
+# DATABASE_URL, when set, replaces the MySQL URL built from the settings above
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    default=f"mysql+pymysql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}/{DATABASE_NAME}"
 )
 
+# Connections kept in the pool, opened beyond it under load, and seconds a request
+# waits for one before failing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", default=10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", default=20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", default=30))
+# Requests that hold a database session at once; the others wait for one without
+# taking a worker thread. One connection is left for the RabbitMQ consumer.
+DB_REQUEST_SESSIONS = int(os.getenv("DB_REQUEST_SESSIONS", default=DB_POOL_SIZE + DB_MAX_OVERFLOW - 1))
+
 AUTHERIZATION_SERVER_URL = os.getenv("AUTHERIZATION_SERVER_URL",default="http://localhost")
 AUTHORIZATION_SERVER_PORT = os.getenv("AUTHORIZATION_SERVER_PORT",default=8086)
 AUTHORIZATION_SERVER_CUSTOMER_ENDPOINT = "/Authentication/customer-policy"
@@ -25,3 +36,21 @@ RABBITMQ_PRODUCTS_QUEUE = "products_queue"
 RABBITMQ_ORDERS_QUEUE = "orders_queue"
 RABBITMQ_PAYMENT_QUEUE = "payment_queue"
 RABBITMQ_ORCHESTRATION_QUEUE = "orchestration_queue"
+
+
+REDIS_HOST = os.getenv("REDIS_HOST", default="localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", default=6379))
+REDIS_DB = int(os.getenv("REDIS_DB", default=0))
+# How long processed message ids are remembered (DEDUP_WINDOW_TTL, DEDUP_LOCAL_SIZE)
+# is read from the environment by message_dedup.config, the same in every service
+# Days the ids of consumed messages are kept in the processed_messages table
+PROCESSED_MESSAGES_RETENTION_DAYS = int(os.getenv("PROCESSED_MESSAGES_RETENTION_DAYS", default=7))
+
+# Log records go through a bounded queue to a thread that writes them to SQLite in batches
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", default=10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", default=500))
+LOG_MAX_LATENCY_MS = int(os.getenv("LOG_MAX_LATENCY_MS", default=200))
+# Logs are written to one SQLite file per day in this directory
+LOG_DIR = os.getenv("LOG_DIR", default="app/logger/logs")
+# Retention, query, export and tail settings of the logs (LOG_RETENTION_DAYS, LOG_QUERY_TIMEOUT,
+# LOG_TAIL_KEEPALIVE, ...) are read from the environment by service_logs.config, the same in every service
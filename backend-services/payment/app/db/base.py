@@ -4,7 +4,9 @@ from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from core import config
 from core.config import SQLALCHEMY_DATABASE_URL
+from db.pool import TimedQueuePool
 from logger import logger  # Import your custom logger
 
 def create_engine_with_retry(
@@ -35,8 +37,11 @@ def create_engine_with_retry(
 engine = create_engine_with_retry(
     SQLALCHEMY_DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    # records checkout waits, see GET /db/pool
+    poolclass=TimedQueuePool,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
 )
 
 SessionLocal = sessionmaker(
@@ -0,0 +1,123 @@
+""" Database connection pool with wait metrics """
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class WaitStats:
+    """Count, average, maximum and recent percentiles of a wait; recent holds the last waits."""
+    def __init__(self, recent: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=recent)
+
+    def add(self, waited: float):
+        self.count += 1
+        self.total += waited
+        self.max = max(self.max, waited)
+        self._recent.append(waited)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self._recent)
+        return {
+            "avg": self.total / self.count * 1000 if self.count else 0.0,
+            "max": self.max * 1000,
+            "p50": recent[int(0.5 * (len(recent) - 1))] * 1000 if recent else 0.0,
+            "p99": recent[int(0.99 * (len(recent) - 1))] * 1000 if recent else 0.0,
+        }
+
+
+class PoolMetrics:
+    """
+    How long requests waited for a session (see db.dependencies.get_db) and
+    checkouts for a connection, how many checkouts gave up after pool_timeout,
+    and how many connections were in use at once.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = WaitStats()
+        self.sessions_waiting = 0
+        self.checkouts = WaitStats()
+        self.timeouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+
+    def session_waiting(self):
+        with self._lock:
+            self.sessions_waiting += 1
+
+    def session_opened(self, waited: float):
+        with self._lock:
+            self.sessions_waiting -= 1
+            self.sessions.add(waited)
+
+    def checked_out(self, waited: float):
+        with self._lock:
+            self.checkouts.add(waited)
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": self.sessions.count,
+                "sessions_waiting": self.sessions_waiting,
+                "session_wait_ms": self.sessions.snapshot(),
+                "checkouts": self.checkouts.count,
+                "checkout_wait_ms": self.checkouts.snapshot(),
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records its checkouts in metrics."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self._timing = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get calls itself again while it waits; time the outermost call only
+        if getattr(self._timing, "active", False):
+            return super()._do_get()
+        self._timing.active = True
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timed_out()
+            raise
+        finally:
+            self._timing.active = False
+        self.metrics.checked_out(time.perf_counter() - started)
+        return record
+
+    def _do_return_conn(self, record):
+        self.metrics.checked_in()
+        super()._do_return_conn(record)
+
+
+def pool_stats(engine) -> dict:
+    """Metrics and current state of the engine's pool."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        # connections opened beyond size; negative while the pool is not full yet
+        "overflow": pool.overflow(),
+        **pool.metrics.snapshot(),
+    }
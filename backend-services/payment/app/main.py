@@ -1,3 +1,4 @@
+import logging
 import threading
 from core import config
 from fastapi import FastAPI, Depends
@@ -6,9 +7,13 @@ from db.dependencies import get_db
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 from db.base import engine, Base
-from entity import payment
+from db.pool import pool_stats
+from entity import payment, processed_message
 from api.endpoints import payments, logs
 from services.rabbitmq_consumer import get_consumer_service
+from service_logs.partitions import PartitionMaintenance
+from service_logs.reader import read_pool
+from logger import logger
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,12 +24,19 @@ async def lifespan(app: FastAPI):
     thread = threading.Thread(target=consumer.start_consuming, daemon=True)
     thread.start()
     print("Consumer thread started.")
+    # Drops expired log partitions and compacts closed ones
+    log_maintenance = PartitionMaintenance(
+        config.LOG_DIR, lambda message, level: logger.log(logging.getLevelName(level), message)
+    )
+    log_maintenance.start()
     try:
         yield
     finally:
         # Shutdown: Signal the consumer to stop and wait for the thread to exit
         consumer.stop_consuming()
         thread.join(timeout=5)
+        log_maintenance.stop()
+        read_pool.close()
         print("Consumer stopped.")
 
 
@@ -37,10 +49,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    # paging headers of GET /logs/
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Is-Estimate"],
 )
 
 app.include_router(payments.router)
 app.include_router(logs.router)
 @app.get("/")
 async def root(db: Session = Depends(get_db)):
-    return {"message": "Hello World"}
\ No newline at end of file
+    return {"message": "Hello World"}
+
+@app.get("/db/pool")
+def db_pool():
+    """Checkout wait times and usage of the database connection pool."""
+    return pool_stats(engine)
\ No newline at end of file
@@ -1,8 +1,10 @@
 """Payment bisuness logic."""
 from fastapi import Depends
+from sqlalchemy import insert
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from db.dependencies import get_db
+from entity import generate_uuid
 from entity.payment import Payment
 from logger import logger
 
@@ -13,6 +15,13 @@ class PaymentService:
     def __init__(self, db: Session):
         self.db = db
 
+    def _save(self, commit: bool):
+        """Commit, or only flush when the caller commits."""
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
+
     def get_all_payments(self) -> list[Payment]:
         """
         Retrieve all payments from the database.
@@ -177,6 +186,78 @@ class PaymentService:
             logger.error(f"Unexpected error: {e}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
+    def take_payment(self, payment_data: dict, transaction_id: str, commit: bool = True) -> str:
+        """
+        Record a successful payment of a saga: one INSERT of the payment with its
+        final status and transaction ID, and one commit. The ID is generated
+        here, so the row is not read back.
+
+        Args:
+            payment_data (Dict): Dictionary containing payment details.
+            transaction_id (str): The transaction ID of the saga.
+            commit (bool): Commit the change; with False it is only flushed, for a caller that commits the unit of work.
+
+        Returns:
+            str: The ID of the new payment.
+
+        Raises:
+            ValueError: If the input data is invalid.
+            KeyError: If required keys are missing.
+            SQLAlchemyError: If there is a database error.
+        """
+        logger.info(f"Taking payment | transaction_id: {transaction_id}, data: {payment_data}")
+        try:
+            required_fields = ["user_email", "order_id", "amount", "payment_method"]
+            if not all(field in payment_data for field in required_fields):
+                logger.warning(f"Missing required fields: {required_fields}")
+                raise KeyError(f"Payment data must contain the following fields: {required_fields}")
+
+            if not transaction_id or not isinstance(transaction_id, str):
+                raise ValueError("Invalid transaction ID.")
+
+            payment_id = generate_uuid()
+            self.db.execute(
+                insert(Payment).values(
+                    id=payment_id,
+                    user_email=payment_data["user_email"],
+                    order_id=payment_data["order_id"],
+                    amount=payment_data["amount"],
+                    payment_method=payment_data["payment_method"],
+                    payment_status="Success",
+                    transaction_id=transaction_id,
+                )
+            )
+            if commit:
+                self.db.commit()
+
+            logger.info(f"Payment {payment_id} taken for transaction {transaction_id}")
+            return payment_id
+
+        except KeyError as e:
+            self.db.rollback()
+            logger.warning(f"Missing required field: {e}")
+            raise KeyError(f"Missing required field: {str(e)}")
+
+        except ValueError as e:
+            self.db.rollback()
+            logger.warning(f"Invalid data: {e}")
+            raise ValueError(f"Invalid data: {str(e)}")
+
+        except IntegrityError as e:
+            self.db.rollback()
+            logger.error(f"Database integrity error: {e}")
+            raise ValueError(f"Database integrity error: {str(e)}")
+
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Database error: {e}")
+            raise SQLAlchemyError(f"Database error: {str(e)}")
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Unexpected error: {e}")
+            raise Exception(f"An unexpected error occurred: {str(e)}")
+
     def update_payment_status(self, payment_id: str, new_status: str) -> Payment:
         """
         Update the status of an payment.
@@ -265,12 +346,13 @@ class PaymentService:
             logger.error(f"Unexpected error while deleting payment: {e}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
-    def update_order_id(self, order_id: str, payment_id: str) -> None:
+    def update_order_id(self, order_id: str, payment_id: str, commit: bool = True) -> None:
         """
         Update the order ID of a payment.
 
         Args:
             order_id (str): The new order ID to set for the payment.
+            commit (bool): Commit the change; with False it is only flushed, for a caller that commits the unit of work.
 
         Returns:
             None
@@ -292,7 +374,7 @@ class PaymentService:
                 raise ValueError(f"No payment found with payment_id ID: {payment_id}")
 
             payment.update_order_id(order_id)
-            self.db.commit()
+            self._save(commit)
 
             logger.info(f"Order ID for payment {payment_id} updated to {order_id}")
 
@@ -347,12 +429,13 @@ class PaymentService:
             logger.error(f"Unexpected error while updating transaction ID: {e}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
-    def rollback_payment(self, transaction_id: str, payment_id: str) -> None:
+    def rollback_payment(self, transaction_id: str, payment_id: str, commit: bool = True) -> None:
         """
         Rollback a payment by its transaction ID.
 
         Args:
             transaction_id (str): The transaction ID of the payment to rollback.
+            commit (bool): Commit the change; with False it is only flushed, for a caller that commits the unit of work.
 
         Returns:
             None
@@ -374,7 +457,7 @@ class PaymentService:
                 raise ValueError(f"No payment found with transaction ID: {transaction_id}")
 
             payment.update_status("Cancelled")
-            self.db.commit()
+            self._save(commit)
 
             logger.info(f"Payment {payment.id} rolled back successfully")
 
@@ -388,16 +471,15 @@ class PaymentService:
             logger.error(f"Unexpected error while rolling back payment: {e}")
             raise Exception(f"An unexpected error occurred: {str(e)}")
 
-def get_payment_service() -> PaymentService:
+def get_payment_service(db: Session = Depends(get_db)) -> PaymentService:
     """
     Return an instance of the PaymentService class.
 
     Args:
-        db (Session): Database session.
+        db (Session): Database session of the request, closed by get_db once
+            the request is done.
 
     Returns:
         PaymentService: An instance of the PaymentService class.
     """
-    db_gen = get_db()         # this is a generator
-    db: Session = next(db_gen)
     return PaymentService(db)
@@ -9,18 +9,28 @@ Message structure:
 }
 
 """
-import pika
 import json
+import logging
+import time
+from datetime import timedelta
+import pika
+import redis
 from core import config
-from services.payment_service import PaymentService, get_payment_service
+from services.payment_service import PaymentService
+from db.dependencies import unit_of_work
 from services.rabbitmq_publisher import RabbitMQPublisher, get_publisher_service
+from entity.processed_message import ProcessedMessage, utc_now
+from message_dedup.window import DedupWindow, message_key
 from fastapi import Depends
-from logger import logger
+from logger import logger, log_context, bind_log_context, message_log_context
 
 class RabbitMQConsumer:
-    def __init__(self, queue: str, payment_service: PaymentService, publisher: RabbitMQPublisher):
-        self.payment_service = payment_service
+    # seconds between deletions of expired processed_messages rows
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, queue: str, publisher: RabbitMQPublisher, dedup: DedupWindow):
         self.publisher = publisher
+        self.dedup = dedup
         self.queue = queue
         credentials = pika.PlainCredentials(
             username=config.RABBITMQ_USER,
@@ -33,6 +43,7 @@ class RabbitMQConsumer:
         )
         self.connection = None
         self.channel = None
+        self._next_prune = 0.0
 
         # Mapping event types to handler methods
         self.event_handlers = {
@@ -40,6 +51,10 @@ class RabbitMQConsumer:
             "update_payment_order_id": self.handle_order_id_updated,
             "rollback_payment": self.handle_rollback_payment,
         }
+        # Replies of the handlers, published once their writes are committed
+        self.replies = {
+            "take_payment": self.reply_payment_taken,
+        }
 
     def connect(self):
         """Establish the connection and declare the queue."""
@@ -53,47 +68,89 @@ class RabbitMQConsumer:
         """Callback function to process incoming messages."""
         try:
             message = json.loads(body)
-            logger.info(f"Received message: {message}")
-            event_type = message.get("event")
-
-            # Dispatch the message to the appropriate handler if it exists
-            if event_type in self.event_handlers:
-                logger.info(f"Dispatching event '{event_type}' to handler")
-                self.event_handlers[event_type](message)
-            else:
-                logger.warning(f"Unhandled event type: {event_type}")
-                print(f"Unhandled event type: {event_type}")
-
-            # Acknowledge the message after processing
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.info("Message acknowledged")
+            # everything logged while handling the message is tagged with its saga
+            with log_context(**message_log_context(message)):
+                logger.info(f"Received message: {message}")
+                event_type = message.get("event")
+                message_id = message_key(message, body)
+                if self.dedup.seen(message_id):
+                    # redelivery of a message that was already handled: just ack it
+                    logger.warning(f"Skipping duplicate message {message_id} ({event_type})")
+                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    return
+
+                # Dispatch the message to the appropriate handler if it exists
+                if event_type in self.event_handlers:
+                    logger.info(f"Dispatching event '{event_type}' to handler")
+                    # each message is a unit of work with a session of its own
+                    with unit_of_work() as db:
+                        processed = db.get(ProcessedMessage, message_id)
+                        if processed is None:
+                            result = self.event_handlers[event_type](message, PaymentService(db))
+                            # committed with the handler's writes: a redelivery after a crash
+                            # before the mark below finds it and skips the handler
+                            db.add(ProcessedMessage(message_id=message_id, result=result))
+                        else:
+                            logger.warning(f"Skipping message {message_id} ({event_type}), committed before")
+                            result = processed.result
+                    # only once the writes are committed; when publishing fails, the
+                    # redelivery finds the message committed and publishes the reply again
+                    if event_type in self.replies:
+                        self.replies[event_type](message, result)
+                else:
+                    logger.warning(f"Unhandled event type: {event_type}")
+                self.dedup.mark(message_id)
+
+                # Acknowledge the message after processing
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                logger.info("Message acknowledged")
         except Exception as e:
             logger.error(f"Error processing message: {e}", exc_info=True)
-            print("Error processing message:", e)
-            # Optionally, you might choose to nack the message or log it for further inspection
+            # the handler's writes were rolled back, or committed with a reply still to
+            # publish: requeue the message for one more try, and drop it if that fails
+            # as well rather than redelivering it forever
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=not method.redelivered)
+        self.prune_processed_messages()
 
-    def handle_take_payment(self, message):
-        """Handle payment processing logic."""
+    def prune_processed_messages(self):
+        """Delete processed message ids older than PROCESSED_MESSAGES_RETENTION_DAYS, at most every PRUNE_INTERVAL."""
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.PRUNE_INTERVAL
+        cutoff = utc_now() - timedelta(days=config.PROCESSED_MESSAGES_RETENTION_DAYS)
+        try:
+            with unit_of_work() as db:
+                deleted = db.query(ProcessedMessage).filter(
+                    ProcessedMessage.processed_at < cutoff
+                ).delete(synchronize_session=False)
+            if deleted:
+                logger.info(f"Deleted {deleted} expired processed message ids")
+        except Exception as e:
+            logger.error(f"Error deleting expired processed message ids: {str(e)}")
+
+    def handle_take_payment(self, message, payment_service: PaymentService):
+        """Handle payment processing logic; returns the payment ID, which reply_payment_taken publishes."""
         logger.info("Handling 'take_payment' event")
         try:
             data = message.get("data")
             transaction_id = message.get("transaction_id")
             logger.debug(f"take_payment data: {data}, transaction_id: {transaction_id}")
-            # Call the payment service to process the payment
-            payment_response = self.payment_service.create_payment(data)
-            logger.info(f"Created payment with ID: {payment_response.id}")
-            self.payment_service.update_payment_status(payment_response.id, "Success")
-            logger.info(f"Updated payment status to 'Success' for ID: {payment_response.id}")
-            self.payment_service.update_transaction_id(transaction_id=transaction_id, payment_id=payment_response.id)
-            logger.info(f"Updated transaction ID for payment {payment_response.id}")
-            # Publish a success message or take further action
-            self.publisher.publish_payment_message(payment_response.id, transaction_id)
-            logger.info(f"Published payment message for ID: {payment_response.id}")
+            # Insert the payment as taken, in one statement; the unit of work commits it
+            payment_id = payment_service.take_payment(data, transaction_id, commit=False)
+            bind_log_context(payment_id=payment_id)
+            logger.info(f"Took payment with ID: {payment_id}")
+            return payment_id
         except Exception as e:
             logger.error(f"Error in handle_take_payment: {e}", exc_info=True)
-            print("Error in handle_take_payment:", e)
+            raise
+
+    def reply_payment_taken(self, message, payment_id: str):
+        """Tell the orchestrator the payment was taken; called once it is committed."""
+        self.publisher.publish_payment_message(payment_id, message.get("transaction_id"))
+        logger.info(f"Published payment message for ID: {payment_id}")
 
-    def handle_order_id_updated(self, message):
+    def handle_order_id_updated(self, message, payment_service: PaymentService):
         """Handle order ID update logic."""
         logger.info("Handling 'update_payment_order_id' event")
         try:
@@ -102,13 +159,13 @@ class RabbitMQConsumer:
             payment_id = data.get("payment_id")
             logger.debug(f"update_payment_order_id data: order_id={order_id}, payment_id={payment_id}")
             # Call the payment service to update the order ID
-            self.payment_service.update_order_id(order_id=order_id, payment_id=payment_id)
+            payment_service.update_order_id(order_id=order_id, payment_id=payment_id, commit=False)
             logger.info(f"Updated order ID to {order_id} for payment {payment_id}")
         except Exception as e:
             logger.error(f"Error in handle_order_id_updated: {e}", exc_info=True)
-            print("Error in handle_order_id_updated:", e)
+            raise
 
-    def handle_rollback_payment(self, message):
+    def handle_rollback_payment(self, message, payment_service: PaymentService):
         """Handle payment rollback logic."""
         logger.info("Handling 'rollback_payment' event")
         try:
@@ -117,11 +174,11 @@ class RabbitMQConsumer:
             transaction_id = message.get("transaction_id")
             logger.debug(f"rollback_payment data: payment_id={payment_id}, transaction_id={transaction_id}")
             # Call the payment service to rollback the payment
-            self.payment_service.rollback_payment(transaction_id=transaction_id, payment_id=payment_id)
+            payment_service.rollback_payment(transaction_id=transaction_id, payment_id=payment_id, commit=False)
             logger.info(f"Rolled back payment {payment_id}")
         except Exception as e:
             logger.error(f"Error in handle_rollback_payment: {e}", exc_info=True)
-            print("Error in handle_rollback_payment:", e)
+            raise
 
     def start_consuming(self):
         """Start consuming messages from the specified queue."""
@@ -135,12 +192,10 @@ class RabbitMQConsumer:
             on_message_callback=self.callback
         )
         logger.info(f"Started consuming on queue: {self.queue}")
-        print(f"Started consuming on queue: {self.queue}")
         try:
             self.channel.start_consuming()
         except Exception as e:
             logger.error(f"Error during consuming: {e}", exc_info=True)
-            print("Error during consuming:", e)
         finally:
             if self.connection and not self.connection.is_closed:
                 self.connection.close()
@@ -157,5 +212,8 @@ def get_consumer_service(
         queue: str
     ):
     publisher = get_publisher_service()
-    payment_service = get_payment_service()
-    return RabbitMQConsumer(queue=queue, payment_service=payment_service, publisher=publisher)
+    dedup = DedupWindow(
+        queue, redis.Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB),
+        lambda message, level: logger.log(logging.getLevelName(level), message)
+    )
+    return RabbitMQConsumer(queue=queue, publisher=publisher, dedup=dedup)
@@ -0,0 +1,112 @@
+"""
+Benchmark: database round trips and time per payment taken by the consumer.
+
+Takes --payments payments of a saga's take_payment message two ways, each in
+the unit of work the consumer gives a message:
+  * steps: create_payment, update_payment_status and update_transaction_id,
+    as handle_take_payment used to
+  * take_payment: one INSERT with the final status and transaction ID, committed
+    by the unit of work as in the consumer
+and counts the statements, commits and pre-ping checks sent to the database
+for each payment.
+
+The database is DATABASE_URL, or a SQLite file in a temporary directory when
+it is not set; round trips matter most against a networked MySQL.
+
+Usage (from the payment directory):
+    python benchmarks/bench_take_payment.py --payments 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+# the logger writes its daily partitions under LOG_DIR, relative to the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_take_payment_"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.getcwd()}/bench.db")
+
+from sqlalchemy import event  # noqa: E402
+from db.base import Base, engine  # noqa: E402
+from db.dependencies import unit_of_work  # noqa: E402
+from entity import payment  # noqa: E402, F401
+from services.payment_service import PaymentService  # noqa: E402
+
+
+class RoundTrips:
+    """Statements, commits and pings the engine sends, counted through its events."""
+    def __init__(self):
+        self.statements = self.commits = self.pings = 0
+        event.listen(engine, "before_cursor_execute", self._statement)
+        event.listen(engine, "commit", self._commit)
+        do_ping = engine.dialect.do_ping
+
+        def counted_ping(dbapi_connection):
+            self.pings += 1
+            return do_ping(dbapi_connection)
+        engine.dialect.do_ping = counted_ping
+
+    def _statement(self, *args):
+        self.statements += 1
+
+    def _commit(self, *args):
+        self.commits += 1
+
+    def total(self) -> int:
+        return self.statements + self.commits + self.pings
+
+    def reset(self):
+        self.statements = self.commits = self.pings = 0
+
+
+def payment_data() -> dict:
+    return {"user_email": "bench@example.com", "order_id": None, "amount": 25.0, "payment_method": "Credit Card"}
+
+
+def steps(service: PaymentService, transaction_id: str) -> str:
+    created = service.create_payment(payment_data())
+    service.update_payment_status(created.id, "Success")
+    service.update_transaction_id(transaction_id=transaction_id, payment_id=created.id)
+    return created.id
+
+
+def take_payment(service: PaymentService, transaction_id: str) -> str:
+    return service.take_payment(payment_data(), transaction_id, commit=False)
+
+
+def run(trips: RoundTrips, take, payments: int) -> tuple[float, float, dict]:
+    """(round trips per payment, ms per payment, counts per payment)"""
+    trips.reset()
+    started = time.perf_counter()
+    for _ in range(payments):
+        transaction_id = str(uuid.uuid4())
+        with unit_of_work() as db:
+            take(PaymentService(db), transaction_id)
+    elapsed = time.perf_counter() - started
+    counts = {name: getattr(trips, name) / payments for name in ("statements", "commits", "pings")}
+    return trips.total() / payments, elapsed / payments * 1000, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=10000)
+    args = parser.parse_args()
+
+    if engine.url.get_backend_name() == "sqlite":
+        # time the round trips rather than SQLite syncing every commit to disk
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA synchronous=OFF"))
+        engine.dispose()
+    Base.metadata.create_all(bind=engine)
+    trips = RoundTrips()
+    print(f"payments={args.payments} database={engine.url.get_backend_name()}")
+    for label, take in (("steps", steps), ("take_payment", take_payment)):
+        per_payment, ms, counts = run(trips, take, args.payments)
+        detail = "  ".join(f"{name} {count:.1f}" for name, count in counts.items())
+        print(f"{label:<14} {per_payment:4.1f} round trips/payment ({detail})   {ms:6.3f} ms/payment")
+
+
+if __name__ == "__main__":
+    main()
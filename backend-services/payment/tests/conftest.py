@@ -0,0 +1,30 @@
+"""
+Unit tests import the service modules the way app/main.py does, with app/ on
+sys.path. They run against a SQLite file in a temporary directory, through
+DATABASE_URL, and the logger writes its daily partitions there as well.
+"""
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+TEST_DIR = tempfile.mkdtemp(prefix="payment_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DIR}/test.db")
+os.environ.setdefault("LOG_DIR", os.path.join(TEST_DIR, "logs"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A session on empty tables."""
+    from db.base import Base, SessionLocal, engine
+    from entity import payment, processed_message  # noqa: F401
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
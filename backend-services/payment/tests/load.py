@@ -0,0 +1,79 @@
+"""
+Load test: the database connection pool stays bounded under concurrent requests.
+
+Sends LOAD_REQUESTS requests, LOAD_CONCURRENCY at a time, to endpoints that
+use a database session, as the admin whose token is in LOAD_AUTH_TOKEN. Then
+checks GET /db/pool: every connection went back to the pool, no request gave
+up waiting for one, and no more connections were in use at once than the pool
+allows.
+
+It needs a running payment service and an admin token, so it only runs when
+LOAD_AUTH_TOKEN is set; it is not part of the CI test job.
+
+    BASE_URL=http://localhost:9001 LOAD_AUTH_TOKEN="Bearer ..." pytest tests/load.py -q
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import pytest
+
+# Point this at your running FastAPI server
+BASE_URL = os.environ.get("BASE_URL", "http://localhost:9001")
+LOAD_AUTH_TOKEN = os.environ.get("LOAD_AUTH_TOKEN", "")
+LOAD_REQUESTS = int(os.environ.get("LOAD_REQUESTS", 2000))
+LOAD_CONCURRENCY = int(os.environ.get("LOAD_CONCURRENCY", 200))
+# pool_size + max_overflow the service runs with
+DB_POOL_LIMIT = int(os.environ.get("DB_POOL_SIZE", 10)) + int(os.environ.get("DB_MAX_OVERFLOW", 20))
+
+if not LOAD_AUTH_TOKEN:
+    pytest.skip("LOAD_AUTH_TOKEN is not set; the load test needs a running service and an admin token",
+                allow_module_level=True)
+
+
+@pytest.fixture(scope="module")
+def client():
+    limits = httpx.Limits(max_connections=LOAD_CONCURRENCY, max_keepalive_connections=LOAD_CONCURRENCY)
+    headers = {"Authorization": LOAD_AUTH_TOKEN}
+    with httpx.Client(base_url=BASE_URL.rstrip("/"), headers=headers, limits=limits, timeout=60) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def payment(client):
+    payload = {
+        "user_email": f"load-{time.time()}@example.com",
+        "order_id": f"{time.time()}",
+        "amount": 10.0,
+        "payment_method": "Credit Card"
+    }
+    create = client.post("/payments/", json=payload)
+    assert create.status_code == 201, create.text
+    return {**payload, "id": create.json()["id"]}
+
+
+def request(client: httpx.Client, payment: dict, i: int) -> int:
+    if i % 3 == 0:
+        return client.get("/payments/").status_code
+    if i % 3 == 1:
+        return client.get(f"/payments/{payment['id']}").status_code
+    return client.get(f"/payments/user/{payment['user_email']}").status_code
+
+
+def test_pool_stays_bounded_under_concurrent_requests(client, payment):
+    before = client.get("/db/pool").json()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=LOAD_CONCURRENCY) as executor:
+        statuses = list(executor.map(lambda i: request(client, payment, i), range(LOAD_REQUESTS)))
+    elapsed = time.perf_counter() - started
+
+    after = client.get("/db/pool").json()
+    print(f"\n{LOAD_REQUESTS} requests, {LOAD_CONCURRENCY} concurrent, in {elapsed:.1f}s: {after}")
+
+    assert all(status == 200 for status in statuses), sorted(set(statuses))
+    # sessions are closed with their request, so nothing is left checked out
+    assert after["checked_out"] == 0
+    assert after["timeouts"] == before["timeouts"]
+    assert after["checkouts"] - before["checkouts"] >= LOAD_REQUESTS
+    assert after["max_in_use"] <= DB_POOL_LIMIT
@@ -0,0 +1,129 @@
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+import fakeredis
+import pytest
+from db.base import SessionLocal
+from entity.payment import Payment
+from entity.processed_message import ProcessedMessage, utc_now
+from message_dedup.window import DedupWindow
+from services.rabbitmq_consumer import RabbitMQConsumer
+
+
+class Publisher:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.published = []
+        # whether the row replied about was visible to another session when the reply went out
+        self.committed = []
+
+    def publish_payment_message(self, payment_id, transaction_id):
+        with SessionLocal() as session:
+            self.committed.append(session.get(Payment, payment_id) is not None)
+        if self.fail:
+            raise ConnectionError("RabbitMQ is down")
+        self.published.append((payment_id, transaction_id))
+
+
+class Channel:
+    def __init__(self):
+        self.acked = []
+        self.nacked = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.nacked.append((delivery_tag, requeue))
+
+
+def deliver(consumer: RabbitMQConsumer, message: dict, redelivered: bool = False) -> Channel:
+    channel = Channel()
+    method = SimpleNamespace(delivery_tag=1, redelivered=redelivered)
+    consumer.callback(channel, method, None, json.dumps(message).encode())
+    return channel
+
+
+def take_payment(message_id: str = "m-1") -> dict:
+    return {"event": "take_payment", "message_id": message_id, "transaction_id": "t-1", "data": {
+        "user_email": "customer@example.com", "order_id": None, "amount": 9.5, "payment_method": "Credit Card",
+    }}
+
+
+def discard(message: str, level: str):
+    pass
+
+
+@pytest.fixture
+def publisher():
+    return Publisher()
+
+
+@pytest.fixture
+def consumer(db, publisher):
+    return RabbitMQConsumer("payment_queue", publisher, DedupWindow("payment_queue", fakeredis.FakeRedis(), discard))
+
+
+def test_take_payment_is_committed_and_acked(consumer, publisher, db):
+    channel = deliver(consumer, take_payment())
+
+    assert channel.acked == [1] and channel.nacked == []
+    payment = db.query(Payment).one()
+    assert (payment.payment_status, payment.transaction_id) == ("Success", "t-1")
+    assert publisher.published == [(payment.id, "t-1")]
+
+
+def test_failed_handler_commits_nothing_and_requeues_once(consumer, publisher, db):
+    message = take_payment()
+    del message["data"]["amount"]
+
+    assert deliver(consumer, message).nacked == [(1, True)]
+    assert deliver(consumer, message, redelivered=True).nacked == [(1, False)]
+    assert db.query(Payment).count() == 0
+    assert publisher.published == []
+    assert not consumer.dedup.seen("m-1")
+
+
+def test_reply_is_published_once_the_payment_is_committed(consumer, publisher, db):
+    deliver(consumer, take_payment())
+
+    assert publisher.committed == [True]
+
+
+def test_failed_reply_is_published_again_without_a_second_payment(consumer, publisher, db):
+    publisher.fail = True
+    assert deliver(consumer, take_payment()).nacked == [(1, True)]
+    payment = db.query(Payment).one()
+    publisher.fail = False
+
+    assert deliver(consumer, take_payment(), redelivered=True).acked == [1]
+    assert deliver(consumer, take_payment(), redelivered=True).acked == [1]
+    assert db.query(Payment).count() == 1
+    assert publisher.published == [(payment.id, "t-1")]
+
+
+def test_rollback_of_an_unknown_payment_is_nacked(consumer):
+    message = {"event": "rollback_payment", "transaction_id": "unknown", "data": {"payment_id": None}}
+    assert deliver(consumer, message).nacked == [(1, True)]
+
+
+def test_redelivery_after_a_lost_mark_does_not_run_the_handler_again(consumer, db):
+    deliver(consumer, take_payment())
+    # as after a crash between the commit and the mark in Redis
+    consumer.dedup = DedupWindow("payment_queue", fakeredis.FakeRedis(), discard)
+
+    assert deliver(consumer, take_payment(), redelivered=True).acked == [1]
+    assert db.query(Payment).count() == 1
+    assert consumer.dedup.seen("m-1")
+
+
+def test_expired_processed_message_ids_are_deleted(consumer, db):
+    db.add_all([
+        ProcessedMessage(message_id="old", processed_at=utc_now() - timedelta(days=8)),
+        ProcessedMessage(message_id="recent", processed_at=utc_now() - timedelta(days=6)),
+    ])
+    db.commit()
+
+    consumer.prune_processed_messages()
+
+    assert [row.message_id for row in db.query(ProcessedMessage)] == ["recent"]